@@ -4,7 +4,9 @@ import type { BookInDB } from '../types/ApiTypes';
 
 interface ListBooksParams {
     limit?: number;
-    skip?: number;
+    skip?: number; // Deprecated: prefer cursor
+    cursor?: string; // From the X-Next-Cursor header of the previous page
+    sort?: '_id' | 'publication_year' | 'title';
 }
 
 /**
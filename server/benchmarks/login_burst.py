@@ -0,0 +1,72 @@
+# benchmarks/login_burst.py
+"""
+Measures latency of an unrelated GET endpoint while a burst of logins runs concurrently.
+
+Run against a live server (python main.py) with an existing account:
+    python -m benchmarks.login_burst --email testuser --password securepassword123
+
+The login rate limit applies to the benchmark too; 429s show up in the status counts.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def login_loop(client: httpx.AsyncClient, email: str, password: str, stop: asyncio.Event, counts: dict):
+    while not stop.is_set():
+        response = await client.post("/auth/login", data={"username": email, "password": password})
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+
+
+async def probe_loop(client: httpx.AsyncClient, path: str, requests: int, samples: list):
+    for _ in range(requests):
+        start = time.perf_counter()
+        await client.get(path)
+        samples.append((time.perf_counter() - start) * 1000)
+
+
+async def run(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30) as client:
+        # Baseline: probe alone
+        baseline = []
+        await probe_loop(client, args.path, args.requests, baseline)
+
+        # Under load: probe while logins run concurrently
+        loaded = []
+        login_counts = {}
+        stop = asyncio.Event()
+        logins = [
+            asyncio.create_task(login_loop(client, args.email, args.password, stop, login_counts))
+            for _ in range(args.concurrency)
+        ]
+        await probe_loop(client, args.path, args.requests, loaded)
+        stop.set()
+        await asyncio.gather(*logins)
+
+    for label, samples in (("idle", baseline), ("during logins", loaded)):
+        print(
+            f"GET {args.path} {label:>14}: "
+            f"p50={percentile(samples, 50):7.2f}ms "
+            f"p99={percentile(samples, 99):7.2f}ms "
+            f"mean={statistics.mean(samples):7.2f}ms"
+        )
+    print(f"Login responses by status: {login_counts}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/", help="Unrelated GET endpoint to probe")
+    parser.add_argument("--email", required=True, help="Login name (the login form field is 'username')")
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent login loops")
+    parser.add_argument("--requests", type=int, default=500, help="Probe requests per phase")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,147 @@
+# benchmarks/neo4j_lookups.py
+"""
+Compares db hits of the old function-wrapped id matches with direct property lookups
+on a synthetic graph, using PROFILE.
+
+    python -m benchmarks.neo4j_lookups --users 20000 --follows 10 --books 2000 --ratings 5
+
+Before: WHERE toString(u.id) = toString($id), which cannot use an index (label scan).
+After:  {id: $id}, an index seek backed by the :User(id) uniqueness constraint.
+The synthetic nodes use negative user ids and 'bench-' book ids and are deleted afterwards.
+"""
+import argparse
+import asyncio
+import random
+import time
+import graph.neo4j as neo4j
+
+QUERIES = {
+    "follow/rate user lookup": (
+        """
+        MATCH (follower:User) WHERE toString(follower.id) = toString($user_id)
+        MATCH (followee:User) WHERE toString(followee.id) = toString($other_id)
+        RETURN follower.id, followee.id
+        """,
+        """
+        MATCH (follower:User {id: $user_id}), (followee:User {id: $other_id})
+        RETURN follower.id, followee.id
+        """,
+    ),
+    "book recommendations": (
+        """
+        MATCH (u:User) WHERE toString(u.id) = toString($user_id)
+        MATCH (u)-[:FOLLOWS]->(friend:User)-[r:RATED]->(book:Book)
+        WHERE r.rating >= 4 AND NOT (u)-[:RATED]->(book)
+        RETURN book.id AS recommended_book_id, COUNT(book) AS friends_who_rated
+        ORDER BY friends_who_rated DESC, book.id DESC
+        LIMIT 5
+        """,
+        """
+        MATCH (u:User {id: $user_id})-[:FOLLOWS]->(friend:User)-[r:RATED]->(book:Book)
+        WHERE r.rating >= 4 AND NOT (u)-[:RATED]->(book)
+        RETURN book.id AS recommended_book_id, COUNT(book) AS friends_who_rated
+        ORDER BY friends_who_rated DESC, book.id DESC
+        LIMIT 5
+        """,
+    ),
+}
+
+
+def total_db_hits(plan: dict) -> int:
+    return plan.get("dbHits", 0) + sum(total_db_hits(child) for child in plan.get("children", []))
+
+
+async def build_graph(session, args):
+    rng = random.Random(args.seed)
+    user_ids = [-(i + 1) for i in range(args.users)]
+    book_ids = [f"bench-{i}" for i in range(args.books)]
+
+    for start in range(0, len(user_ids), 5000):
+        await (await session.run(
+            "UNWIND $ids AS id CREATE (:User {id: id})", ids=user_ids[start:start + 5000]
+        )).consume()
+    await (await session.run("UNWIND $ids AS id CREATE (:Book {id: id})", ids=book_ids)).consume()
+
+    follows = [
+        {"a": user_id, "b": other}
+        for user_id in user_ids
+        for other in rng.sample(user_ids, args.follows)
+        if other != user_id
+    ]
+    ratings = [
+        {"u": user_id, "b": book_id, "rating": rng.randint(1, 5)}
+        for user_id in user_ids
+        for book_id in rng.sample(book_ids, args.ratings)
+    ]
+    for start in range(0, len(follows), 10000):
+        await (await session.run("""
+        UNWIND $rows AS row
+        MATCH (a:User {id: row.a}), (b:User {id: row.b})
+        CREATE (a)-[:FOLLOWS]->(b)
+        """, rows=follows[start:start + 10000])).consume()
+    for start in range(0, len(ratings), 10000):
+        await (await session.run("""
+        UNWIND $rows AS row
+        MATCH (u:User {id: row.u}), (b:Book {id: row.b})
+        CREATE (u)-[:RATED {rating: row.rating}]->(b)
+        """, rows=ratings[start:start + 10000])).consume()
+    return user_ids
+
+
+async def cleanup(session):
+    await (await session.run("""
+    MATCH (u:User) WHERE u.id < 0
+    CALL { WITH u DETACH DELETE u } IN TRANSACTIONS OF 5000 ROWS
+    """)).consume()
+    await (await session.run("""
+    MATCH (b:Book) WHERE b.id STARTS WITH 'bench-'
+    CALL { WITH b DETACH DELETE b } IN TRANSACTIONS OF 5000 ROWS
+    """)).consume()
+
+
+async def profile(session, query: str, params: dict):
+    started = time.perf_counter()
+    summary = await (await session.run("PROFILE " + query, **params)).consume()
+    return total_db_hits(summary.profile), (time.perf_counter() - started) * 1000
+
+
+async def run(args):
+    await neo4j.connect_neo4j()  # Also creates the uniqueness constraints
+    try:
+        async with neo4j.driver.session() as session:
+            started = time.perf_counter()
+            user_ids = await build_graph(session, args)
+            print(
+                f"Synthetic graph: {args.users} users, ~{args.users * args.follows} follows, "
+                f"{args.books} books, {args.users * args.ratings} ratings ({time.perf_counter() - started:.1f}s)"
+            )
+
+            rng = random.Random(args.seed + 1)
+            samples = [{"user_id": rng.choice(user_ids), "other_id": rng.choice(user_ids)} for _ in range(args.repeat)]
+            print(f"{'query':<26}{'before hits':>14}{'after hits':>14}{'before ms':>12}{'after ms':>12}")
+            for name, (before_query, after_query) in QUERIES.items():
+                results = {"before": [], "after": []}
+                for params in samples:
+                    results["before"].append(await profile(session, before_query, params))
+                    results["after"].append(await profile(session, after_query, params))
+                row = [name]
+                for key in ("before", "after"):
+                    row.append(sum(hits for hits, _ in results[key]) / len(samples))
+                for key in ("before", "after"):
+                    row.append(sum(ms for _, ms in results[key]) / len(samples))
+                print(f"{row[0]:<26}{row[1]:>14.0f}{row[2]:>14.0f}{row[3]:>12.2f}{row[4]:>12.2f}")
+    finally:
+        async with neo4j.driver.session() as session:
+            await cleanup(session)
+        await neo4j.close_neo4j()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Neo4j id lookup db hits, before/after.")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--follows", type=int, default=10, help="Follows per user")
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--ratings", type=int, default=5, help="Ratings per user")
+    parser.add_argument("--repeat", type=int, default=20, help="Profiled runs per query")
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
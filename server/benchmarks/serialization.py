@@ -0,0 +1,91 @@
+# benchmarks/serialization.py
+"""
+Compares the model-based list path with the fast path on large synthetic pages.
+
+    python -m benchmarks.serialization --sizes 100 1000 --repeat 200
+
+Model path: BookInDB(**doc) / ReviewInDB(**row) per item, then FastAPI-style
+response_model validation and serialization, then json.dumps.
+Fast path: plain dict conversion, then orjson.dumps.
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime, timedelta
+from typing import List
+import orjson
+from bson import ObjectId
+from pydantic import TypeAdapter
+from models.book import BookInDB
+from models.review import ReviewInDB
+from services.book_service import book_document_to_dict
+
+BOOKS_ADAPTER = TypeAdapter(List[BookInDB])
+REVIEWS_ADAPTER = TypeAdapter(List[ReviewInDB])
+
+
+def make_books(n: int) -> list:
+    return [
+        {
+            "_id": ObjectId(),
+            "title": f"Book title number {i}",
+            "author": f"Author {i % 500}",
+            "isbn": f"978{i:010d}",
+            "publication_year": 1950 + i % 70,
+            "cover_url": f"http://example.com/covers/{i}.jpg",
+        }
+        for i in range(n)
+    ]
+
+
+def make_reviews(n: int) -> list:
+    now = datetime(2024, 1, 1)
+    return [
+        {
+            "id": i,
+            "user_id": i % 1000,
+            "book_id": "60c72b2f8a1d7f0001a1b2c3",
+            "rating": 1 + i % 5,
+            "review_text": "A perfectly reasonable review of a perfectly reasonable book. " * 3,
+            "created_at": now - timedelta(minutes=i),
+        }
+        for i in range(n)
+    ]
+
+
+def model_books(documents):
+    books = [BookInDB(**document) for document in documents]
+    validated = BOOKS_ADAPTER.validate_python(books)
+    return json.dumps(BOOKS_ADAPTER.dump_python(validated, mode="json", by_alias=True)).encode()
+
+
+def fast_books(documents):
+    return orjson.dumps([book_document_to_dict(document) for document in documents])
+
+
+def model_reviews(rows):
+    reviews = [ReviewInDB(**dict(row)) for row in rows]
+    validated = REVIEWS_ADAPTER.validate_python(reviews)
+    return json.dumps(REVIEWS_ADAPTER.dump_python(validated, mode="json")).encode()
+
+
+def fast_reviews(rows):
+    return orjson.dumps([dict(row) for row in rows])
+
+
+def report(label: str, size: int, repeat: int, slow, fast, data):
+    assert json.loads(slow(data)) == json.loads(fast(data)), f"{label}: outputs differ"
+    slow_ms = timeit.timeit(lambda: slow(data), number=repeat) / repeat * 1000
+    fast_ms = timeit.timeit(lambda: fast(data), number=repeat) / repeat * 1000
+    print(f"{label:<8} size={size:<6} model={slow_ms:8.3f}ms  fast={fast_ms:8.3f}ms  speedup={slow_ms / fast_ms:5.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        report("books", size, args.repeat, model_books, fast_books, make_books(size))
+        report("reviews", size, args.repeat, model_reviews, fast_reviews, make_reviews(size))
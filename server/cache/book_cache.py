@@ -0,0 +1,113 @@
+# cache/book_cache.py
+import os
+from typing import Optional
+from dotenv import load_dotenv
+from cache.redis import get_redis_client_direct
+from cache.local_cache import LocalTTLCache
+from cache.invalidation import register_channel, publish
+from models.book import BookInDB
+
+load_dotenv()
+
+# Configuration
+BOOK_CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("BOOK_CACHE_LOCAL_MAX_ENTRIES", "5000"))
+BOOK_CACHE_LOCAL_TTL = int(os.getenv("BOOK_CACHE_LOCAL_TTL", "60"))  # Seconds
+BOOK_CACHE_REDIS_TTL = int(os.getenv("BOOK_CACHE_REDIS_TTL", "3600"))  # Seconds
+BOOK_CACHE_NEGATIVE_TTL = int(os.getenv("BOOK_CACHE_NEGATIVE_TTL", "60"))  # Seconds, for unknown ids
+BOOK_INVALIDATED_CHANNEL = "book:invalidated"
+
+# Stored in both tiers for ids known not to exist
+MISSING = "__missing__"
+
+_local = LocalTTLCache(BOOK_CACHE_LOCAL_MAX_ENTRIES, BOOK_CACHE_LOCAL_TTL)
+
+stats = {
+    "local_hits": 0,
+    "redis_hits": 0,
+    "negative_hits": 0,
+    "misses": 0,
+    "invalidations": 0,
+}
+
+
+def book_key(book_id: str) -> str:
+    return f"book:{book_id}"
+
+
+async def get_cached_book(book_id: str):
+    """
+    Looks a book up in the in-process LRU, then in Redis.
+    Returns a BookInDB, MISSING for a cached unknown id, or None on a miss.
+    """
+    cached = _local.get(book_id)
+    if cached is not None:
+        stats["negative_hits" if cached is MISSING else "local_hits"] += 1
+        return cached
+
+    try:
+        raw = await get_redis_client_direct().get(book_key(book_id))
+    except Exception as e:
+        print(f"Book cache Redis error: {e}")
+        raw = None
+
+    if raw is None:
+        stats["misses"] += 1
+        return None
+
+    if raw == MISSING:
+        stats["negative_hits"] += 1
+        _local.set(book_id, MISSING, ttl=min(BOOK_CACHE_LOCAL_TTL, BOOK_CACHE_NEGATIVE_TTL))
+        return MISSING
+
+    stats["redis_hits"] += 1
+    book = BookInDB.model_validate_json(raw)
+    _local.set(book_id, book)
+    return book
+
+
+async def cache_book(book: BookInDB):
+    """Stores a book in both tiers."""
+    _local.set(book.id, book)
+    try:
+        await get_redis_client_direct().set(
+            book_key(book.id), book.model_dump_json(by_alias=True), ex=BOOK_CACHE_REDIS_TTL
+        )
+    except Exception as e:
+        print(f"Book cache Redis error: {e}")
+
+
+async def cache_missing_book(book_id: str):
+    """Remembers that a book id does not exist, for a short time."""
+    _local.set(book_id, MISSING, ttl=min(BOOK_CACHE_LOCAL_TTL, BOOK_CACHE_NEGATIVE_TTL))
+    try:
+        await get_redis_client_direct().set(book_key(book_id), MISSING, ex=BOOK_CACHE_NEGATIVE_TTL)
+    except Exception as e:
+        print(f"Book cache Redis error: {e}")
+
+
+async def invalidate_books(*book_ids: str):
+    """Drops books from Redis and from every worker's local cache (after a create or update)."""
+    if not book_ids:
+        return
+    stats["invalidations"] += len(book_ids)
+    try:
+        await get_redis_client_direct().delete(*[book_key(book_id) for book_id in book_ids])
+        await publish(BOOK_INVALIDATED_CHANNEL, *book_ids)
+    except Exception as e:
+        print(f"Book cache invalidation error: {e}")
+        for book_id in book_ids:
+            _local.evict(book_id)
+
+
+def get_stats() -> dict:
+    """Hit/miss counters for this worker."""
+    lookups = stats["local_hits"] + stats["redis_hits"] + stats["negative_hits"] + stats["misses"]
+    hits = lookups - stats["misses"]
+    return {
+        **stats,
+        "local_entries": len(_local),
+        "hit_ratio": round(hits / lookups, 4) if lookups else None,
+    }
+
+
+register_channel(BOOK_INVALIDATED_CHANNEL, _local.evict, _local.clear)
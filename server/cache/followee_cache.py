@@ -0,0 +1,65 @@
+# cache/followee_cache.py
+import os
+from typing import Iterable, List, Optional
+from dotenv import load_dotenv
+from cache.redis import get_redis_client_direct
+
+load_dotenv()
+
+# Configuration
+FOLLOWEE_CACHE_TTL = int(os.getenv("FOLLOWEE_CACHE_TTL", "3600"))  # Seconds, renewed on every read
+
+# Member present in every fully loaded set: tells "loaded, follows nobody" apart from a miss,
+# and a set created by add_followee alone (no marker) from a complete one.
+LOADED_MARKER = "*"
+
+
+def followees_key(user_id: int) -> str:
+    return f"followees:{user_id}"
+
+
+async def get_following_statuses(user_id: int, followee_ids: List[int]) -> Optional[List[bool]]:
+    """
+    Checks many followees against the user's cached followee set in one round trip.
+    Returns one bool per id, or None when the set is not loaded.
+    Reads renew the TTL, so idle sets expire first (LRU-like eviction; Redis maxmemory
+    policies such as volatile-lru evict them under memory pressure too).
+    """
+    key = followees_key(user_id)
+    async with get_redis_client_direct().pipeline(transaction=False) as pipe:
+        pipe.smismember(key, [LOADED_MARKER, *followee_ids])
+        pipe.expire(key, FOLLOWEE_CACHE_TTL)
+        members, _ = await pipe.execute()
+    if not members[0]:
+        return None
+    return [bool(member) for member in members[1:]]
+
+
+async def cache_followees(user_id: int, followee_ids: Iterable[int]):
+    """
+    Marks the user's followee set loaded with the complete list from Postgres. Merged into the
+    existing set rather than replacing it, so a follow added while the list was being read is kept
+    (follows are never removed).
+    """
+    key = followees_key(user_id)
+    async with get_redis_client_direct().pipeline(transaction=True) as pipe:
+        pipe.sadd(key, LOADED_MARKER, *followee_ids)
+        pipe.expire(key, FOLLOWEE_CACHE_TTL)
+        await pipe.execute()
+
+
+async def add_followee(user_id: int, followee_id: int):
+    """Adds a new follow to the cached set (a set without the marker is reloaded on next read)."""
+    key = followees_key(user_id)
+    async with get_redis_client_direct().pipeline(transaction=True) as pipe:
+        pipe.sadd(key, followee_id)
+        pipe.expire(key, FOLLOWEE_CACHE_TTL)
+        await pipe.execute()
+
+
+async def invalidate_followees(user_id: int):
+    """Drops the user's cached set (e.g. when an update failed); the next read reloads it from Postgres."""
+    try:
+        await get_redis_client_direct().unlink(followees_key(user_id))
+    except Exception as e:
+        print(f"Followee cache invalidation error for {user_id}: {e}")
@@ -0,0 +1,81 @@
+# cache/invalidation.py
+import asyncio
+from typing import Callable, Optional
+from cache.redis import get_redis_client_direct
+
+# channel -> (on_message, on_reset)
+# on_message receives the published payload; on_reset drops everything the worker
+# cached locally, since messages may have been missed while (re)subscribing.
+_channels: dict[str, tuple[Callable[[str], None], Callable[[], None]]] = {}
+
+_listener_task: Optional[asyncio.Task] = None
+
+
+def register_channel(channel: str, on_message: Callable[[str], None], on_reset: Callable[[], None]):
+    """Registers a per-worker cache to be invalidated by messages on a Redis pub/sub channel."""
+    _channels[channel] = (on_message, on_reset)
+
+
+def _reset_all():
+    for _, on_reset in _channels.values():
+        on_reset()
+
+
+async def publish(channel: str, *messages: str):
+    """Publishes invalidation messages, applying them to this worker's cache right away."""
+    on_message, _ = _channels[channel]
+    redis = get_redis_client_direct()
+    pipe = redis.pipeline(transaction=False)
+    for message in messages:
+        on_message(message)
+        pipe.publish(channel, message)
+    await pipe.execute()
+
+
+async def _listen():
+    """Dispatches invalidations announced by other workers. Reconnects on failure."""
+    while True:
+        pubsub = None
+        try:
+            redis = get_redis_client_direct()
+            pubsub = redis.pubsub()
+            await pubsub.subscribe(*_channels.keys())
+            # Anything cached before the subscription may have missed an invalidation
+            _reset_all()
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    on_message, _ = _channels[message["channel"]]
+                    on_message(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Cache invalidation listener error: {e}")
+            _reset_all()
+            await asyncio.sleep(1)
+        finally:
+            if pubsub is not None:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+
+async def start_invalidation_listener():
+    """Starts the background pub/sub listener for every registered channel."""
+    global _listener_task
+    if _listener_task is None and _channels:
+        _listener_task = asyncio.create_task(_listen())
+        print(f"Cache invalidation listener started for {len(_channels)} channel(s).")
+
+
+async def stop_invalidation_listener():
+    """Stops the background pub/sub listener."""
+    global _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except asyncio.CancelledError:
+            pass
+        _listener_task = None
+        print("Cache invalidation listener stopped.")
@@ -0,0 +1,81 @@
+# cache/session_cache.py
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+from dotenv import load_dotenv
+from cache.invalidation import register_channel, publish
+
+load_dotenv()
+
+# Configuration
+SESSION_CACHE_MAX_ENTRIES = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "10000"))
+SESSION_CACHE_TTL = int(os.getenv("SESSION_CACHE_TTL", "60"))  # Seconds
+SESSION_REVOKED_CHANNEL = "session:revoked"
+
+
+class SessionCache:
+    """
+    Per-worker LRU cache of verified JWT payloads, keyed by the raw token.
+    Each entry lives for at most SESSION_CACHE_TTL seconds and never past the token's own 'exp'.
+    Entries can also be evicted by their 'jti', which is what revocations broadcast.
+    """
+    def __init__(self, max_entries: int = SESSION_CACHE_MAX_ENTRIES, ttl: int = SESSION_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._tokens_by_jti: dict[str, str] = {}
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, payload = entry
+        if expires_at <= time.time():
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return payload
+
+    def set(self, key: str, payload: dict):
+        now = time.time()
+        expires_at = now + self.ttl
+        token_exp = payload.get("exp")
+        if token_exp is not None:
+            expires_at = min(expires_at, float(token_exp))
+        if expires_at <= now:
+            return
+
+        self._entries[key] = (expires_at, payload)
+        self._entries.move_to_end(key)
+        if payload.get("jti"):
+            self._tokens_by_jti[payload["jti"]] = key
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def evict(self, jti: str):
+        key = self._tokens_by_jti.get(jti)
+        if key is not None:
+            self._remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._tokens_by_jti.clear()
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._tokens_by_jti.pop(entry[1].get("jti"), None)
+
+
+session_cache = SessionCache()
+
+
+async def publish_session_revoked(*jtis: str):
+    """Broadcasts revoked sessions (by jti) so every worker evicts them from its local cache."""
+    await publish(SESSION_REVOKED_CHANNEL, *jtis)
+
+
+register_channel(SESSION_REVOKED_CHANNEL, session_cache.evict, session_cache.clear)
@@ -0,0 +1,38 @@
+# cache/user_search_cache.py
+import os
+from typing import List, Optional
+import orjson
+from dotenv import load_dotenv
+from cache.redis import get_redis_client_direct
+
+load_dotenv()
+
+# Configuration
+USER_SEARCH_CACHE_TTL = int(os.getenv("USER_SEARCH_CACHE_TTL", "30"))  # Seconds; new users show up after at most this
+USER_SEARCH_CACHE_MAX_LENGTH = int(os.getenv("USER_SEARCH_CACHE_MAX_LENGTH", "12"))  # Longer queries are not cached
+
+
+def user_search_key(query: str) -> str:
+    return f"user_search:{query}"
+
+
+def is_cacheable(query: str) -> bool:
+    """Only short queries are cached: typeahead keystrokes, shared by many users."""
+    return len(query) <= USER_SEARCH_CACHE_MAX_LENGTH
+
+
+async def get_cached_matches(query: str) -> Optional[List[list]]:
+    """Returns the cached first-page [id, username, is_prefix, score] rows, or None on a miss."""
+    try:
+        cached = await get_redis_client_direct().get(user_search_key(query))
+    except Exception as e:
+        print(f"User search cache Redis error: {e}")
+        return None
+    return orjson.loads(cached) if cached is not None else None
+
+
+async def cache_matches(query: str, rows: List[list]):
+    try:
+        await get_redis_client_direct().set(user_search_key(query), orjson.dumps(rows), ex=USER_SEARCH_CACHE_TTL)
+    except Exception as e:
+        print(f"User search cache Redis error: {e}")
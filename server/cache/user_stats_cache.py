@@ -0,0 +1,61 @@
+# cache/user_stats_cache.py
+import os
+from typing import Optional, Tuple
+from dotenv import load_dotenv
+from cache.redis import get_redis_client_direct
+
+load_dotenv()
+
+# Configuration
+USER_STATS_CACHE_TTL = int(os.getenv("USER_STATS_CACHE_TTL", "300"))  # Seconds
+
+# Writes committed counters unless the hash already holds a newer version of them. Every
+# user_stats update bumps the row's version, so whichever of a reader's fill and a writer's
+# update reaches Redis last, the cache ends on the latest committed counters.
+# KEYS: the hashes, ARGV: the TTL, then version, followers_count, following_count for each
+SET_IF_NEWER_LUA = """
+for i, key in ipairs(KEYS) do
+    local base = 3 * i - 1
+    if tonumber(ARGV[base]) > tonumber(redis.call('HGET', key, 'version') or '-1') then
+        redis.call('HSET', key, 'version', ARGV[base], 'followers_count', ARGV[base + 1],
+                   'following_count', ARGV[base + 2])
+        redis.call('EXPIRE', key, ARGV[1])
+    end
+end
+return 0
+"""
+
+_set_script = None
+
+
+def user_stats_key(user_id: int) -> str:
+    return f"user_stats:{user_id}"
+
+
+async def get_cached_user_stats(user_id: int) -> Optional[dict]:
+    """Returns {'followers_count', 'following_count'} from the Redis hash, or None on a miss."""
+    cached = await get_redis_client_direct().hgetall(user_stats_key(user_id))
+    if not cached:
+        return None
+    return {field: int(value) for field, value in cached.items() if field != "version"}
+
+
+async def cache_user_stats(*entries: Tuple[int, dict, int]):
+    """
+    Caches (user_id, {'followers_count', 'following_count'}, version) entries read from or
+    committed to user_stats, in one EVALSHA. Entries older than the cached version are skipped.
+    """
+    global _set_script
+    if not entries:
+        return
+    if _set_script is None:
+        _set_script = get_redis_client_direct().register_script(SET_IF_NEWER_LUA)
+    args = [USER_STATS_CACHE_TTL]
+    for _, stats, version in entries:
+        args.extend([version, stats["followers_count"], stats["following_count"]])
+    await _set_script(keys=[user_stats_key(user_id) for user_id, _, _ in entries], args=args)
+
+
+async def invalidate_user_stats(*user_ids: int):
+    if user_ids:
+        await get_redis_client_direct().unlink(*[user_stats_key(user_id) for user_id in user_ids])
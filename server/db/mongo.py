@@ -22,6 +22,15 @@ async def connect_mongo():
     # Ensures the index is set on ISBN for quick lookup
     db = mongo_client[MONGO_DB]
     await db["books"].create_index("isbn", unique=True)
+    # Compound indexes backing keyset pagination of GET /books
+    await db["books"].create_index([("publication_year", 1), ("_id", 1)])
+    await db["books"].create_index([("title", 1), ("_id", 1)])
+    # Full-text index for GET /books/search, titles weigh more than authors
+    await db["books"].create_index(
+        [("title", "text"), ("author", "text")],
+        weights={"title": 3, "author": 1},
+        name="books_text_search",
+    )
     print("MongoDB connection established.")
 
 async def close_mongo():
@@ -1,6 +1,10 @@
 # db/postgres.py
 import asyncpg
+import asyncio
 import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,13 +20,41 @@ POSTGRES_DSN = f"postgresql://{user}:{password}@{server}:{port}/{db}"
 
 print(f"DEBUG: Attempting to connect with DSN: {POSTGRES_DSN}")
 
+# Pool configuration
+POOL_MIN_SIZE = int(os.getenv("POSTGRES_POOL_MIN_SIZE", "10"))
+POOL_MAX_SIZE = int(os.getenv("POSTGRES_POOL_MAX_SIZE", "10"))
+STATEMENT_CACHE_SIZE = int(os.getenv("POSTGRES_STATEMENT_CACHE_SIZE", "100"))
+MAX_INACTIVE_CONNECTION_LIFETIME = float(os.getenv("POSTGRES_MAX_INACTIVE_CONNECTION_LIFETIME", "300"))  # Seconds
+ACQUIRE_TIMEOUT = float(os.getenv("POSTGRES_ACQUIRE_TIMEOUT", "10"))  # Seconds
+
 db_pool: asyncpg.Pool = None
 
+# Upper bounds (ms) of the acquire wait-time histogram; the last bucket is open-ended
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000)
+
+pool_metrics = {
+    "acquisitions": 0,
+    "timeouts": 0,
+    "wait_total_ms": 0.0,
+    "wait_max_ms": 0.0,
+    "wait_histogram_ms": {**{f"le_{bound}": 0 for bound in WAIT_BUCKETS_MS}, "gt_1000": 0},
+}
+
+
+class PoolAcquireTimeoutError(Exception):
+    """Raised when no pool connection frees up within POSTGRES_ACQUIRE_TIMEOUT."""
+
 async def connect_postgres():
     """Initializes the connection pool for Postgres."""
     global db_pool
     print("Connecting to Postgres...")
-    db_pool = await asyncpg.create_pool(dsn=POSTGRES_DSN)
+    db_pool = await asyncpg.create_pool(
+        dsn=POSTGRES_DSN,
+        min_size=POOL_MIN_SIZE,
+        max_size=POOL_MAX_SIZE,
+        statement_cache_size=STATEMENT_CACHE_SIZE,
+        max_inactive_connection_lifetime=MAX_INACTIVE_CONNECTION_LIFETIME,
+    )
     print("Postgres connection pool established.")
 
 async def close_postgres():
@@ -31,8 +63,92 @@ async def close_postgres():
         await db_pool.close()
         print("Postgres connection pool closed.")
 
-# Dependency function to get a connection from the pool
+def _record_wait(wait_ms: float):
+    pool_metrics["acquisitions"] += 1
+    pool_metrics["wait_total_ms"] += wait_ms
+    pool_metrics["wait_max_ms"] = max(pool_metrics["wait_max_ms"], wait_ms)
+    for bound in WAIT_BUCKETS_MS:
+        if wait_ms <= bound:
+            pool_metrics["wait_histogram_ms"][f"le_{bound}"] += 1
+            return
+    pool_metrics["wait_histogram_ms"]["gt_1000"] += 1
+
+@asynccontextmanager
+async def acquire_connection():
+    """Acquires a pool connection, recording how long the caller waited for it."""
+    started = time.perf_counter()
+    try:
+        connection = await db_pool.acquire(timeout=ACQUIRE_TIMEOUT)
+    except asyncio.TimeoutError:
+        pool_metrics["timeouts"] += 1
+        raise PoolAcquireTimeoutError("Timed out waiting for a Postgres connection.")
+    _record_wait((time.perf_counter() - started) * 1000)
+    try:
+        yield connection
+    finally:
+        await db_pool.release(connection)
+
+def get_pool_metrics() -> dict:
+    """Pool occupancy and acquire wait-time metrics for this worker."""
+    acquisitions = pool_metrics["acquisitions"]
+    return {
+        **pool_metrics,
+        "wait_avg_ms": round(pool_metrics["wait_total_ms"] / acquisitions, 3) if acquisitions else None,
+        "pool_size": db_pool.get_size() if db_pool else 0,
+        "pool_idle": db_pool.get_idle_size() if db_pool else 0,
+        "pool_max_size": POOL_MAX_SIZE,
+    }
+
+
+class LazyConnection:
+    """
+    Connection handle that only holds a pool connection around each SQL call,
+    so slow non-Postgres work in a handler (Mongo, Neo4j) doesn't pin one.
+    Inside 'async with handle.transaction():' every call runs on the same connection.
+    Exposes the subset of the asyncpg.Connection API the services use.
+    """
+    def __init__(self):
+        self._connection: Optional[asyncpg.Connection] = None
+
+    @asynccontextmanager
+    async def transaction(self, **kwargs):
+        if self._connection is not None:
+            # Nested: savepoint on the connection already held
+            async with self._connection.transaction(**kwargs):
+                yield self
+            return
+
+        async with acquire_connection() as connection:
+            self._connection = connection
+            try:
+                async with connection.transaction(**kwargs):
+                    yield self
+            finally:
+                self._connection = None
+
+    async def _run(self, method: str, *args, **kwargs):
+        if self._connection is not None:
+            return await getattr(self._connection, method)(*args, **kwargs)
+        async with acquire_connection() as connection:
+            return await getattr(connection, method)(*args, **kwargs)
+
+    async def execute(self, *args, **kwargs):
+        return await self._run("execute", *args, **kwargs)
+
+    async def executemany(self, *args, **kwargs):
+        return await self._run("executemany", *args, **kwargs)
+
+    async def fetch(self, *args, **kwargs):
+        return await self._run("fetch", *args, **kwargs)
+
+    async def fetchrow(self, *args, **kwargs):
+        return await self._run("fetchrow", *args, **kwargs)
+
+    async def fetchval(self, *args, **kwargs):
+        return await self._run("fetchval", *args, **kwargs)
+
+
+# Dependency function to get a lazy connection handle (acquires only around SQL calls)
 async def get_db():
     if db_pool:
-        async with db_pool.acquire() as connection:
-            yield connection
\ No newline at end of file
+        yield LazyConnection()
@@ -0,0 +1,259 @@
+# graph/follow_graph.py
+"""
+In-memory CSR snapshot of the FOLLOWS graph, an optional alternative to Neo4j for
+read-heavy traversals (GRAPH_ENGINE=csr).
+
+Row u of the adjacency holds the ids followed by user u, sorted:
+    neighbors[offsets[u]:offsets[u + 1]]
+User ids are SERIAL, so they index rows directly. Follows added after the snapshot live
+in a small per-worker overlay, broadcast to every worker over Redis pub/sub, until the
+next periodic rebuild folds them in.
+"""
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from dotenv import load_dotenv
+import db.postgres as postgres
+from cache.invalidation import register_channel, publish
+
+load_dotenv()
+
+# Configuration
+GRAPH_ENGINE = os.getenv("GRAPH_ENGINE", "neo4j")  # 'neo4j' or 'csr'
+FOLLOW_GRAPH_REBUILD_INTERVAL = int(os.getenv("FOLLOW_GRAPH_REBUILD_INTERVAL", "900"))  # Seconds
+# Optional path prefix of a memory-mapped snapshot shared by the workers of a host
+FOLLOW_GRAPH_SNAPSHOT_PATH = os.getenv("FOLLOW_GRAPH_SNAPSHOT_PATH", "")
+FOLLOW_ADDED_CHANNEL = "follow_graph:follow_added"
+
+LOAD_EDGES_QUERY = "SELECT follower_id, followee_id FROM follows ORDER BY follower_id, followee_id"
+
+
+class FollowGraph:
+    def __init__(self, offsets: np.ndarray, neighbors: np.ndarray):
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.built_at = time.time()
+        # follower -> followees added since the snapshot (never duplicates a CSR edge)
+        self._overlay: Dict[int, Set[int]] = {}
+
+    @classmethod
+    def from_edges(cls, edges: np.ndarray) -> "FollowGraph":
+        """Builds the CSR arrays from an (n, 2) array of (follower, followee) rows sorted by follower."""
+        followers = edges[:, 0]
+        rows = int(followers.max()) + 1 if len(edges) else 0
+        counts = np.bincount(followers, minlength=rows)
+        offsets = np.zeros(rows + 1, dtype=np.int32)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(offsets, np.ascontiguousarray(edges[:, 1], dtype=np.int32))
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.neighbors) + sum(len(followees) for followees in self._overlay.values())
+
+    def _row(self, user_id: int) -> np.ndarray:
+        if 0 <= user_id < len(self.offsets) - 1:
+            return self.neighbors[self.offsets[user_id]:self.offsets[user_id + 1]]
+        return self.neighbors[:0]
+
+    def _in_snapshot(self, follower_id: int, followee_id: int) -> bool:
+        row = self._row(follower_id)
+        position = np.searchsorted(row, followee_id)
+        return position < len(row) and row[position] == followee_id
+
+    def add_follow(self, follower_id: int, followee_id: int):
+        if not self._in_snapshot(follower_id, followee_id):
+            self._overlay.setdefault(follower_id, set()).add(followee_id)
+
+    def following(self, user_id: int) -> np.ndarray:
+        """Ids followed by the user."""
+        row = self._row(user_id)
+        extra = self._overlay.get(user_id)
+        if extra:
+            row = np.concatenate([row, np.fromiter(extra, dtype=np.int32, count=len(extra))])
+        return row
+
+    def is_following(self, follower_id: int, followee_id: int) -> bool:
+        return self._in_snapshot(follower_id, followee_id) or followee_id in self._overlay.get(follower_id, ())
+
+    def mutual_counts(self, user_id: int, max_friends: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Friends-of-friends of the user with, for each, the number of the user's followees
+        who follow them. Excludes the user and the users they already follow.
+        Returns (candidate ids, mutual counts), unordered.
+        """
+        friends = self.following(user_id)
+        if max_friends is not None:
+            friends = friends[:max_friends]
+        snapshot_friends = friends[friends < len(self.offsets) - 1]
+
+        # Gather every friend's row in one vectorized pass (no per-friend slicing)
+        starts = self.offsets[snapshot_friends].astype(np.int64)
+        lengths = self.offsets[snapshot_friends + 1] - starts
+        total = int(lengths.sum())
+        positions = np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(starts, lengths)
+        candidates = self.neighbors[positions]
+
+        if self._overlay:
+            extra = [
+                followee
+                for friend in self._overlay.keys() & set(friends.tolist())
+                for followee in self._overlay[friend]
+            ]
+            if extra:
+                candidates = np.concatenate([candidates, np.asarray(extra, dtype=np.int32)])
+
+        ids, counts = np.unique(candidates, return_counts=True)
+        keep = ~np.isin(ids, friends) & (ids != user_id)
+        return ids[keep], counts[keep]
+
+    def friends_of_friends(self, user_id: int, limit: int = 5, max_friends: Optional[int] = None) -> List[int]:
+        """Top friend-of-friend candidates by mutual count (ties by lowest id)."""
+        ids, counts = self.mutual_counts(user_id, max_friends)
+        order = np.lexsort((ids, -counts))[:limit]
+        return ids[order].tolist()
+
+    def save(self, path: str):
+        """
+        Writes the snapshot for other workers to memory-map, as one int32 array
+        [len(offsets), *offsets, *neighbors] so it is replaced atomically.
+        """
+        temporary = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(temporary, np.concatenate([np.asarray([len(self.offsets)], dtype=np.int32), self.offsets, self.neighbors]))
+        os.replace(temporary, f"{path}.npy")
+
+    @classmethod
+    def load(cls, path: str) -> "FollowGraph":
+        """Memory-maps a snapshot written by save(); the pages are shared between processes."""
+        data = np.load(f"{path}.npy", mmap_mode="r")
+        rows = int(data[0])
+        graph = cls(data[1:rows + 1], data[rows + 1:])
+        graph.built_at = os.path.getmtime(f"{path}.npy")
+        return graph
+
+
+follow_graph: Optional[FollowGraph] = None
+# Follows seen while a rebuild is in progress, re-applied to the new snapshot
+_pending_follows: Optional[List[Tuple[int, int]]] = None
+_rebuild_task: Optional[asyncio.Task] = None
+
+
+def is_enabled() -> bool:
+    return GRAPH_ENGINE == "csr"
+
+
+def get_follow_graph() -> Optional[FollowGraph]:
+    """The current snapshot, or None when the engine is disabled or not loaded yet."""
+    return follow_graph
+
+
+async def _load_edges() -> np.ndarray:
+    # COPY streams the edge list as text, parsed in a single numpy call
+    async with postgres.acquire_connection() as conn:
+        chunks = []
+
+        async def sink(data: bytes):
+            chunks.append(data)
+
+        await conn.copy_from_query(LOAD_EDGES_QUERY, output=sink)
+    text = b"".join(chunks).decode()
+    if not text.strip():
+        return np.empty((0, 2), dtype=np.int32)
+    return np.fromstring(text, dtype=np.int32, sep=" ").reshape(-1, 2)
+
+
+def _snapshot_is_fresh(path: str) -> bool:
+    try:
+        return time.time() - os.path.getmtime(f"{path}.npy") < FOLLOW_GRAPH_REBUILD_INTERVAL
+    except OSError:
+        return False
+
+
+async def rebuild_follow_graph():
+    """Replaces the snapshot, from the shared file when another worker just wrote it, else from Postgres."""
+    global follow_graph, _pending_follows
+    started = time.perf_counter()
+    _pending_follows = []
+    try:
+        if FOLLOW_GRAPH_SNAPSHOT_PATH and _snapshot_is_fresh(FOLLOW_GRAPH_SNAPSHOT_PATH):
+            graph = await asyncio.to_thread(FollowGraph.load, FOLLOW_GRAPH_SNAPSHOT_PATH)
+            source = "shared snapshot"
+        else:
+            edges = await _load_edges()
+            graph = await asyncio.to_thread(FollowGraph.from_edges, edges)
+            if FOLLOW_GRAPH_SNAPSHOT_PATH:
+                await asyncio.to_thread(graph.save, FOLLOW_GRAPH_SNAPSHOT_PATH)
+            source = "Postgres"
+        # Follows not in the new arrays yet: broadcast during the rebuild, or (for a shared
+        # snapshot written earlier) already in the old overlay. add_follow skips known edges.
+        for follower_id, followee_id in _pending_follows:
+            graph.add_follow(follower_id, followee_id)
+        if follow_graph is not None:
+            for follower_id, followees in follow_graph._overlay.items():
+                for followee_id in followees:
+                    graph.add_follow(follower_id, followee_id)
+        follow_graph = graph
+    finally:
+        _pending_follows = None
+    print(f"Follow graph loaded from {source}: {graph.edge_count} edges in {time.perf_counter() - started:.2f}s.")
+
+
+def _on_follow_added(message: str):
+    follower_id, followee_id = (int(part) for part in message.split(":"))
+    if follow_graph is not None:
+        follow_graph.add_follow(follower_id, followee_id)
+    if _pending_follows is not None:
+        _pending_follows.append((follower_id, followee_id))
+
+
+def _on_reset():
+    # Follows may have been missed while resubscribing; the next rebuild picks them up
+    if follow_graph is not None:
+        follow_graph.built_at = 0
+
+
+async def publish_follow_added(follower_id: int, followee_id: int):
+    """Applies a new follow to the snapshot of every worker."""
+    if is_enabled():
+        await publish(FOLLOW_ADDED_CHANNEL, f"{int(follower_id)}:{int(followee_id)}")
+
+
+async def _run_rebuilds():
+    while True:
+        await asyncio.sleep(min(60, FOLLOW_GRAPH_REBUILD_INTERVAL))
+        if follow_graph is None or time.time() - follow_graph.built_at >= FOLLOW_GRAPH_REBUILD_INTERVAL:
+            try:
+                await rebuild_follow_graph()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Follow graph rebuild error: {e}")
+
+
+async def start_follow_graph():
+    """Loads the first snapshot and starts the periodic rebuilds (GRAPH_ENGINE=csr only)."""
+    global _rebuild_task
+    if not is_enabled() or _rebuild_task is not None:
+        return
+    try:
+        await rebuild_follow_graph()
+    except Exception as e:
+        # Recommendations fall back to Neo4j until a rebuild succeeds
+        print(f"Follow graph load error: {e}")
+    _rebuild_task = asyncio.create_task(_run_rebuilds())
+
+
+async def stop_follow_graph():
+    """Stops the periodic rebuilds."""
+    global _rebuild_task
+    if _rebuild_task is not None:
+        _rebuild_task.cancel()
+        try:
+            await _rebuild_task
+        except asyncio.CancelledError:
+            pass
+        _rebuild_task = None
+
+
+register_channel(FOLLOW_ADDED_CHANNEL, _on_follow_added, _on_reset)
@@ -12,6 +12,13 @@ PASSWORD = os.getenv("NEO4J_PASSWORD")
 
 driver: AsyncGraphDatabase.driver = None
 
+# Uniqueness constraints also create the backing range indexes, so {id: $id} lookups
+# and MERGEs are index seeks instead of label scans.
+CONSTRAINT_QUERIES = [
+    "CREATE CONSTRAINT user_id_unique IF NOT EXISTS FOR (u:User) REQUIRE u.id IS UNIQUE",
+    "CREATE CONSTRAINT book_id_unique IF NOT EXISTS FOR (b:Book) REQUIRE b.id IS UNIQUE",
+]
+
 async def connect_neo4j():
     """Initializes the Neo4j driver."""
     global driver
@@ -20,6 +27,18 @@ async def connect_neo4j():
     # Test connection
     await driver.verify_connectivity()
     print("Neo4j driver established.")
+    await ensure_constraints()
+
+async def ensure_constraints():
+    """Creates the :User(id) and :Book(id) uniqueness constraints if they are missing."""
+    try:
+        async with driver.session() as session:
+            for query in CONSTRAINT_QUERIES:
+                await (await session.run(query)).consume()
+    except Exception as e:
+        # Existing duplicate ids block the constraint; the app still runs, just without the index
+        print(f"Neo4j constraint creation failed: {e}")
+        print("Run 'python -m scripts.normalize_neo4j_ids' to merge duplicate and string-typed ids.")
 
 async def close_neo4j():
     """Closes the Neo4j driver."""
@@ -32,16 +51,6 @@ async def get_neo4j_driver():
     if driver:
         yield driver
 
-async def create_user_node(driver: AsyncDriver, user_id: int):
-    """Creates a User node in Neo4j, ensuring the ID is treated as an INTEGER."""
-    query = """
-    CREATE (:User {id: toInteger($user_id)})
-    """
-    async with driver.session() as session:
-        # Pass the ID as an integer, and Cypher converts it to an integer property
-        await session.run(query, user_id=int(user_id)) 
-        print(f"Neo4j: Created User node for ID {user_id}")
-
 # ... (get_neo4j_driver dependency remains the same)
 def get_neo4j_driver_direct():
     """Returns the globally connected Neo4j driver for service layer use."""
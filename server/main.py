@@ -1,16 +1,24 @@
 # main.py
-from fastapi import FastAPI
-from db.postgres import connect_postgres, close_postgres
+from fastapi import FastAPI, Request, status
+from fastapi.responses import ORJSONResponse
+from db.postgres import connect_postgres, close_postgres, PoolAcquireTimeoutError
 from db.mongo import connect_mongo, close_mongo
 from cache.redis import connect_redis, close_redis
+from cache.invalidation import start_invalidation_listener, stop_invalidation_listener
 from graph.neo4j import connect_neo4j, close_neo4j
+from graph.follow_graph import start_follow_graph, stop_follow_graph
+from services.hashing_service import start_hashing_pool, stop_hashing_pool
+from services.autocomplete_service import load_prefix_index
+from services.graph_sync_service import start_graph_sync_worker, stop_graph_sync_worker
+from services.recommendation_service import start_recommendation_refresher, stop_recommendation_refresher
 from starlette.middleware.cors import CORSMiddleware
 from routes.auth import auth_router
 from routes.books import book_router
 from routes.follows import follow_router
+from routes.metrics import metrics_router
 import asyncio
 
-app = FastAPI(title="Polyglot Goodreads Clone MVP")
+app = FastAPI(title="Polyglot Goodreads Clone MVP", default_response_class=ORJSONResponse)
 
 # --- CORS Configuration ---
 origins = [
@@ -24,29 +32,48 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all HTTP methods (GET, POST, OPTIONS, etc.)
     allow_headers=["*"],  # Allows all headers (Authorization, Content-Type, etc.)
+    # Lets the browser read pagination cursors and rate limit state
+    expose_headers=["X-Next-Cursor", "X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset", "Retry-After"],
 )
 
+# --- Error Handlers ---
+@app.exception_handler(PoolAcquireTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolAcquireTimeoutError):
+    """The Postgres pool is exhausted: tell the client to retry instead of hanging."""
+    return ORJSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database is busy, please try again."},
+        headers={"Retry-After": "1"},
+    )
+
 # --- Register Routes ---
 app.include_router(auth_router)
 app.include_router(book_router)
 app.include_router(follow_router)
+app.include_router(metrics_router)
 
 # --- Startup and Shutdown Events ---
 @app.on_event("startup")
 async def startup_db_client():
     """Connects to all databases on application startup."""
     print("Starting up...")
+    start_hashing_pool()
     
     # Connect to the faster databases first
     await connect_postgres()
     await connect_mongo()
     await connect_redis()
+    await start_invalidation_listener()
+    await load_prefix_index()
+    await start_follow_graph()
     
     # 🌟 NEW: Wait 5 seconds for Neo4j to be fully ready
     print("Waiting 5 seconds for Neo4j initialization...")
     await asyncio.sleep(5)
     
     await connect_neo4j() # <-- Neo4j connection attempt here
+    await start_graph_sync_worker()
+    await start_recommendation_refresher()
     
     print("All databases connected.")
 
@@ -54,10 +81,15 @@ async def startup_db_client():
 async def shutdown_db_client():
     """Closes all database connections on application shutdown."""
     print("Shutting down...")
+    await stop_recommendation_refresher()
+    await stop_graph_sync_worker()
+    await stop_follow_graph()
     await close_postgres()
     await close_mongo()
+    await stop_invalidation_listener()
     await close_redis()
     await close_neo4j()
+    stop_hashing_pool()
     print("All databases closed.")
 
 # --- Root Endpoint (for testing) ---
@@ -1,8 +1,9 @@
 # models/book.py
 from pydantic import BaseModel, Field, conint, BeforeValidator
-from typing import Optional
+from typing import List, Optional
 from bson import ObjectId
 from typing_extensions import Annotated
+from models.review import BookRatingStats
 
 # ----------------------------------------------------------------------
 # Helper function for Pydantic V2: Converts the MongoDB ObjectId to a string
@@ -34,6 +35,8 @@ class BookInDB(BookCreate):
     # 'alias="_id"' ensures that when MongoDB returns the document, 
     # the '_id' field maps correctly to the 'id' field in the model.
     id: MongoId = Field(..., alias="_id")
+    # Only filled when requested with ?include=stats
+    rating_stats: Optional[BookRatingStats] = None
 
     class Config:
         populate_by_name = True
@@ -46,4 +49,15 @@ class BookInDB(BookCreate):
                 "publication_year": 2024,
                 "cover_url": "http://example.com/cover.jpg"
             }
-        }
\ No newline at end of file
+        }
+
+# Batch lookup output model (GET /books/batch)
+class BookBatch(BaseModel):
+    books: List[BookInDB] = Field(..., description="Found books, in the requested order")
+    missing: List[str] = Field(..., description="Requested ids that are unknown or invalid")
+
+# Autocomplete output model (served from the in-memory prefix index)
+class BookSuggestion(BaseModel):
+    id: str
+    title: str
+    author: str
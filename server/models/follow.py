@@ -1,8 +1,34 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 
 class FollowRecord(BaseModel):
     follower_id: int = Field(..., description="The ID of the user initiating the follow.")
     followee_id: int = Field(..., description="The ID of the user being followed.")
-    created_at: Optional[datetime] = None
\ No newline at end of file
+    created_at: Optional[datetime] = None
+
+# Follower / following list entry (GET /users/{user_id}/followers, /following)
+class FollowListEntry(BaseModel):
+    user_id: int = Field(..., description="The follower (or followee) in the list.")
+    followed_at: Optional[datetime] = None
+    username: Optional[str] = Field(None, description="Only with expand=user.")
+
+# Batch recommendation request (POST /users/recommendations/batch, /users/recommendations/books/batch)
+class RecommendationBatchRequest(BaseModel):
+    user_ids: List[int] = Field(..., min_length=1, max_length=10000, description="Users to compute recommendations for.")
+    limit: int = Field(5, ge=1, le=100, description="Recommendations per user.")
+    chunk_size: Optional[int] = Field(None, ge=1, le=2000, description="Users per graph query (server default if omitted).")
+    concurrency: Optional[int] = Field(None, ge=1, le=16, description="Graph queries in flight (server default if omitted).")
+
+# Batch follow status (POST /users/follow/status)
+class FollowStatusBatchRequest(BaseModel):
+    user_ids: List[int] = Field(..., min_length=1, max_length=500, description="Users to check the follow status for.")
+
+class FollowStatusBatch(BaseModel):
+    following: Dict[int, bool] = Field(..., description="Whether the authenticated user follows each requested user.")
+
+# Follow counters output model (GET /users/{user_id}/stats)
+class UserStats(BaseModel):
+    user_id: int
+    followers_count: int
+    following_count: int
@@ -0,0 +1,19 @@
+# models/ingest.py
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class IngestRowError(BaseModel):
+    row: int = Field(..., description="1-based data row number in the source file")
+    isbn: Optional[str] = None
+    error: str
+
+# Bulk ingest output model (progress and final report)
+class IngestReport(BaseModel):
+    rows_read: int = 0
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    graph_nodes_merged: int = 0
+    elapsed_seconds: float = 0.0
+    rows_per_second: float = 0.0
+    errors: List[IngestRowError] = Field(default_factory=list, description="First errors only, see 'failed' for the total")
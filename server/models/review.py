@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, conint
-from typing import Optional
+from typing import Optional, Dict
 from datetime import datetime
 
 # Review input model (for POST)
@@ -12,4 +12,11 @@ class ReviewInDB(ReviewCreate):
     id: int
     user_id: int
     book_id: str
-    created_at: datetime
\ No newline at end of file
+    created_at: datetime
+
+# Rating aggregates output model (GET /books/{book_id}/stats)
+class BookRatingStats(BaseModel):
+    book_id: str
+    rating_count: int
+    average_rating: Optional[float] = Field(None, description="None until the book has a rating")
+    histogram: Dict[str, int] = Field(..., description="Number of ratings per star, keys '1' to '5'")
@@ -23,4 +23,8 @@ class UserInDB(BaseModel):
 
     class Config:
         # Allows ORM objects (like rows from asyncpg) to map to the model
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+# Used for GET /users/search output
+class UserSearchResult(BaseModel):
+    id: int
+    username: str
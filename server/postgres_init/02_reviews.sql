@@ -0,0 +1,15 @@
+-- Reviews table (previously created by hand, see raw/postgres.txt).
+-- Safe to re-run against an existing database.
+CREATE TABLE IF NOT EXISTS reviews (
+  id SERIAL PRIMARY KEY,
+  user_id INT REFERENCES users(id) ON DELETE CASCADE NOT NULL,
+  book_id TEXT NOT NULL,
+  rating SMALLINT CHECK (rating >= 1 AND rating <= 5) NOT NULL,
+  review_text TEXT,
+  created_at TIMESTAMP DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_reviews_book_user ON reviews (book_id, user_id);
+
+ALTER TABLE reviews OWNER TO goodreads_user;
+GRANT USAGE, SELECT ON ALL SEQUENCES IN SCHEMA public TO goodreads_user;
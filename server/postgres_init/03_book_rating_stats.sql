@@ -0,0 +1,25 @@
+-- Per-book rating aggregates, maintained in the same transaction as each review insert.
+-- Rebuild from reviews with: python -m scripts.rebuild_rating_stats
+CREATE TABLE IF NOT EXISTS book_rating_stats (
+  book_id TEXT PRIMARY KEY,
+  rating_count INT NOT NULL DEFAULT 0,
+  rating_sum BIGINT NOT NULL DEFAULT 0,
+  rating_1 INT NOT NULL DEFAULT 0,
+  rating_2 INT NOT NULL DEFAULT 0,
+  rating_3 INT NOT NULL DEFAULT 0,
+  rating_4 INT NOT NULL DEFAULT 0,
+  rating_5 INT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP DEFAULT now()
+);
+
+ALTER TABLE book_rating_stats OWNER TO goodreads_user;
+
+-- Backfill from existing reviews
+INSERT INTO book_rating_stats (book_id, rating_count, rating_sum, rating_1, rating_2, rating_3, rating_4, rating_5)
+SELECT book_id, COUNT(*), SUM(rating),
+       COUNT(*) FILTER (WHERE rating = 1), COUNT(*) FILTER (WHERE rating = 2),
+       COUNT(*) FILTER (WHERE rating = 3), COUNT(*) FILTER (WHERE rating = 4),
+       COUNT(*) FILTER (WHERE rating = 5)
+FROM reviews
+GROUP BY book_id
+ON CONFLICT (book_id) DO NOTHING;
@@ -0,0 +1,5 @@
+-- Backs keyset pagination of GET /books/{book_id}/reviews:
+--   WHERE book_id = $1 AND (created_at, id) < ($2, $3) ORDER BY created_at DESC, id DESC
+-- CONCURRENTLY avoids blocking review writes when applied to a live database.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reviews_book_created_id
+  ON reviews (book_id, created_at DESC, id DESC);
@@ -0,0 +1,16 @@
+-- Transactional outbox for Neo4j writes. Rows are inserted in the same transaction as the
+-- relational change and drained in batches by services/graph_sync_service.py.
+CREATE TABLE IF NOT EXISTS graph_outbox (
+  id BIGSERIAL PRIMARY KEY,
+  event_type TEXT NOT NULL,
+  payload JSONB NOT NULL,
+  attempts INT NOT NULL DEFAULT 0,
+  last_error TEXT,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  available_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_graph_outbox_available ON graph_outbox (available_at, id);
+
+ALTER TABLE graph_outbox OWNER TO goodreads_user;
+GRANT USAGE, SELECT ON ALL SEQUENCES IN SCHEMA public TO goodreads_user;
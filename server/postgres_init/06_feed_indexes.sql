@@ -0,0 +1,7 @@
+-- Backs the home feed (services/feed_service.py):
+--   fan-out looks up an author's followers:  WHERE followee_id = $1
+--   the feed backfill reads each followee's latest reviews:  WHERE user_id = $1 ORDER BY id DESC
+-- The followee index is composite so it also serves the keyset-paginated followers list (08).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_follows_followee_created
+  ON follows (followee_id, created_at DESC, follower_id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reviews_user_id ON reviews (user_id, id DESC);
@@ -0,0 +1,21 @@
+-- Per-user follow counters, maintained in the same statement as each follow insert.
+-- Every update bumps version, which orders the cached copies (cache/user_stats_cache.py).
+-- Rebuild from follows with: python -m scripts.rebuild_user_stats
+CREATE TABLE IF NOT EXISTS user_stats (
+  user_id INT PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+  followers_count INT NOT NULL DEFAULT 0,
+  following_count INT NOT NULL DEFAULT 0,
+  version BIGINT NOT NULL DEFAULT 1,
+  updated_at TIMESTAMP DEFAULT now()
+);
+
+ALTER TABLE user_stats OWNER TO goodreads_user;
+
+-- Backfill from existing follows
+INSERT INTO user_stats (user_id, followers_count, following_count)
+SELECT u.id, COALESCE(followers.count, 0), COALESCE(following.count, 0)
+FROM users u
+LEFT JOIN (SELECT followee_id, COUNT(*) AS count FROM follows GROUP BY followee_id) followers ON followers.followee_id = u.id
+LEFT JOIN (SELECT follower_id, COUNT(*) AS count FROM follows GROUP BY follower_id) following ON following.follower_id = u.id
+WHERE followers.count IS NOT NULL OR following.count IS NOT NULL
+ON CONFLICT (user_id) DO NOTHING;
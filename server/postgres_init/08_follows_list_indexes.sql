@@ -0,0 +1,8 @@
+-- Back keyset pagination of the follower / following lists:
+--   GET /users/{id}/followers  WHERE followee_id = $1 AND (created_at, follower_id) < ($2, $3)
+--   GET /users/{id}/following  WHERE follower_id = $1 AND (created_at, followee_id) < ($2, $3)
+--   ORDER BY created_at DESC, <other user> DESC
+-- The followers list reads idx_follows_followee_created, created with the feed indexes (06).
+-- CONCURRENTLY avoids blocking follows when applied to a live database.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_follows_follower_created
+  ON follows (follower_id, created_at DESC, followee_id DESC);
@@ -0,0 +1,13 @@
+-- Back GET /users/search (username search with typeahead):
+--   prefix matches: lower(username) COLLATE "C" in [query, next string), read in index order
+--   fuzzy matches:  username % $1 (queries of 3+ characters), ranked by similarity
+-- The btree serves prefix matches, including one and two character prefixes that yield too
+-- few trigrams to be selective, already sorted so a page is a LIMITed index range scan.
+-- The trigram GIN index serves the fuzzy candidates.
+-- The extension is created by the init superuser; CONCURRENTLY avoids blocking signups.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_username_trgm
+  ON users USING gin (username gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_username_lower_c
+  ON users ((lower(username) COLLATE "C"), id);
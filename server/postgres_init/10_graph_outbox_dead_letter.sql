@@ -0,0 +1,13 @@
+-- Outbox events that kept failing (GRAPH_SYNC_MAX_ATTEMPTS) are moved here, out of the drain,
+-- for inspection. Counted by GET /metrics/graph-sync; requeue by inserting them back into graph_outbox.
+CREATE TABLE IF NOT EXISTS graph_outbox_dead (
+  id BIGINT PRIMARY KEY,
+  event_type TEXT NOT NULL,
+  payload JSONB NOT NULL,
+  attempts INT NOT NULL,
+  last_error TEXT,
+  created_at TIMESTAMPTZ NOT NULL,
+  dead_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+ALTER TABLE graph_outbox_dead OWNER TO goodreads_user;
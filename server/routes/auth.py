@@ -1,13 +1,12 @@
 # routes/auth.py
 from fastapi import APIRouter, Depends, HTTPException, status
-from asyncpg import Connection
 from models.user import UserCreate, UserLogin, UserInDB
 from services import auth_service
-from db.postgres import get_db
-from graph.neo4j import create_user_node, get_neo4j_driver
-from neo4j import AsyncDriver
+from services.hashing_service import HashingUnavailableError
+from db.postgres import get_db, LazyConnection
 from services import auth_service
-from utils.rate_limiter import rate_limit
+from utils.rate_limiter import rate_limit, signup_rate_limit
+from utils.auth_bearer import JWTBearer
 from typing import Optional
 from fastapi.security import OAuth2PasswordRequestForm 
 
@@ -15,7 +14,7 @@ auth_router = APIRouter(prefix="/auth", tags=["Auth"])
 
 # --- Endpoint 1: Signup ---
 @auth_router.post("/signup", response_model=UserInDB, status_code=status.HTTP_201_CREATED)
-async def signup(user_data: UserCreate, db: Connection = Depends(get_db), graph_driver: AsyncDriver = Depends(get_neo4j_driver)):
+async def signup(user_data: UserCreate, db: LazyConnection = Depends(get_db), rate_check: None = Depends(signup_rate_limit)):
     # 1. Check if user already exists
     if await auth_service.get_user_by_email(db, user_data.email):
         raise HTTPException(
@@ -23,8 +22,15 @@ async def signup(user_data: UserCreate, db: Connection = Depends(get_db), graph_
             detail="Email already registered"
         )
     
-    # 2. Create user row in Postgres
-    new_user = await auth_service.create_user(db, user_data)
+    # 2. Create user row in Postgres (password is hashed in the process pool)
+    # The (:User) node is queued in the same transaction and synced to Neo4j in the background
+    try:
+        new_user = await auth_service.create_user(db, user_data)
+    except HashingUnavailableError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again."
+        )
     
     if not new_user:
         raise HTTPException(
@@ -32,18 +38,23 @@ async def signup(user_data: UserCreate, db: Connection = Depends(get_db), graph_
             detail="Failed to create user."
         )
 
-    # 3. Create (:User) node in Neo4j (Event 1)
-    await create_user_node(graph_driver, new_user.id)
-    
     return new_user
 
 # --- Endpoint 2: Login (Minimal version for now) ---
 @auth_router.post("/login")
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Connection = Depends(get_db), rate_check: None = Depends(rate_limit)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: LazyConnection = Depends(get_db), rate_check: None = Depends(rate_limit)):
     # 1. Verify password in Postgres
     user = await auth_service.get_user_by_email(db, form_data.username)
-    
-    if not user or not auth_service.verify_password(form_data.password, user.password_hash):
+
+    try:
+        password_ok = user is not None and await auth_service.verify_password(form_data.password, user.password_hash)
+    except HashingUnavailableError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again."
+        )
+
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -58,4 +69,18 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Connection
     "token": token, # Use 'token' key if that is what the frontend expects
     "access_token": token, # Include the standard OAuth key as well, for robustness
     "token_type": "bearer" # Standard OAuth key
-}
\ No newline at end of file
+}
+
+# --- Endpoint 3: Logout ---
+@auth_router.post("/logout")
+async def logout(token_payload: dict = Depends(JWTBearer())):
+    """Revokes the current session on every worker."""
+    await auth_service.revoke_user_session(token_payload["user_id"], token_payload["jti"])
+    return {"message": "Logout successful"}
+
+# --- Endpoint 4: Logout everywhere ---
+@auth_router.post("/logout/all")
+async def logout_all(token_payload: dict = Depends(JWTBearer())):
+    """Revokes every active session of the authenticated user."""
+    revoked = await auth_service.revoke_all_user_sessions(token_payload["user_id"])
+    return {"message": "Logged out of all sessions", "revoked_sessions": revoked}
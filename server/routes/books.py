@@ -1,17 +1,20 @@
 # routes/books.py
-from fastapi import APIRouter, Body, HTTPException, status, Depends, Path
-from models.book import BookCreate, BookInDB
-from models.review import ReviewCreate, ReviewInDB 
-from services import book_service, review_service, follow_service # All services in one line
-from db.postgres import get_db
-from asyncpg import Connection
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, Body, HTTPException, status, Depends, Path, File, Query, Response, UploadFile
+from models.book import BookCreate, BookInDB, BookSuggestion, BookBatch
+from models.ingest import IngestReport
+from models.review import ReviewCreate, ReviewInDB, BookRatingStats
+from services import book_service, review_service, follow_service, ingest_service, autocomplete_service, feed_service # All services in one line
+from db.postgres import get_db, LazyConnection
+from typing import List, Literal, Optional
+import io
 from utils.auth_bearer import JWTBearer  # Import JWT authentication
+from utils.rate_limiter import api_rate_limit, write_rate_limit
+from utils.responses import fast_json_response
 
-book_router = APIRouter(prefix="/books", tags=["Books & Reviews"])
+book_router = APIRouter(prefix="/books", tags=["Books & Reviews"], dependencies=[Depends(api_rate_limit)])
 
 # --- Endpoint 1: Create a Book (MongoDB) ---
-@book_router.post("/", response_model=BookInDB, status_code=status.HTTP_201_CREATED)
+@book_router.post("/", response_model=BookInDB, status_code=status.HTTP_201_CREATED, dependencies=[Depends(write_rate_limit)])
 async def create_new_book(book_data: BookCreate):
     """Creates a new book record in MongoDB."""
     
@@ -22,12 +25,92 @@ async def create_new_book(book_data: BookCreate):
             status_code=status.HTTP_409_CONFLICT,
             detail="A book with this ISBN already exists or insertion failed."
         )
+
+    # Make the new title available to autocomplete on every worker
+    await autocomplete_service.publish_books_added([(new_book.id, new_book.title, new_book.author)])
         
     return new_book
 
+# --- Endpoint 1b: Bulk Ingest Books (MongoDB + Neo4j) ---
+@book_router.post(
+    "/ingest",
+    response_model=IngestReport,
+    dependencies=[Depends(JWTBearer()), Depends(write_rate_limit)]
+)
+async def ingest_books_endpoint(
+    file: UploadFile = File(..., description="CSV (with header) or NDJSON file of books"),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="Defaults to the file extension"),
+    chunk_size: int = Query(ingest_service.DEFAULT_CHUNK_SIZE, ge=1, le=10000)
+):
+    """Streams a catalog file into MongoDB (upserts by ISBN) and Neo4j in chunks."""
+    try:
+        fmt = format or ingest_service.detect_format(file.filename or "")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # The upload is spooled to disk by Starlette; it is read back one line at a time
+    stream = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    try:
+        return await ingest_service.ingest_books(stream, fmt, chunk_size=chunk_size)
+    finally:
+        stream.detach()
+
+# --- Endpoint 1c: Full-text Search (MongoDB text index) ---
+@book_router.get("/search", response_model=List[BookInDB])
+async def search_books_endpoint(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=50),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page")
+):
+    """Searches books by title and author, most relevant first."""
+    try:
+        books, next_cursor = await book_service.search_books(q, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    # Trusted Mongo output: skip re-validation through response_model
+    return fast_json_response(books, response)
+
+# --- Endpoint 1d: Autocomplete (in-memory prefix index) ---
+@book_router.get("/autocomplete", response_model=List[BookSuggestion])
+async def autocomplete_books(
+    prefix: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=20)
+):
+    """Title/author suggestions for a typed prefix. Served from memory, no database round trip."""
+    return autocomplete_service.autocomplete(prefix, limit)
+
+# --- Endpoint 1e: Batch Lookup (MongoDB, one $in query) ---
+MAX_BATCH_IDS = 100
+
+@book_router.get("/batch", response_model=BookBatch)
+async def get_books_batch(
+    response: Response,
+    ids: List[str] = Query(..., description="Comma-separated Mongo IDs (the parameter may also be repeated)")
+):
+    """Retrieves many books in one request, in the requested order, reporting missing ids."""
+    book_ids = [book_id.strip() for value in ids for book_id in value.split(",") if book_id.strip()]
+    if not book_ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No book ids given.")
+    if len(book_ids) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BATCH_IDS} book ids per request."
+        )
+
+    books, missing = await book_service.get_books_by_ids(book_ids)
+    return fast_json_response({"books": books, "missing": missing}, response)
+
 # --- Endpoint 2: Get a Book by ID (MongoDB) ---
 @book_router.get("/{book_id}", response_model=BookInDB)
-async def get_book_details(book_id: str):
+async def get_book_details(
+    book_id: str,
+    db: LazyConnection = Depends(get_db),
+    include: Optional[Literal["stats"]] = Query(None, description="'stats' embeds the book's rating aggregates")
+):
     """Retrieves details for a single book by its Mongo ID."""
     
     book = await book_service.get_book_by_id(book_id)
@@ -37,58 +120,109 @@ async def get_book_details(book_id: str):
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Book with ID {book_id} not found."
         )
+
+    if include == "stats":
+        # Copy so the cached instance is left untouched
+        stats = await review_service.get_book_rating_stats(db, book.id)
+        book = book.model_copy(update={"rating_stats": BookRatingStats(**stats)})
         
     return book
 
+# --- Endpoint 2b: Rating Aggregates (Postgres, O(1) per book) ---
+@book_router.get("/{book_id}/stats", response_model=BookRatingStats)
+async def get_book_stats(
+    book_id: str = Path(..., description="The Mongo ID of the book"),
+    db: LazyConnection = Depends(get_db)
+):
+    """Average rating, rating count and 1-5 star histogram of a book."""
+    return await review_service.get_book_rating_stats(db, book_id)
+
 # --- Endpoint 3: List Books (MongoDB) ---
 @book_router.get("/", response_model=List[BookInDB])
-async def list_all_books(limit: int = 10, skip: int = 0):
-    """Lists all books, paginated."""
-    return await book_service.list_books(limit, skip)
+async def list_all_books(
+    response: Response,
+    db: LazyConnection = Depends(get_db),
+    include: Optional[Literal["stats"]] = Query(None, description="'stats' embeds each book's rating aggregates"),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    sort: str = Query("_id", pattern="^(_id|publication_year|title)$"),
+    skip: int = Query(0, ge=0, deprecated=True, description="Deprecated: use 'cursor'. Ignored when a cursor is given.")
+):
+    """
+    Lists all books, paginated by keyset cursor.
+    The cursor of the next page is returned in the X-Next-Cursor header (absent on the last page).
+    """
+    try:
+        books, next_cursor = await book_service.list_books(limit, skip, cursor, sort)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if include == "stats":
+        # One query for the whole page
+        stats = await review_service.get_rating_stats_for_books(db, [book["_id"] for book in books])
+        for book in books:
+            book["rating_stats"] = stats[book["_id"]]
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    # Trusted Mongo output: skip re-validation through response_model
+    return fast_json_response(books, response)
 
 # --- Endpoint 4: Post Review (Postgres + Neo4j Polyglot Write) ---
 @book_router.post(
     "/{book_id}/reviews", 
     response_model=ReviewInDB, 
-    status_code=status.HTTP_201_CREATED
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(write_rate_limit)]
 )
 async def post_review(
+    background_tasks: BackgroundTasks,
     book_id: str = Path(..., description="The Mongo ID of the book"),
     review_data: ReviewCreate = Body(...),
-    db: Connection = Depends(get_db),
+    db: LazyConnection = Depends(get_db),
     token_payload: dict = Depends(JWTBearer())  # JWT authentication
 ):
     """
-    Allows a user to post a review (Postgres) and updates the Neo4j RATED graph.
+    Allows a user to post a review (Postgres) and queues the Neo4j RATED graph update.
     """
     user_id = token_payload.get("user_id")  # Extract user_id from JWT token
 
-    # 1. Check if the book exists in Mongo
-    if await book_service.get_book_by_id(book_id) is None:
+    # 1. Check if the book exists (book cache, then an _id-only Mongo lookup)
+    if not await book_service.book_exists(book_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Book with ID {book_id} not found.")
         
     # 2. Create the review in Postgres (Transactional Write)
+    # The Neo4j :RATED edge is queued in the same transaction and synced in the background
     new_review = await review_service.create_review(db, user_id, book_id, review_data)
     
     if new_review is None:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to submit review.")
+
+    # 3. Push the review into followers' home feeds after the response is sent
+    background_tasks.add_task(feed_service.fan_out_review, new_review)
         
-    # 3. POLYGLOT WRITE: Update Neo4j Graph
-    # The service function handles driver retrieval and session context internally.
-    await follow_service.handle_rated_polyglot_write(
-        user_id=user_id,
-        book_id=book_id,
-        rating=review_data.rating
-    )
-    
     return new_review
 
 # --- Endpoint 5: List Reviews (Postgres) ---
 @book_router.get("/{book_id}/reviews", response_model=List[ReviewInDB])
 async def list_reviews(
+    response: Response,
     book_id: str = Path(..., description="The Mongo ID of the book"),
-    db: Connection = Depends(get_db),
-    limit: int = 10, skip: int = 0
+    db: LazyConnection = Depends(get_db),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    skip: int = Query(0, ge=0, deprecated=True, description="Deprecated: use 'cursor'. Ignored when a cursor is given.")
 ):
-    """Lists all reviews for a specific book."""
-    return await review_service.get_reviews_for_book(db, book_id, limit, skip)
\ No newline at end of file
+    """
+    Lists all reviews for a specific book, newest first, paginated by keyset cursor.
+    The cursor of the next page is returned in the X-Next-Cursor header (absent on the last page).
+    """
+    try:
+        reviews, next_cursor = await review_service.get_reviews_for_book(db, book_id, limit, skip, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    # Trusted Postgres rows: skip re-validation through response_model
+    return fast_json_response(reviews, response)
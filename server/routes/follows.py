@@ -1,21 +1,78 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Path
+from fastapi import APIRouter, Depends, HTTPException, status, Path, Query, Response
+from fastapi.responses import StreamingResponse
+import orjson
+from services import follow_service, book_service, feed_service, recommendation_service, item_recommendation_service, user_search_service
+from db.postgres import get_db, LazyConnection, PoolAcquireTimeoutError
+from models.follow import FollowRecord, RecommendationBatchRequest, FollowStatusBatchRequest, FollowStatusBatch, UserStats, FollowListEntry
 from services import follow_service
-from db.postgres import get_db
-from asyncpg import Connection
-from models.follow import FollowRecord
-from services import follow_service
-from typing import List
+from models.book import BookInDB
+from models.review import ReviewInDB
+from models.user import UserSearchResult
+from typing import List, Literal, Optional, Union
 from utils.auth_bearer import JWTBearer
+from utils.rate_limiter import api_rate_limit, write_rate_limit
+from utils.responses import fast_json_response, raw_json_response
 
-follow_router = APIRouter(prefix="/users", tags=["Social Graph"])
+follow_router = APIRouter(prefix="/users", tags=["Social Graph"], dependencies=[Depends(api_rate_limit)])
 
 # Test User ID (Replace with actual Auth/JWT dependency later)
 HARDCODED_FOLLOWER_ID = 2
 
-@follow_router.post("/{followee_id}/follow", response_model=FollowRecord)
+@follow_router.get("/me/feed", response_model=List[ReviewInDB])
+async def get_feed_endpoint(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    token_data: dict = Depends(JWTBearer())
+):
+    """
+    Home feed: recent reviews from the users the authenticated user follows, newest first.
+    Served from the user's Redis sorted set; the entries are stored serialized and returned as is.
+    The cursor of the next page is returned in the X-Next-Cursor header (absent on the last page).
+    """
+    user_id = token_data.get("user_id")
+
+    try:
+        entries, next_cursor = await feed_service.get_feed(user_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        print(f"Feed endpoint error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve feed."
+        )
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return raw_json_response("[" + ",".join(entries) + "]", response)
+
+@follow_router.get("/search", response_model=List[UserSearchResult])
+async def search_users_endpoint(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=user_search_service.MAX_QUERY_LENGTH),
+    db: LazyConnection = Depends(get_db),
+    limit: int = Query(10, ge=1, le=user_search_service.CACHED_MATCHES),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page")
+):
+    """
+    Searches users by username: prefix matches first, then fuzzy (trigram) matches, most similar first.
+    The cursor of the next page is returned in the X-Next-Cursor header (absent on the last page).
+    """
+    try:
+        users, next_cursor = await user_search_service.search_users(db, q, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    # Trusted Postgres rows: skip re-validation through response_model
+    return fast_json_response(users, response)
+
+@follow_router.post("/{followee_id}/follow", response_model=FollowRecord, dependencies=[Depends(write_rate_limit)])
 async def follow_user_endpoint(
     followee_id: int = Path(..., description="The ID of the user to follow"),
-    db: Connection = Depends(get_db),
+    db: LazyConnection = Depends(get_db),
     token_data: dict = Depends(JWTBearer())
 ):
     """
@@ -41,6 +98,8 @@ async def follow_user_endpoint(
         if record:
             return record
         
+    except PoolAcquireTimeoutError:
+        raise  # Answered with a 503 by the app's handler
     except Exception as e:
         print(f"Follow endpoint error: {e}")
         raise HTTPException(
@@ -51,13 +110,102 @@ async def follow_user_endpoint(
     # Handle the case where the follow already existed, but Neo4j merged it successfully
     return FollowRecord(follower_id=follower_id, followee_id=followee_id)
 
+async def _ndjson(items):
+    async for item in items:
+        yield orjson.dumps(item) + b"\n"
+
+def _batch_options(batch: RecommendationBatchRequest) -> dict:
+    return {
+        "chunk_size": batch.chunk_size or recommendation_service.RECS_BATCH_CHUNK_SIZE,
+        "concurrency": batch.concurrency or recommendation_service.RECS_BATCH_CONCURRENCY,
+    }
+
+@follow_router.post("/recommendations/batch", dependencies=[Depends(JWTBearer())])
+async def get_recommendations_batch_endpoint(batch: RecommendationBatchRequest):
+    """
+    Follow recommendations for many users in one call (digest and notification jobs).
+    Users are queried in chunks with one UNWIND Cypher query each, cached lists are reused.
+    Streams NDJSON, one {"user_id", "recommendations"} (or {"user_id", "error"}) line per user,
+    in completion order.
+    """
+    items = recommendation_service.stream_follow_recommendations_batch(batch.user_ids, batch.limit, **_batch_options(batch))
+    return StreamingResponse(_ndjson(items), media_type="application/x-ndjson")
+
+@follow_router.post("/recommendations/books/batch", dependencies=[Depends(JWTBearer())])
+async def get_book_recommendations_batch_endpoint(batch: RecommendationBatchRequest):
+    """
+    Social book recommendations (mode=social) for many users in one call, streamed as NDJSON
+    like /users/recommendations/batch.
+    """
+    items = recommendation_service.stream_book_recommendations_batch(batch.user_ids, batch.limit, **_batch_options(batch))
+    return StreamingResponse(_ndjson(items), media_type="application/x-ndjson")
+
+@follow_router.get("/{user_id}/stats", response_model=UserStats)
+async def get_user_stats_endpoint(
+    user_id: int = Path(..., description="The ID of the user"),
+    db: LazyConnection = Depends(get_db)
+):
+    """
+    Follower and following counts of a user (profile pages).
+    Served from counters maintained on every follow, cached in Redis; unknown users count zero.
+    """
+    return await follow_service.get_user_stats(db, user_id)
+
+async def _follow_list(
+    response: Response, db: LazyConnection, user_id: int, direction: str,
+    limit: int, cursor: Optional[str], expand: Optional[str]
+):
+    try:
+        entries, next_cursor = await follow_service.list_follows(
+            db, user_id, direction, limit, cursor, expand_users=expand == "user"
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    # Trusted Postgres rows: skip re-validation through response_model
+    return fast_json_response(entries, response)
+
+@follow_router.get("/{user_id}/followers", response_model=List[FollowListEntry])
+async def list_followers_endpoint(
+    response: Response,
+    user_id: int = Path(..., description="The ID of the user whose followers are listed"),
+    db: LazyConnection = Depends(get_db),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    expand: Optional[Literal["user"]] = Query(None, description="'user' adds each follower's username")
+):
+    """
+    Lists the users following this user, most recent first, paginated by keyset cursor.
+    The cursor of the next page is returned in the X-Next-Cursor header (absent on the last page).
+    """
+    return await _follow_list(response, db, user_id, "followers", limit, cursor, expand)
+
+@follow_router.get("/{user_id}/following", response_model=List[FollowListEntry])
+async def list_following_endpoint(
+    response: Response,
+    user_id: int = Path(..., description="The ID of the user whose followees are listed"),
+    db: LazyConnection = Depends(get_db),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    expand: Optional[Literal["user"]] = Query(None, description="'user' adds each followee's username")
+):
+    """
+    Lists the users this user follows, most recent first, paginated by keyset cursor.
+    The cursor of the next page is returned in the X-Next-Cursor header (absent on the last page).
+    """
+    return await _follow_list(response, db, user_id, "following", limit, cursor, expand)
+
 @follow_router.get("/{user_id}/recommendations", response_model=List[int])
 async def get_recommendations_endpoint(
     user_id: int = Path(..., description="The ID of the user to get recommendations for"),
     limit: int = 5
 ):
     """
-    Retrieves a list of suggested user IDs to follow based on graph analysis.
+    Retrieves a list of suggested user IDs to follow based on graph analysis, best first.
+    Candidates are ranked by mutual follows and shared highly-rated books; the top list is
+    cached per user in Redis and refreshed in the background for active users.
     (Neo4j: Second-degree connections)
     """
     
@@ -66,7 +214,7 @@ async def get_recommendations_endpoint(
     # we use the path user_id for flexibility here.
     
     try:
-        recommendations = await follow_service.get_follow_recommendations(user_id, limit)
+        recommendations = await recommendation_service.get_follow_recommendations(user_id, limit)
         return recommendations
     except Exception as e:
         print(f"Recommendation error: {e}")
@@ -75,19 +223,45 @@ async def get_recommendations_endpoint(
             detail="Failed to retrieve recommendations."
         )
 
-@follow_router.get("/{user_id}/recommendations/books", response_model=List[str])
+@follow_router.get("/{user_id}/recommendations/books", response_model=Union[List[str], List[BookInDB]])
 async def get_book_recommendations_endpoint(
+    response: Response,
     user_id: int = Path(..., description="The ID of the user needing book recommendations"),
-    limit: int = 5
+    limit: int = 5,
+    expand: Optional[Literal["book"]] = Query(None, description="'book' returns full book documents instead of IDs"),
+    mode: Literal["social", "personal", "blend"] = Query(
+        "social", description="'social': rated highly by followees (Neo4j); 'personal': similar to the user's own "
+                              "ratings (precomputed item-item similarities, no Neo4j); 'blend': both, rank-fused"
+    ),
+    db: LazyConnection = Depends(get_db)
 ):
     """
-    Retrieves a list of recommended Book IDs based on highly-rated books from followed users.
+    Retrieves a list of recommended Book IDs based on highly-rated books from followed users,
+    on books similar to the user's own ratings, or on a blend of both (see 'mode').
+    With expand=book, the books are hydrated from MongoDB in one batch query (unknown ids are dropped).
     (Neo4j: Collaborative Filtering)
     """
     
     try:
-        recommendations = await follow_service.get_book_recommendations(user_id, limit)
+        if mode == "social":
+            recommendations = await follow_service.get_book_recommendations(user_id, limit)
+        elif mode == "personal":
+            recommendations = await item_recommendation_service.get_personal_recommendations(db, user_id, limit)
+        else:
+            # Wider candidate lists give the fusion something to work with
+            personal = await item_recommendation_service.get_personal_recommendations(db, user_id, limit * 2)
+            try:
+                social = await follow_service.get_book_recommendations(user_id, limit * 2)
+            except Exception as e:
+                print(f"Social signal unavailable, serving personal recommendations: {e}")
+                social = []
+            recommendations = item_recommendation_service.blend_rankings(personal, social, limit)
+        if expand == "book":
+            books, _ = await book_service.get_books_by_ids(recommendations)
+            return fast_json_response(books, response)
         return recommendations
+    except PoolAcquireTimeoutError:
+        raise  # Answered with a 503 by the app's handler
     except Exception as e:
         print(f"Book Recommendation endpoint error: {e}")
         raise HTTPException(
@@ -95,12 +269,42 @@ async def get_book_recommendations_endpoint(
             detail="Failed to retrieve book recommendations."
         )
 
-@follow_router.get("/{followee_id}/follow/status", 
-                response_model=dict,
-                dependencies=[Depends(JWTBearer())]) # <--- PROTECTED ROUTE
+@follow_router.post("/follow/status", response_model=FollowStatusBatch)
+async def check_follow_status_batch_endpoint(
+    batch: FollowStatusBatchRequest,
+    db: LazyConnection = Depends(get_db),
+    token_data: dict = Depends(JWTBearer())
+):
+    """
+    Checks the follow status of the authenticated user towards many users in one request
+    (e.g. every reviewer listed on a page), answered from the cached followee set.
+    """
+    follower_id = token_data.get("user_id")
+
+    if not follower_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token data.")
+
+    followee_ids = list(dict.fromkeys(batch.user_ids))
+    try:
+        following = await follow_service.get_following_statuses(db, follower_id, followee_ids)
+    except PoolAcquireTimeoutError:
+        raise  # Answered with a 503 by the app's handler
+    except Exception as e:
+        print(f"Follow status batch error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to check follow status."
+        )
+
+    # Same convention as the single-user endpoint
+    if follower_id in following:
+        following[follower_id] = True
+    return FollowStatusBatch(following=following)
+
+@follow_router.get("/{followee_id}/follow/status", response_model=dict) # <--- PROTECTED ROUTE
 async def check_follow_status_endpoint(
     followee_id: int = Path(..., description="The ID of the user to check the follow status for"),
-    db: Connection = Depends(get_db),
+    db: LazyConnection = Depends(get_db),
     token_data: dict = Depends(JWTBearer()) # Extract follower ID from JWT
 ):
     """
@@ -120,6 +324,8 @@ async def check_follow_status_endpoint(
         # Call the new service function (to be created below)
         is_following = await follow_service.check_if_following(db, follower_id, followee_id)
         return {"is_following": is_following}
+    except PoolAcquireTimeoutError:
+        raise  # Answered with a 503 by the app's handler
     except Exception as e:
         print(f"Follow status check error: {e}")
         raise HTTPException(
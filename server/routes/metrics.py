@@ -0,0 +1,22 @@
+# routes/metrics.py
+from fastapi import APIRouter
+from cache import book_cache
+from db.postgres import get_pool_metrics
+from services.graph_sync_service import get_graph_sync_metrics
+
+metrics_router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+@metrics_router.get("/cache")
+async def cache_metrics():
+    """Hit/miss counters of the per-worker caches (values are for the worker that answers)."""
+    return {"books": book_cache.get_stats()}
+
+@metrics_router.get("/postgres")
+async def postgres_metrics():
+    """Connection pool occupancy and acquire wait times (values are for the worker that answers)."""
+    return get_pool_metrics()
+
+@metrics_router.get("/graph-sync")
+async def graph_sync_metrics():
+    """Neo4j outbox queue depth, lag and dead-lettered events, plus the answering worker's sync counters."""
+    return await get_graph_sync_metrics()
@@ -0,0 +1,173 @@
+# scripts/build_item_similarities.py
+"""
+Builds the item-item similarity index used by personal book recommendations
+(GET /users/{id}/recommendations/books?mode=personal|blend).
+
+    python -m scripts.build_item_similarities [--k 50] [--memory-mb 512] [--min-ratings 2]
+
+Reads every review into a sparse user x book rating matrix, computes cosine similarities
+between book columns in chunks sized to stay under --memory-mb, keeps the top K per book
+and publishes the arrays under ITEM_SIMILARITY_PATH for the API workers to memory-map.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import numpy as np
+from scipy import sparse
+import db.postgres as postgres
+from services.item_recommendation_service import ITEM_SIMILARITY_PATH, MANIFEST_FILE
+
+# Peak bytes per cell of a similarity chunk: the sparse product (float32 value + int32 index)
+# while it is densified into the float32 block, then the block plus argpartition's int64 indices
+BYTES_PER_CELL = 16
+
+
+async def load_ratings():
+    """
+    Streams (user_id, book_id, rating) out of Postgres with COPY. Each chunk is parsed into
+    numpy arrays as it arrives (a line cut by the chunk boundary is carried over), so memory
+    holds 36 bytes per rating rather than the raw text plus a Python object per field.
+    """
+    parts = []
+    carry = b""
+
+    def parse(lines: bytes):
+        fields = lines.replace(b"\n", b"\t").split(b"\t")
+        parts.append((
+            np.array(fields[0::3]).astype(np.int64),
+            np.array(fields[1::3], dtype="S24"),
+            np.array(fields[2::3]).astype(np.float32),
+        ))
+
+    async def sink(data: bytes):
+        nonlocal carry
+        data = carry + data
+        end = data.rfind(b"\n")
+        carry = data[end + 1:]
+        if end > 0:
+            parse(data[:end])
+
+    async with postgres.db_pool.acquire() as conn:
+        await conn.copy_from_query("SELECT user_id, book_id, rating FROM reviews", output=sink)
+    if carry:
+        parse(carry)
+
+    if not parts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype="S24"), np.zeros(0, dtype=np.float32)
+    user_ids, book_ids, ratings = (np.concatenate(column) for column in zip(*parts))
+    return user_ids, book_ids, ratings
+
+
+def build_matrix(user_ids: np.ndarray, book_ids: np.ndarray, ratings: np.ndarray, min_ratings: int):
+    """Returns (column-normalized user x book CSC matrix, book ids of its columns)."""
+    users, user_index = np.unique(user_ids, return_inverse=True)
+    books, book_index = np.unique(book_ids, return_inverse=True)
+    # Duplicate (user, book) reviews are summed by the constructor; keep the mean rating instead
+    matrix = sparse.csr_matrix((ratings, (user_index, book_index)), shape=(len(users), len(books)), dtype=np.float32)
+    counts = sparse.csr_matrix((np.ones_like(ratings), (user_index, book_index)), shape=matrix.shape, dtype=np.float32)
+    matrix.data /= counts.data
+
+    # Books with too few ratings give noisy similarities
+    rated_by = np.diff(matrix.tocsc().indptr)
+    keep = np.flatnonzero(rated_by >= min_ratings)
+    matrix = matrix.tocsc()[:, keep]
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    matrix = matrix @ sparse.diags(1 / np.maximum(norms, 1e-12))
+    return matrix.tocsc().astype(np.float32), books[keep]
+
+
+def top_k_similarities(matrix, k: int, memory_mb: int):
+    """
+    Cosine top-K per column, one chunk of columns at a time. Chunks are sized from
+    BYTES_PER_CELL so a chunk's similarity block and its temporaries fit the memory budget.
+    """
+    n_books = matrix.shape[1]
+    k = min(k, max(n_books - 1, 1))
+    chunk_size = max(1, memory_mb * 1024 * 1024 // (max(n_books, 1) * BYTES_PER_CELL))
+    neighbors = np.full((n_books, k), -1, dtype=np.int32)
+    similarities = np.zeros((n_books, k), dtype=np.float32)
+    transposed = matrix.T.tocsr()  # A view of the CSC arrays
+
+    for start in range(0, n_books, chunk_size):
+        end = min(start + chunk_size, n_books)
+        # Multiplied as books x chunk so only the chunk's columns are converted to CSR (chunk rows
+        # x the CSC matrix would convert the whole matrix every chunk), then densified transposed
+        block = (transposed @ matrix[:, start:end]).T.toarray()
+        block[np.arange(end - start), np.arange(start, end)] = 0  # No self-similarity
+        # Negated in place: the smallest values are the best scores, without a -block copy
+        np.negative(block, out=block)
+
+        top = np.argpartition(block, k - 1, axis=1)[:, :k] if n_books > k else np.argsort(block, axis=1)[:, :k]
+        top_scores = -np.take_along_axis(block, top, axis=1)
+        del block
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        neighbors[start:end] = np.where(top_scores > 0, top, -1)
+        similarities[start:end] = np.where(top_scores > 0, top_scores, 0)
+    return neighbors, similarities
+
+
+def publish(path: str, book_ids: np.ndarray, neighbors: np.ndarray, similarities: np.ndarray, k: int):
+    """Writes versioned arrays, then swaps the manifest so readers never see a partial build."""
+    os.makedirs(path, exist_ok=True)
+    version = time.strftime("%Y%m%d%H%M%S")
+    files = {
+        "book_ids": f"book_ids-{version}.npy",
+        "neighbors": f"neighbors-{version}.npy",
+        "similarities": f"similarities-{version}.npy",
+    }
+    # Sorted (np.unique order): the API looks ids up by binary search
+    np.save(os.path.join(path, files["book_ids"]), book_ids.astype("S24"))
+    np.save(os.path.join(path, files["neighbors"]), neighbors)
+    np.save(os.path.join(path, files["similarities"]), similarities)
+
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    previous = None
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as manifest_file:
+            previous = json.load(manifest_file)["files"]
+    temporary = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as manifest_file:
+        json.dump({"version": version, "k": k, "books": len(book_ids), "files": files}, manifest_file)
+    os.replace(temporary, manifest_path)
+
+    # Keep the previous build for workers still mapping it; drop anything older
+    current = set(files.values()) | set((previous or {}).values())
+    for name in os.listdir(path):
+        if name.endswith(".npy") and name not in current:
+            os.remove(os.path.join(path, name))
+    return version
+
+
+async def main(args):
+    await postgres.connect_postgres()
+    try:
+        started = time.perf_counter()
+        user_ids, book_ids, ratings = await load_ratings()
+        print(f"Loaded {len(ratings)} ratings in {time.perf_counter() - started:.2f}s.")
+    finally:
+        await postgres.close_postgres()
+
+    started = time.perf_counter()
+    matrix, books = build_matrix(user_ids, book_ids, ratings, args.min_ratings)
+    print(f"Rating matrix: {matrix.shape[0]} users x {matrix.shape[1]} books, {matrix.nnz} ratings.")
+    if not matrix.shape[1]:
+        print("No books with enough ratings; nothing published.")
+        return
+    neighbors, similarities = top_k_similarities(matrix, args.k, args.memory_mb)
+    version = publish(args.path, books, neighbors, similarities, neighbors.shape[1])
+    print(f"Published item similarities {version} to {args.path} in {time.perf_counter() - started:.2f}s.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the item-item similarity index.")
+    parser.add_argument("--k", type=int, default=50, help="Neighbors kept per book")
+    parser.add_argument("--memory-mb", type=int, default=512, help="Memory budget of the similarity chunks")
+    parser.add_argument("--min-ratings", type=int, default=2, help="Skip books with fewer ratings")
+    parser.add_argument("--path", default=ITEM_SIMILARITY_PATH)
+    asyncio.run(main(parser.parse_args()))
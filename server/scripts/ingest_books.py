@@ -0,0 +1,52 @@
+# scripts/ingest_books.py
+"""
+Streams a book catalog (CSV with header, or NDJSON) into MongoDB and Neo4j.
+
+    python -m scripts.ingest_books books.csv --chunk-size 5000
+"""
+import argparse
+import asyncio
+from db.mongo import connect_mongo, close_mongo
+from cache.redis import connect_redis, close_redis
+from graph.neo4j import connect_neo4j, close_neo4j
+from models.ingest import IngestReport
+from services import ingest_service
+
+
+def print_progress(report: IngestReport):
+    print(
+        f"rows={report.rows_read} inserted={report.inserted} updated={report.updated} "
+        f"failed={report.failed} rows/sec={report.rows_per_second}",
+        flush=True,
+    )
+
+
+async def main(args):
+    fmt = args.format or ingest_service.detect_format(args.path)
+
+    await connect_mongo()
+    await connect_redis()
+    await connect_neo4j()
+    try:
+        with open(args.path, encoding="utf-8", newline="") as stream:
+            report = await ingest_service.ingest_books(
+                stream, fmt, chunk_size=args.chunk_size, on_progress=print_progress
+            )
+    finally:
+        await close_neo4j()
+        await close_redis()
+        await close_mongo()
+
+    print(f"Done in {report.elapsed_seconds}s ({report.rows_per_second} rows/sec).")
+    for error in report.errors:
+        print(f"  row {error.row} (isbn={error.isbn}): {error.error}")
+    if report.failed > len(report.errors):
+        print(f"  ... and {report.failed - len(report.errors)} more errors")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="CSV or NDJSON file")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="Defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=ingest_service.DEFAULT_CHUNK_SIZE)
+    asyncio.run(main(parser.parse_args()))
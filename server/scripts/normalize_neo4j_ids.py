@@ -0,0 +1,104 @@
+# scripts/normalize_neo4j_ids.py
+"""
+One-time migration: converts string-typed :User ids (e.g. "5") to integers, merging them into
+an existing integer node with the same id, then creates the uniqueness constraints.
+
+    python -m scripts.normalize_neo4j_ids [--batch-size 10000]
+
+Idempotent; a second run finds nothing to convert. Book ids are MongoDB ObjectId strings
+and are left as they are.
+"""
+import argparse
+import asyncio
+import time
+import graph.neo4j as neo4j
+
+# 'x.id = toString(x.id)' only holds for string values
+STRING_ID = "s.id = toString(s.id) AND toInteger(s.id) IS NOT NULL"
+
+STEPS = [
+    ("create integer nodes", f"""
+    MATCH (s:User) WHERE {STRING_ID}
+    WITH DISTINCT toInteger(s.id) AS id
+    CALL {{ WITH id MERGE (:User {{id: id}}) }} IN TRANSACTIONS OF $batch_size ROWS
+    """),
+    ("copy outgoing :FOLLOWS", f"""
+    MATCH (s:User)-[:FOLLOWS]->(other:User) WHERE {STRING_ID}
+    CALL {{
+        WITH s, other
+        MATCH (t:User {{id: toInteger(s.id)}}) WHERE t <> other
+        MERGE (t)-[:FOLLOWS]->(other)
+    }} IN TRANSACTIONS OF $batch_size ROWS
+    """),
+    ("copy incoming :FOLLOWS", f"""
+    MATCH (other:User)-[:FOLLOWS]->(s:User) WHERE {STRING_ID}
+    CALL {{
+        WITH s, other
+        MATCH (t:User {{id: toInteger(s.id)}}) WHERE t <> other
+        MERGE (other)-[:FOLLOWS]->(t)
+    }} IN TRANSACTIONS OF $batch_size ROWS
+    """),
+    ("copy :RATED", f"""
+    MATCH (s:User)-[r:RATED]->(book:Book) WHERE {STRING_ID}
+    CALL {{
+        WITH s, r, book
+        MATCH (t:User {{id: toInteger(s.id)}})
+        MERGE (t)-[copy:RATED]->(book)
+        ON CREATE SET copy = properties(r)
+    }} IN TRANSACTIONS OF $batch_size ROWS
+    """),
+    ("delete string nodes", f"""
+    MATCH (s:User) WHERE {STRING_ID}
+    CALL {{ WITH s DETACH DELETE s }} IN TRANSACTIONS OF $batch_size ROWS
+    """),
+]
+
+# Anything that would still block the constraints
+DUPLICATES_QUERY = """
+MATCH (n:{label})
+WITH n.id AS id, count(*) AS nodes WHERE nodes > 1
+RETURN count(id) AS duplicated_ids
+"""
+
+
+async def main(batch_size: int):
+    await neo4j.connect_neo4j()
+    try:
+        async with neo4j.driver.session() as session:
+            for name, query in STEPS:
+                started = time.perf_counter()
+                summary = await (await session.run(query, batch_size=batch_size)).consume()
+                counters = summary.counters
+                print(
+                    f"{name}: {counters.nodes_created} nodes created, {counters.nodes_deleted} deleted, "
+                    f"{counters.relationships_created} relationships created "
+                    f"({time.perf_counter() - started:.2f}s)"
+                )
+
+            record = await (await session.run(
+                "MATCH (s:User) WHERE s.id = toString(s.id) RETURN count(s) AS unparseable"
+            )).single()
+            if record["unparseable"]:
+                print(f"Warning: {record['unparseable']} :User nodes have non-numeric string ids and were left as is.")
+
+            duplicates = 0
+            for label in ("User", "Book"):
+                record = await (await session.run(DUPLICATES_QUERY.format(label=label))).single()
+                if record["duplicated_ids"]:
+                    duplicates += record["duplicated_ids"]
+                    print(f"Warning: {record['duplicated_ids']} :{label} ids are held by more than one node.")
+
+        if duplicates:
+            print("Constraints not created; merge the duplicate nodes and run again.")
+        else:
+            await neo4j.ensure_constraints()
+            print("Uniqueness constraints on :User(id) and :Book(id) are in place.")
+    finally:
+        await neo4j.close_neo4j()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Normalize :User ids to integers and add uniqueness constraints.")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size))
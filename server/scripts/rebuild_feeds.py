@@ -0,0 +1,33 @@
+# scripts/rebuild_feeds.py
+"""
+Rebuilds the Redis home feeds from the follows and reviews tables.
+
+    python -m scripts.rebuild_feeds                 # every user, plus the pull-mode author timelines
+    python -m scripts.rebuild_feeds --user-id 42    # selected users only
+"""
+import argparse
+import asyncio
+import time
+import db.postgres as postgres
+from cache.redis import connect_redis, close_redis
+from services import feed_service
+
+
+async def main(user_ids):
+    await postgres.connect_postgres()
+    await connect_redis()
+    try:
+        started = time.perf_counter()
+        async with postgres.db_pool.acquire() as conn:
+            feeds = await feed_service.rebuild_feeds(conn, user_ids)
+        print(f"Rebuilt {feeds} feeds in {time.perf_counter() - started:.2f}s.")
+    finally:
+        await close_redis()
+        await postgres.close_postgres()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild home feeds from Postgres.")
+    parser.add_argument("--user-id", type=int, action="append", dest="user_ids", help="Rebuild only this user's feed (repeatable)")
+    args = parser.parse_args()
+    asyncio.run(main(args.user_ids))
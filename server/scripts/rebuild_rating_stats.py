@@ -0,0 +1,25 @@
+# scripts/rebuild_rating_stats.py
+"""
+Recomputes book_rating_stats from the reviews table in one aggregate pass.
+
+    python -m scripts.rebuild_rating_stats
+"""
+import asyncio
+import time
+import db.postgres as postgres
+from services import review_service
+
+
+async def main():
+    await postgres.connect_postgres()
+    try:
+        started = time.perf_counter()
+        async with postgres.db_pool.acquire() as conn:
+            books = await review_service.rebuild_book_rating_stats(conn)
+        print(f"Rebuilt rating stats for {books} books in {time.perf_counter() - started:.2f}s.")
+    finally:
+        await postgres.close_postgres()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
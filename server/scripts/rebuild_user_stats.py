@@ -0,0 +1,28 @@
+# scripts/rebuild_user_stats.py
+"""
+Reconciles user_stats (follower / following counters) with the follows table in bulk.
+
+    python -m scripts.rebuild_user_stats
+"""
+import asyncio
+import time
+import db.postgres as postgres
+from cache.redis import connect_redis, close_redis
+from services import follow_service
+
+
+async def main():
+    await postgres.connect_postgres()
+    await connect_redis()
+    try:
+        started = time.perf_counter()
+        async with postgres.db_pool.acquire() as conn:
+            corrected = await follow_service.rebuild_user_stats(conn)
+        print(f"Corrected follow counters of {corrected} users in {time.perf_counter() - started:.2f}s.")
+    finally:
+        await close_redis()
+        await postgres.close_postgres()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+# scripts/reconcile_graph.py
+"""
+Brings the Neo4j social graph back in line with Postgres.
+
+    python -m scripts.reconcile_graph --mode rebuild [--wipe] [--batch-size 10000]
+    python -m scripts.reconcile_graph --mode diff [--range-size 1000] [--dry-run]
+
+rebuild streams every user, follow and latest rating into Neo4j (--wipe deletes the graph's
+users and their edges first). diff compares per-range checksums and rewrites only the user id
+ranges that drifted. Memory stays bounded by the batch (or range) size.
+Best run with the graph sync outbox drained (GET /metrics/graph-sync).
+"""
+import argparse
+import asyncio
+import time
+import db.postgres as postgres
+import graph.neo4j as neo4j
+from services import graph_reconcile_service
+
+
+def make_progress_printer():
+    started = {}
+
+    def on_progress(entity: str, rows: int):
+        started.setdefault(entity, time.perf_counter())
+        elapsed = time.perf_counter() - started[entity]
+        rate = rows / elapsed if elapsed else 0.0
+        print(f"\r{entity}: {rows} rows ({rate:,.0f} rows/s)", end="", flush=True)
+
+    return on_progress
+
+
+async def main(args):
+    await postgres.connect_postgres()
+    await neo4j.connect_neo4j()
+    try:
+        started = time.perf_counter()
+        async with postgres.db_pool.acquire() as conn:
+            if args.mode == "rebuild":
+                report = await graph_reconcile_service.rebuild_graph(
+                    conn, args.batch_size, args.wipe, make_progress_printer()
+                )
+                print()
+                total = 0
+                for entity, (rows, seconds) in report.items():
+                    total += rows
+                    print(f"{entity}: {rows} rows in {seconds:.2f}s ({rows / seconds if seconds else 0:,.0f} rows/s)")
+                elapsed = time.perf_counter() - started
+                print(f"Rebuilt {total} rows in {elapsed:.2f}s ({total / elapsed if elapsed else 0:,.0f} rows/s).")
+            else:
+                def on_range(entity: str, lo: int, hi: int, rows: int):
+                    action = "differs" if args.dry_run else f"rewrote {rows} rows"
+                    print(f"{entity} [{lo}, {hi}): {action}")
+
+                report = await graph_reconcile_service.diff_and_repair(conn, args.range_size, args.dry_run, on_range)
+                for entity, counts in report.items():
+                    print(
+                        f"{entity}: {counts['drifted']} of {counts['ranges']} ranges drifted, "
+                        f"{counts['rows_rewritten']} rows rewritten"
+                    )
+                print(f"Diff finished in {time.perf_counter() - started:.2f}s.")
+    finally:
+        await neo4j.close_neo4j()
+        await postgres.close_postgres()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild or repair the Neo4j graph from Postgres.")
+    parser.add_argument("--mode", choices=["rebuild", "diff"], required=True)
+    parser.add_argument("--wipe", action="store_true", help="rebuild: delete the graph's users and edges first")
+    parser.add_argument("--batch-size", type=int, default=graph_reconcile_service.DEFAULT_BATCH_SIZE)
+    parser.add_argument("--range-size", type=int, default=graph_reconcile_service.DEFAULT_RANGE_SIZE,
+                        help="diff: user ids per checksum range")
+    parser.add_argument("--dry-run", action="store_true", help="diff: report drifted ranges without rewriting them")
+    asyncio.run(main(parser.parse_args()))
@@ -1,32 +1,26 @@
 # services/auth_service.py
-from passlib.context import CryptContext
+import time
 from asyncpg import Connection
+from db.postgres import PoolAcquireTimeoutError
 from models.user import UserCreate, UserInDB
 from typing import Optional
-from passlib.context import CryptContext
-from asyncpg import Connection
-from models.user import UserCreate, UserInDB
-from typing import Optional
-from utils.security import create_access_token
+from jose import jwt
+from utils.security import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
 from cache.redis import get_redis_client, get_redis_client_direct
+from cache.session_cache import publish_session_revoked
+from services import hashing_service, graph_sync_service
 
-# Configuration for password hashing
-pwd_context = CryptContext(
-    schemes=["sha256_crypt"],  # <--- CHANGED
-    deprecated="auto"
-)
-
-def hash_password(password: str) -> str:
-    """Hashes a password using SHA256."""
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    """Hashes a password using SHA256 in the hashing process pool."""
+    return await hashing_service.hash_password(password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifies a plain password against a hashed password."""
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verifies a plain password against a hashed password in the hashing process pool."""
+    return await hashing_service.verify_password(plain_password, hashed_password)
 
 async def create_user(conn: Connection, user_data: UserCreate) -> Optional[UserInDB]:
-    """Inserts a new user into the Postgres database."""
-    hashed_password = hash_password(user_data.password)
+    """Inserts a new user into the Postgres database, and queues its (:User) node for Neo4j."""
+    hashed_password = await hash_password(user_data.password)
     
     query = """
     INSERT INTO users (username, email, password_hash)
@@ -35,11 +29,15 @@ async def create_user(conn: Connection, user_data: UserCreate) -> Optional[UserI
     """
     
     try:
-        record = await conn.fetchrow(
-            query, user_data.username, user_data.email, hashed_password
-        )
+        async with conn.transaction():
+            record = await conn.fetchrow(
+                query, user_data.username, user_data.email, hashed_password
+            )
+            await graph_sync_service.enqueue(conn, graph_sync_service.USER_CREATED, {"user_id": record["id"]})
         if record:
             return UserInDB(**dict(record))
+    except PoolAcquireTimeoutError:
+        raise  # Answered with a 503 by the app's handler
     except Exception as e:
         # In a real app, check for unique constraint violation (e.g., email or username already exists)
         print(f"Postgres error during user creation: {e}")
@@ -57,15 +55,60 @@ async def get_user_by_email(conn: Connection, email: str) -> Optional[UserInDB]:
         return UserInDB(**dict(record))
     return None
 
+def session_key(jti: str) -> str:
+    return f"session:{jti}"
+
+def user_sessions_key(user_id: int) -> str:
+    """The user's session jtis, scored by their expiry (epoch seconds)."""
+    return f"user_session_expiries:{user_id}"
+
 async def create_user_session(user_id: int) -> str:
-    """Generates a JWT and stores the session key in Redis."""
+    """Generates a JWT and stores the session, keyed by its jti, in Redis."""
     redis = get_redis_client_direct()
     
     # Generate JWT
     access_token = create_access_token(data={"user_id": user_id})
+    jti = jwt.get_unverified_claims(access_token)["jti"]
+    ttl = ACCESS_TOKEN_EXPIRE_MINUTES * 60
     
-    # Store the user ID in Redis with the token as key (for quick lookup/validation)
+    # Store the user ID under the short token id, and index the jti under the user
+    # so all of a user's sessions can be revoked without a SCAN.
     # TTL (Time to Live) matches the token expiry (30 minutes)
-    await redis.set(f"session:{access_token}", str(user_id), ex=30 * 60)
+    # The index is scored by expiry: each login prunes the jtis of expired tokens, so it only
+    # ever holds the user's live sessions however often they log in
+    now = time.time()
+    pipe = redis.pipeline(transaction=True)
+    pipe.set(session_key(jti), str(user_id), ex=ttl)
+    pipe.zremrangebyscore(user_sessions_key(user_id), "-inf", now)
+    pipe.zadd(user_sessions_key(user_id), {jti: now + ttl})
+    pipe.expire(user_sessions_key(user_id), ttl)
+    await pipe.execute()
     
-    return access_token
\ No newline at end of file
+    return access_token
+
+async def revoke_user_session(user_id: int, jti: str):
+    """Deletes one session from Redis and tells every worker to drop it from its local cache."""
+    redis = get_redis_client_direct()
+    pipe = redis.pipeline(transaction=True)
+    pipe.delete(session_key(jti))
+    pipe.zrem(user_sessions_key(user_id), jti)
+    await pipe.execute()
+    await publish_session_revoked(jti)
+
+async def revoke_all_user_sessions(user_id: int) -> int:
+    """
+    Revokes every active session of a user ("log out everywhere", password change).
+    Costs O(live sessions of the user). Returns the number of sessions revoked.
+    """
+    redis = get_redis_client_direct()
+    # Expired tokens' sessions are already gone; only the live ones need deleting
+    jtis = await redis.zrangebyscore(user_sessions_key(user_id), time.time(), "+inf")
+    if not jtis:
+        return 0
+
+    pipe = redis.pipeline(transaction=True)
+    pipe.delete(*[session_key(jti) for jti in jtis], user_sessions_key(user_id))
+    await pipe.execute()
+
+    await publish_session_revoked(*jtis)
+    return len(jtis)
@@ -0,0 +1,316 @@
+# services/autocomplete_service.py
+import bisect
+import heapq
+import json
+import re
+import time
+import unicodedata
+from array import array
+from typing import Iterable, List, Optional
+import numpy as np
+from cache.invalidation import register_channel, publish
+from models.book import BookSuggestion
+from services.book_service import get_books_collection
+
+BOOK_ADDED_CHANNEL = "autocomplete:book_added"
+MAX_PREFIX_LENGTH = 100
+# Incremental additions go to a small sorted delta, merged into the main arrays once it holds
+# more than this many terms or 1/16 of the index, whichever is larger
+MIN_DELTA_MERGE = 4096
+# Mongo ObjectId hex strings
+ID_BYTES = 24
+# Term bytes compared by the vectorized part of the build sort
+SORT_PREFIX = 16
+# Books per batch when streaming the catalog into the index at startup
+LOAD_BATCH_SIZE = 10000
+
+_NON_ALNUM = re.compile(r"[\W_]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercases, strips accents and collapses punctuation/whitespace to single spaces."""
+    if text.isascii():
+        # Nothing to decompose: skips the per-character pass for most of the catalog
+        return _NON_ALNUM.sub(" ", text.lower()).strip()
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(" ", stripped.casefold()).strip()
+
+
+class PrefixIndex:
+    """
+    Sorted index of normalized terms, answered with binary search.
+    Each book is indexed under its full title, its author and every later word of its title,
+    so "potter" finds "Harry Potter ...".
+
+    Everything lives in flat buffers rather than one Python object per term: the normalized
+    title and author of every book are stored once, NUL-terminated, in a single byte buffer, and
+    an index entry is only the offset where its term starts plus the book's row. Title suffixes
+    therefore share the title's bytes. Ids and display strings are packed per row the same way.
+    Expect about 260 bytes per book, i.e. ~250 MB per million titles in each worker for ~40-byte
+    titles (per-term Python strings took ~900), and a peak of about 2.5x that during the build.
+    Books added after the build land in a small sorted delta searched alongside the main arrays,
+    so an insert never shifts the whole index; the delta is merged in once it grows. An updated
+    book gets a new row and its old row is tombstoned: skipped by searches, dropped at the merge.
+    """
+    def __init__(self):
+        self._reset()
+        self.loaded = False
+
+    def _reset(self):
+        self._keys = bytearray()  # Per row: normalized title, NUL, normalized author, NUL
+        self._display = bytearray()  # Per row: title, NUL, author
+        self._display_starts = array("q")
+        self._ids = bytearray()  # ID_BYTES per row
+        self._dead = bytearray()  # 1 for rows replaced by a newer version of the book
+        self._live = 0
+        # Entries sorted by term: where the term starts in _keys and the row it belongs to
+        self._entry_offsets = np.zeros(0, dtype=np.int64)
+        self._entry_rows = np.zeros(0, dtype=np.int32)
+        # Book id -> row lookup: sorted ids for the merged rows, a dict for the delta
+        self._sorted_ids = np.zeros(0, dtype=f"S{ID_BYTES}")
+        self._sorted_id_rows = np.zeros(0, dtype=np.int32)
+        self._delta_rows: dict[str, int] = {}
+        self._delta: List[tuple[bytes, int, int]] = []  # Sorted (term, row, offset)
+        # Entries collected during a build, sorted once in finish_build()
+        self._build_offsets = array("q")
+        self._build_rows = array("i")
+
+    def __len__(self) -> int:
+        return self._live
+
+    def _append_row(self, book_id: str, title: str, author: str) -> tuple[int, List[int]]:
+        """Stores one book and returns its row and the offsets of its terms in _keys."""
+        row = len(self._display_starts)
+        self._display_starts.append(len(self._display))
+        self._display += title.encode() + b"\0" + author.encode()
+        self._ids += book_id.encode().ljust(ID_BYTES, b"\0")
+        self._dead.append(0)
+        self._live += 1
+
+        offsets = []
+        start = len(self._keys)
+        normalized_title = normalize(title).encode()
+        if normalized_title:
+            offsets.append(start)
+            space = normalized_title.find(b" ")
+            while space != -1:
+                offsets.append(start + space + 1)
+                space = normalized_title.find(b" ", space + 1)
+        self._keys += normalized_title + b"\0"
+        normalized_author = normalize(author).encode()
+        if normalized_author and normalized_author != normalized_title:
+            offsets.append(len(self._keys))
+        self._keys += normalized_author + b"\0"
+        return row, offsets
+
+    def _term_at(self, offset: int) -> bytes:
+        return bytes(self._keys[offset:self._keys.index(0, offset)])
+
+    def _book_at(self, row: int) -> tuple[str, str, str]:
+        end = self._display_starts[row + 1] if row + 1 < len(self._display_starts) else len(self._display)
+        title, author = self._display[self._display_starts[row]:end].decode().split("\0", 1)
+        book_id = self._ids[row * ID_BYTES:(row + 1) * ID_BYTES].rstrip(b"\0").decode()
+        return book_id, title, author
+
+    def begin_build(self):
+        """Drops the current contents; feed the catalog with add_to_build() then call finish_build()."""
+        self._reset()
+        self.loaded = False
+
+    def add_to_build(self, books: Iterable[tuple[str, str, str]]):
+        for book_id, title, author in books:
+            row, offsets = self._append_row(book_id, title, author)
+            self._build_offsets.extend(offsets)
+            self._build_rows.extend([row] * len(offsets))
+
+    def finish_build(self):
+        """Sorts the collected entries once and makes the index searchable."""
+        offsets = np.array(self._build_offsets, dtype=np.int64)
+        rows = np.array(self._build_rows, dtype=np.int32)
+        self._build_offsets, self._build_rows = array("q"), array("i")
+        order = self._sort_order(offsets)
+        self._entry_offsets, self._entry_rows = offsets[order], rows[order]
+        self._index_ids()
+        self.loaded = True
+
+    def build(self, books: Iterable[tuple[str, str, str]]):
+        """Builds the index from (id, title, author) triples in one sort."""
+        self.begin_build()
+        self.add_to_build(books)
+        self.finish_build()
+
+    def _sort_order(self, offsets: np.ndarray) -> np.ndarray:
+        # Sort on the first SORT_PREFIX bytes of every term in numpy, then settle ties between
+        # longer terms in Python: this avoids building one bytes object per entry.
+        if not len(offsets):
+            return np.zeros(0, dtype=np.int64)
+        keys = np.frombuffer(bytes(self._keys), dtype=np.uint8)
+        prefixes = np.zeros((len(offsets), SORT_PREFIX), dtype=np.uint8)
+        ended = np.zeros(len(offsets), dtype=bool)
+        for column in range(SORT_PREFIX):
+            values = keys[np.minimum(offsets + column, len(keys) - 1)]
+            ended |= values == 0
+            prefixes[~ended, column] = values[~ended]
+        packed = prefixes.view(f"S{SORT_PREFIX}").ravel()
+        order = np.argsort(packed, kind="stable")
+
+        # Runs of equal prefixes that do not end within SORT_PREFIX bytes need the full term
+        sorted_prefixes = packed[order]
+        run_starts = np.flatnonzero(np.concatenate(([True], sorted_prefixes[1:] != sorted_prefixes[:-1])))
+        run_ends = np.append(run_starts[1:], len(order))
+        unsettled = (run_ends - run_starts > 1) & ~ended[order[run_starts]]
+        for start, end in zip(run_starts[unsettled].tolist(), run_ends[unsettled].tolist()):
+            order[start:end] = sorted(order[start:end], key=lambda entry: self._term_at(int(offsets[entry])))
+        return order
+
+    def _live_rows(self) -> np.ndarray:
+        return np.frombuffer(bytes(self._dead), dtype=np.uint8) == 0
+
+    def _index_ids(self):
+        rows = np.flatnonzero(self._live_rows()).astype(np.int32)
+        ids = np.frombuffer(bytes(self._ids), dtype=f"S{ID_BYTES}")[rows]
+        order = np.argsort(ids, kind="stable")
+        self._sorted_ids, self._sorted_id_rows = ids[order], rows[order]
+        self._delta_rows = {}
+
+    def _row_of(self, book_id: str) -> Optional[int]:
+        row = self._delta_rows.get(book_id)
+        if row is not None:
+            return row
+        key = book_id.encode()
+        position = int(np.searchsorted(self._sorted_ids, key))
+        if position < len(self._sorted_ids) and self._sorted_ids[position] == key:
+            return int(self._sorted_id_rows[position])
+        return None
+
+    def add(self, book_id: str, title: str, author: str):
+        """
+        Adds a single book incrementally, in O(delta) rather than O(index).
+        A known book whose title or author changed replaces its previous version.
+        """
+        previous = self._row_of(book_id)
+        if previous is not None:
+            if self._book_at(previous) == (book_id, title, author):
+                return
+            self._dead[previous] = 1
+            self._live -= 1
+        row, offsets = self._append_row(book_id, title, author)
+        self._delta_rows[book_id] = row
+        for offset in offsets:
+            bisect.insort(self._delta, (self._term_at(offset), row, offset))
+        if len(self._delta) > max(MIN_DELTA_MERGE, len(self._entry_offsets) // 16):
+            self._merge_delta()
+
+    def _merge_delta(self):
+        # Each delta entry is placed after the equal terms of the main arrays with a binary
+        # search, then numpy inserts them all in one pass. The threshold grows with the index,
+        # so the cost amortizes to O(1) per added term even during a bulk ingest.
+        live = self._live_rows()
+        kept = live[self._entry_rows]
+        self._entry_offsets, self._entry_rows = self._entry_offsets[kept], self._entry_rows[kept]
+        self._delta = [entry for entry in self._delta if live[entry[1]]]
+        positions = [self._upper_bound(term) for term, _, _ in self._delta]
+        self._entry_offsets = np.insert(self._entry_offsets, positions, [offset for _, _, offset in self._delta])
+        self._entry_rows = np.insert(self._entry_rows, positions, [row for _, row, _ in self._delta])
+        self._delta = []
+        self._index_ids()
+
+    def _upper_bound(self, term: bytes) -> int:
+        low, high = 0, len(self._entry_offsets)
+        while low < high:
+            middle = (low + high) // 2
+            if self._term_at(int(self._entry_offsets[middle])) <= term:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _scan_main(self, prefix: bytes):
+        # Terms are NUL-terminated and NUL sorts first, so comparing the first len(prefix)
+        # bytes at an offset orders a term against the prefix without finding its end
+        size = len(prefix)
+        low, high = 0, len(self._entry_offsets)
+        while low < high:
+            middle = (low + high) // 2
+            offset = int(self._entry_offsets[middle])
+            if self._keys[offset:offset + size] < prefix:
+                low = middle + 1
+            else:
+                high = middle
+
+        position = low
+        while position < len(self._entry_offsets):
+            offset = int(self._entry_offsets[position])
+            if self._keys[offset:offset + size] != prefix:
+                break
+            yield self._term_at(offset), int(self._entry_rows[position])
+            position += 1
+
+    def _scan_delta(self, prefix: bytes):
+        position = bisect.bisect_left(self._delta, (prefix,))
+        while position < len(self._delta) and self._delta[position][0].startswith(prefix):
+            term, row, _ = self._delta[position]
+            yield term, row
+            position += 1
+
+    def search(self, prefix: str, limit: int = 10) -> List[BookSuggestion]:
+        """Returns up to 'limit' distinct books with a term starting with the prefix."""
+        normalized = normalize(prefix).encode()
+        if not normalized:
+            return []
+
+        suggestions = []
+        seen = set()
+        for _, row in heapq.merge(self._scan_main(normalized), self._scan_delta(normalized)):
+            if row not in seen and not self._dead[row]:
+                seen.add(row)
+                book_id, title, author = self._book_at(row)
+                suggestions.append(BookSuggestion(id=book_id, title=title, author=author))
+                if len(suggestions) >= limit:
+                    break
+        return suggestions
+
+
+prefix_index = PrefixIndex()
+
+
+async def load_prefix_index():
+    """Loads titles and authors of the whole catalog into the prefix index (startup)."""
+    started = time.perf_counter()
+    BOOKS_COLLECTION = get_books_collection()
+    cursor = BOOKS_COLLECTION.find({}, projection={"title": 1, "author": 1})
+    prefix_index.begin_build()
+    batch = []
+    async for document in cursor:
+        batch.append((str(document["_id"]), document["title"], document["author"]))
+        if len(batch) >= LOAD_BATCH_SIZE:
+            prefix_index.add_to_build(batch)
+            batch = []
+    prefix_index.add_to_build(batch)
+    prefix_index.finish_build()
+    print(f"Autocomplete index loaded: {len(prefix_index)} books in {time.perf_counter() - started:.2f}s.")
+
+
+def _on_book_added(message: str):
+    # Only workers that serve autocomplete hold an index (scripts never load one).
+    # Also sent for updated books, which replace their previous title and author.
+    if prefix_index.loaded:
+        book = json.loads(message)
+        prefix_index.add(book["id"], book["title"], book["author"])
+
+
+async def publish_books_added(books: Iterable[tuple[str, str, str]]):
+    """Adds new or updated (id, title, author) books to the prefix index of every worker."""
+    messages = [json.dumps({"id": book_id, "title": title, "author": author}) for book_id, title, author in books]
+    if messages:
+        await publish(BOOK_ADDED_CHANNEL, *messages)
+
+
+def autocomplete(prefix: str, limit: int = 10) -> List[BookSuggestion]:
+    """Prefix suggestions from memory, no database round trip."""
+    return prefix_index.search(prefix[:MAX_PREFIX_LENGTH], limit)
+
+
+# Missed additions or updates during a reconnect are not worth a full reload; they are picked up on restart
+register_channel(BOOK_ADDED_CHANNEL, _on_book_added, lambda: None)
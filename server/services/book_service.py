@@ -2,8 +2,10 @@
 from db.mongo import get_mongo_client_direct
 from models.book import BookCreate, BookInDB
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from bson import ObjectId
+from cache import book_cache
+from utils.pagination import encode_cursor, decode_cursor
 import os 
 
 def get_books_collection():
@@ -34,7 +36,10 @@ async def create_book(book_data: BookCreate) -> Optional[BookInDB]:
             # Fetch the newly created document for the correct output format
             new_book = await BOOKS_COLLECTION.find_one({"_id": result.inserted_id})
             if new_book:
-                return BookInDB(**new_book)
+                book = BookInDB(**new_book)
+                # Drop any stale entry (e.g. a negative one) for this id on every worker
+                await book_cache.invalidate_books(book.id)
+                return book
     except Exception as e:
         # Handle duplicate key error (e.g., duplicate ISBN)
         if "duplicate key error" in str(e):
@@ -45,33 +50,189 @@ async def create_book(book_data: BookCreate) -> Optional[BookInDB]:
     return None
 
 async def get_book_by_id(book_id: str) -> Optional[BookInDB]:
-    """Retrieves a book by its MongoDB ObjectId."""
+    """
+    Retrieves a book by its MongoDB ObjectId.
+    Read-through: in-process LRU, then Redis, then MongoDB. Unknown ids are cached too.
+    """
     
+    if not ObjectId.is_valid(book_id):
+        return None
+
+    cached = await book_cache.get_cached_book(book_id)
+    if cached is book_cache.MISSING:
+        return None
+    if cached is not None:
+        return cached
+
     # 🌟 NEW: Get collection inside the function body
     BOOKS_COLLECTION = get_books_collection()
     
     try:
-        if not ObjectId.is_valid(book_id):
-            return None
-            
         book = await BOOKS_COLLECTION.find_one({"_id": ObjectId(book_id)})
-        if book:
-            return BookInDB(**book)
     except Exception as e:
         print(f"MongoDB Error during book retrieval: {e}")
         return None
-    return None
 
-async def list_books(limit: int = 10, skip: int = 0) -> List[BookInDB]:
-    """Retrieves a list of books from MongoDB."""
+    if book is None:
+        await book_cache.cache_missing_book(book_id)
+        return None
+
+    book = BookInDB(**book)
+    await book_cache.cache_book(book)
+    return book
+
+async def book_exists(book_id: str) -> bool:
+    """
+    Cheap existence check: answered from the book cache when possible, otherwise
+    by an _id-only MongoDB lookup (no document load or model validation).
+    """
+    if not ObjectId.is_valid(book_id):
+        return False
+
+    cached = await book_cache.get_cached_book(book_id)
+    if cached is not None:
+        return cached is not book_cache.MISSING
+
+    BOOKS_COLLECTION = get_books_collection()
     
+    try:
+        found = await BOOKS_COLLECTION.find_one({"_id": ObjectId(book_id)}, projection={"_id": 1})
+    except Exception as e:
+        print(f"MongoDB Error during book existence check: {e}")
+        return False
+
+    if found is None:
+        await book_cache.cache_missing_book(book_id)
+        return False
+    return True
+
+# Fields of BookInDB; list endpoints fetch only these and skip model validation
+BOOK_PROJECTION = {"title": 1, "author": 1, "isbn": 1, "publication_year": 1, "cover_url": 1}
+
+def book_document_to_dict(document: dict) -> dict:
+    """
+    Converts a trusted MongoDB book document into the BookInDB wire shape
+    (string '_id'), without building a model.
+    """
+    return {
+        "_id": str(document["_id"]),
+        "title": document["title"],
+        "author": document["author"],
+        "isbn": document["isbn"],
+        "publication_year": document["publication_year"],
+        "cover_url": document.get("cover_url"),
+        "rating_stats": None,
+    }
+
+# Sort keys allowed for keyset pagination; each has a compound (key, _id) index
+BOOK_SORT_KEYS = ("_id", "publication_year", "title")
+
+async def list_books(
+    limit: int = 10, skip: int = 0, cursor: Optional[str] = None, sort: str = "_id"
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Retrieves a page of books from MongoDB, ordered by (sort, _id), as BookInDB-shaped dicts.
+    Pages are addressed by an opaque keyset cursor; 'skip' is a deprecated fallback.
+    Returns the page and the cursor of the next page (None on the last page).
+    Raises ValueError for an invalid cursor or sort key.
+    """
+    if sort not in BOOK_SORT_KEYS:
+        raise ValueError(f"Unsupported sort key '{sort}'.")
+
     # 🌟 NEW: Get collection inside the function body
     BOOKS_COLLECTION = get_books_collection()
     
-    books = []
-    cursor = BOOKS_COLLECTION.find().limit(limit).skip(skip)
+    query = {}
+    if cursor:
+        position = decode_cursor(cursor)
+        if position.get("s") != sort or not ObjectId.is_valid(position.get("id", "")):
+            raise ValueError("Invalid cursor.")
+        last_id = ObjectId(position["id"])
+        if sort == "_id":
+            query = {"_id": {"$gt": last_id}}
+        else:
+            query = {"$or": [
+                {sort: {"$gt": position["v"]}},
+                {sort: position["v"], "_id": {"$gt": last_id}},
+            ]}
+
+    sort_spec = [("_id", 1)] if sort == "_id" else [(sort, 1), ("_id", 1)]
+    # Fetch one extra document to know whether another page exists
+    find_cursor = BOOKS_COLLECTION.find(query, projection=BOOK_PROJECTION).sort(sort_spec).limit(limit + 1)
+    if skip and not cursor:
+        find_cursor = find_cursor.skip(skip)
     
-    async for document in cursor:
-        books.append(BookInDB(**document))
+    books = []
+    async for document in find_cursor:
+        books.append(book_document_to_dict(document))
+
+    next_cursor = None
+    if len(books) > limit:
+        books = books[:limit]
+        last = books[-1]
+        next_cursor = encode_cursor({
+            "s": sort,
+            "v": None if sort == "_id" else last[sort],
+            "id": last["_id"],
+        })
         
-    return books
\ No newline at end of file
+    return books, next_cursor
+
+# Relevance ranking can't be keyset-paginated, so search pages are offset-based with a depth cap
+MAX_SEARCH_OFFSET = 1000
+
+async def search_books(q: str, limit: int = 10, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    Full-text search on title and author (MongoDB text index), ranked by relevance.
+    Books are returned as BookInDB-shaped dicts.
+    Returns the page and the cursor of the next page (None on the last page).
+    Raises ValueError for an invalid cursor.
+    """
+    offset = 0
+    if cursor:
+        position = decode_cursor(cursor)
+        offset = position.get("o")
+        if position.get("s") != "text" or position.get("q") != q or not isinstance(offset, int) or offset < 0:
+            raise ValueError("Invalid cursor.")
+
+    BOOKS_COLLECTION = get_books_collection()
+
+    projection = {**BOOK_PROJECTION, "score": {"$meta": "textScore"}}
+    find_cursor = (
+        BOOKS_COLLECTION.find({"$text": {"$search": q}}, projection=projection)
+        .sort([("score", {"$meta": "textScore"}), ("_id", 1)])
+        .skip(offset)
+        .limit(limit + 1)
+    )
+
+    books = []
+    async for document in find_cursor:
+        books.append(book_document_to_dict(document))
+
+    next_cursor = None
+    if len(books) > limit:
+        books = books[:limit]
+        if offset + limit < MAX_SEARCH_OFFSET:
+            next_cursor = encode_cursor({"s": "text", "q": q, "o": offset + limit})
+
+    return books, next_cursor
+
+async def get_books_by_ids(book_ids: List[str]) -> Tuple[List[dict], List[str]]:
+    """
+    Fetches many books with a single $in query, as BookInDB-shaped dicts.
+    Books come back in the requested order (duplicates collapsed); unknown or
+    invalid ids are returned separately as 'missing'.
+    """
+    requested = list(dict.fromkeys(book_ids))
+    object_ids = [ObjectId(book_id) for book_id in requested if ObjectId.is_valid(book_id)]
+
+    found = {}
+    if object_ids:
+        BOOKS_COLLECTION = get_books_collection()
+        async for document in BOOKS_COLLECTION.find({"_id": {"$in": object_ids}}, projection=BOOK_PROJECTION):
+            book = book_document_to_dict(document)
+            found[book["_id"]] = book
+
+    books = [found[book_id] for book_id in requested if book_id in found]
+    missing = [book_id for book_id in requested if book_id not in found]
+    return books, missing
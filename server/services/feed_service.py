@@ -0,0 +1,258 @@
+# services/feed_service.py
+import heapq
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple
+import orjson
+from asyncpg import Connection
+from dotenv import load_dotenv
+import db.postgres as postgres
+from cache.redis import get_redis_client_direct
+from models.review import ReviewInDB
+from utils.pagination import encode_cursor, decode_cursor
+
+load_dotenv()
+
+# Configuration
+FEED_MAX_LENGTH = int(os.getenv("FEED_MAX_LENGTH", "800"))  # Entries kept per feed (and per pull-mode author)
+FEED_FANOUT_THRESHOLD = int(os.getenv("FEED_FANOUT_THRESHOLD", "5000"))  # Followers above which reviews are pulled on read
+FEED_FANOUT_BATCH_SIZE = 1000  # Follower feeds written per pipeline round trip
+
+# Authors whose reviews are merged into their followers' feeds on read instead of being fanned out
+PULL_AUTHORS_KEY = "feed:pull_authors"
+
+FOLLOWER_IDS_QUERY = "SELECT follower_id FROM follows WHERE followee_id = $1 LIMIT $2;"
+
+# Followers in follow order from a (created_at, follower_id) position (idx_follows_followee_created);
+# follows made while an author is being switched to pull mode come last
+FOLLOWERS_AFTER_QUERY = """
+SELECT follower_id, created_at FROM follows
+WHERE followee_id = $1 AND (created_at, follower_id) > ($2, $3)
+ORDER BY created_at, follower_id
+LIMIT $4;
+"""
+SWITCH_LOCK_SECONDS = 300
+
+# Latest reviews of everyone a user follows, except the pull-mode authors ($3)
+FEED_BACKFILL_QUERY = """
+SELECT r.id, r.user_id, r.book_id, r.rating, r.review_text, r.created_at
+FROM follows f
+CROSS JOIN LATERAL (
+    SELECT id, user_id, book_id, rating, review_text, created_at
+    FROM reviews
+    WHERE user_id = f.followee_id
+    ORDER BY id DESC
+    LIMIT $2
+) r
+WHERE f.follower_id = $1 AND f.followee_id <> ALL($3::int[])
+ORDER BY r.id DESC
+LIMIT $2;
+"""
+
+
+def feed_key(user_id: int) -> str:
+    return f"feed:{user_id}"
+
+def author_timeline_key(user_id: int) -> str:
+    return f"feed:author:{user_id}"
+
+def pull_authors_key(user_id: int) -> str:
+    """Pull-mode authors followed by the user."""
+    return f"feed:pull:{user_id}"
+
+
+def _feed_entry(review: dict) -> str:
+    """
+    Serializes a review once, at write time. Feed pages are served by joining the stored
+    members, so the sorted set holds exactly the JSON the endpoint returns.
+    """
+    return orjson.dumps(review).decode()
+
+
+def _add_entry(pipe, key: str, entry: str, review_id: int):
+    # Review ids are monotonic, so they order the feed and double as unique scores
+    pipe.zadd(key, {entry: review_id})
+    pipe.zremrangebyrank(key, 0, -(FEED_MAX_LENGTH + 1))
+
+
+async def fan_out_review(review: ReviewInDB):
+    """
+    Pushes a new review into the feed of each of its author's followers (fan-out on write).
+    Authors with more than FEED_FANOUT_THRESHOLD followers are switched to fan-out on read:
+    the review goes to their own timeline, which followers merge in when they read their feed.
+    Best effort; the feeds are derived data and scripts.rebuild_feeds repairs them.
+    """
+    redis_client = get_redis_client_direct()
+    entry = _feed_entry(review.model_dump())
+    try:
+        if await redis_client.sismember(PULL_AUTHORS_KEY, review.user_id):
+            async with redis_client.pipeline(transaction=False) as pipe:
+                _add_entry(pipe, author_timeline_key(review.user_id), entry, review.id)
+                await pipe.execute()
+            return
+
+        async with postgres.acquire_connection() as conn:
+            records = await conn.fetch(FOLLOWER_IDS_QUERY, review.user_id, FEED_FANOUT_THRESHOLD + 1)
+        follower_ids = [record["follower_id"] for record in records]
+
+        if len(follower_ids) > FEED_FANOUT_THRESHOLD:
+            await _switch_to_pull(review.user_id)
+            async with redis_client.pipeline(transaction=False) as pipe:
+                _add_entry(pipe, author_timeline_key(review.user_id), entry, review.id)
+                await pipe.execute()
+            return
+
+        for start in range(0, len(follower_ids), FEED_FANOUT_BATCH_SIZE):
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for follower_id in follower_ids[start:start + FEED_FANOUT_BATCH_SIZE]:
+                    _add_entry(pipe, feed_key(follower_id), entry, review.id)
+                await pipe.execute()
+    except Exception as e:
+        print(f"Feed fan-out error for review {review.id}: {e}")
+
+
+async def _register_followers_after(author_id: int, position: tuple) -> Tuple[tuple, int]:
+    """Adds the author to the pull set of each follower after 'position', a page at a time."""
+    redis_client = get_redis_client_direct()
+    registered = 0
+    while True:
+        async with postgres.acquire_connection() as conn:
+            records = await conn.fetch(FOLLOWERS_AFTER_QUERY, author_id, *position, FEED_FANOUT_BATCH_SIZE)
+        if not records:
+            return position, registered
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for record in records:
+                pipe.sadd(pull_authors_key(record["follower_id"]), author_id)
+            await pipe.execute()
+        registered += len(records)
+        position = (records[-1]["created_at"], records[-1]["follower_id"])
+
+
+async def _switch_to_pull(author_id: int):
+    """
+    Registers the author with every current follower, then marks them pull-mode. The marker is
+    set last, so a switch interrupted halfway is simply retried by the author's next review
+    (registration is idempotent). Followers are read in keyset-paginated batches.
+    """
+    redis_client = get_redis_client_direct()
+    lock_key = f"feed:switching:{author_id}"
+    if not await redis_client.set(lock_key, "1", nx=True, ex=SWITCH_LOCK_SECONDS):
+        return  # Another worker is switching this author
+    try:
+        position, registered = await _register_followers_after(author_id, (datetime.min, 0))
+        await redis_client.sadd(PULL_AUTHORS_KEY, author_id)
+        # Follows committed before the marker whose register_follow ran before it too
+        _, late = await _register_followers_after(author_id, position)
+    finally:
+        await redis_client.delete(lock_key)
+    print(f"Feed: author {author_id} switched to fan-out on read ({registered + late} followers).")
+
+
+async def register_follow(follower_id: int, followee_id: int):
+    """Lets a new follower of a pull-mode author merge that author's timeline into their feed."""
+    redis_client = get_redis_client_direct()
+    try:
+        if await redis_client.sismember(PULL_AUTHORS_KEY, followee_id):
+            await redis_client.sadd(pull_authors_key(follower_id), followee_id)
+    except Exception as e:
+        print(f"Feed follow registration error for {follower_id} -> {followee_id}: {e}")
+
+
+async def get_feed(user_id: int, limit: int = 20, cursor: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+    """
+    Returns a page of the user's feed, newest first, as serialized review JSON strings,
+    plus the cursor of the next page (None on the last page).
+    A user who follows no pull-mode author is served by a single sorted-set read.
+    Raises ValueError for an invalid cursor.
+    """
+    max_score = "+inf"
+    if cursor:
+        position = decode_cursor(cursor)
+        try:
+            max_score = f"({int(position['id'])}"
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Invalid cursor.")
+
+    redis_client = get_redis_client_direct()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.zrevrangebyscore(feed_key(user_id), max_score, "-inf", start=0, num=limit + 1, withscores=True)
+        pipe.smembers(pull_authors_key(user_id))
+        entries, pull_authors = await pipe.execute()
+
+    if pull_authors:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for author_id in pull_authors:
+                pipe.zrevrangebyscore(author_timeline_key(author_id), max_score, "-inf", start=0, num=limit + 1, withscores=True)
+            timelines = await pipe.execute()
+        # Each list is already sorted newest first
+        merged = heapq.merge(entries, *timelines, key=lambda item: item[1], reverse=True)
+        entries = []
+        seen = set()
+        for entry, score in merged:
+            if score not in seen:
+                seen.add(score)
+                entries.append((entry, score))
+            if len(entries) > limit:
+                break
+
+    page = entries[:limit]
+    next_cursor = encode_cursor({"id": int(page[-1][1])}) if len(entries) > limit else None
+    return [entry for entry, _ in page], next_cursor
+
+
+async def rebuild_feed(conn: Connection, user_id: int, pull_author_ids: List[int]):
+    """Rebuilds one user's feed and pull-author set from Postgres, replacing them atomically."""
+    followed_pull_authors = [
+        record["followee_id"]
+        for record in await conn.fetch(
+            "SELECT followee_id FROM follows WHERE follower_id = $1 AND followee_id = ANY($2::int[]);",
+            user_id, pull_author_ids
+        )
+    ]
+    records = await conn.fetch(FEED_BACKFILL_QUERY, user_id, FEED_MAX_LENGTH, pull_author_ids)
+
+    async with get_redis_client_direct().pipeline(transaction=True) as pipe:
+        pipe.delete(feed_key(user_id), pull_authors_key(user_id))
+        if records:
+            pipe.zadd(feed_key(user_id), {_feed_entry(dict(record)): record["id"] for record in records})
+        if followed_pull_authors:
+            pipe.sadd(pull_authors_key(user_id), *followed_pull_authors)
+        await pipe.execute()
+
+
+async def rebuild_feeds(conn: Connection, user_ids: Optional[List[int]] = None) -> int:
+    """
+    Rebuilds feeds from the follows and reviews tables: re-derives the pull-mode authors,
+    their timelines, then the feed of each user (all users by default). Returns the feeds rebuilt.
+    """
+    redis_client = get_redis_client_direct()
+    pull_author_ids = [
+        record["followee_id"]
+        for record in await conn.fetch(
+            "SELECT followee_id FROM follows GROUP BY followee_id HAVING COUNT(*) > $1;", FEED_FANOUT_THRESHOLD
+        )
+    ]
+
+    if user_ids is None:
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.delete(PULL_AUTHORS_KEY)
+            if pull_author_ids:
+                pipe.sadd(PULL_AUTHORS_KEY, *pull_author_ids)
+            await pipe.execute()
+
+        for author_id in pull_author_ids:
+            records = await conn.fetch("""
+            SELECT id, user_id, book_id, rating, review_text, created_at
+            FROM reviews WHERE user_id = $1 ORDER BY id DESC LIMIT $2;
+            """, author_id, FEED_MAX_LENGTH)
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.delete(author_timeline_key(author_id))
+                if records:
+                    pipe.zadd(author_timeline_key(author_id), {_feed_entry(dict(record)): record["id"] for record in records})
+                await pipe.execute()
+
+        user_ids = [record["id"] for record in await conn.fetch("SELECT id FROM users ORDER BY id;")]
+
+    for user_id in user_ids:
+        await rebuild_feed(conn, user_id, pull_author_ids)
+    return len(user_ids)
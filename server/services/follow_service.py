@@ -2,117 +2,225 @@
 from asyncpg import Connection
 from models.follow import FollowRecord
 from graph.neo4j import get_neo4j_driver_direct 
-from typing import Optional
-from neo4j import AsyncSession, AsyncTransaction
+from graph import follow_graph
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+from utils.pagination import encode_cursor, decode_cursor
+from services import graph_sync_service, feed_service
+from cache import followee_cache, user_stats_cache
 
-# --- Neo4j Transaction Function (FINAL FIX) ---
+# --- Postgres Operations ---
 
-async def create_follow_relationship_neo4j_tx(tx: AsyncTransaction, follower_id: int, followee_id: int):
-    """
-    Creates a FOLLOWS relationship in Neo4j.
-    Uses toString() for robust matching against potentially string-stored IDs.
-    Returns the result, which is required by execute_write to complete the transaction.
+async def create_follow_record_postgres(
+    conn: Connection, follower_id: int, followee_id: int
+) -> Optional[Tuple[FollowRecord, List[Tuple[int, dict, int]]]]:
     """
-    query = """
-    MATCH (follower:User) WHERE toString(follower.id) = toString($follower_id)
-    MATCH (followee:User) WHERE toString(followee.id) = toString($followee_id)
-    MERGE (follower)-[:FOLLOWS]->(followee)
+    Inserts a new follow record into the Postgres 'follows' table and bumps both users'
+    user_stats counters in the same statement (only when the row is actually inserted).
+    Returns the record and both users' committed counters as (user_id, stats, version)
+    entries for user_stats_cache.cache_user_stats, or None if the follow already exists.
     """
-    return await tx.run(query, follower_id=follower_id, followee_id=followee_id)
-
-# --- Postgres Operations ---
-
-async def create_follow_record_postgres(conn: Connection, follower_id: int, followee_id: int) -> Optional[FollowRecord]:
-    """Inserts a new follow record into the Postgres 'follows' table."""
     
+    # Both counters are upserted by one INSERT in user_id order, so two users following each
+    # other at once lock the two user_stats rows in the same order (no deadlock)
     query = """
-    INSERT INTO follows (follower_id, followee_id)
-    VALUES ($1, $2)
-    RETURNING follower_id, followee_id, created_at;
+    WITH inserted AS (
+        INSERT INTO follows (follower_id, followee_id)
+        VALUES ($1, $2)
+        ON CONFLICT (follower_id, followee_id) DO NOTHING
+        RETURNING follower_id, followee_id, created_at
+    ), stats AS (
+        INSERT INTO user_stats (user_id, following_count, followers_count)
+        SELECT user_id, following_delta, followers_delta
+        FROM (
+            SELECT follower_id AS user_id, 1 AS following_delta, 0 AS followers_delta FROM inserted
+            UNION ALL
+            SELECT followee_id, 0, 1 FROM inserted
+        ) deltas
+        ORDER BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET
+            following_count = user_stats.following_count + EXCLUDED.following_count,
+            followers_count = user_stats.followers_count + EXCLUDED.followers_count,
+            version = user_stats.version + 1,
+            updated_at = now()
+        RETURNING user_id, following_count, followers_count, version
+    )
+    SELECT inserted.follower_id, inserted.followee_id, inserted.created_at,
+           stats.user_id, stats.following_count, stats.followers_count, stats.version
+    FROM inserted CROSS JOIN stats;
     """
     
-    try:
-        record = await conn.fetchrow(query, follower_id, followee_id)
-        if record:
-            return FollowRecord(**dict(record))
-    except Exception as e:
-        if "duplicate key value violates unique constraint" in str(e):
-            print("Postgres Error: User already follows this person (Duplicate key).")
-        else:
-            print(f"Postgres error during follow creation: {e}")
-        return None
+    records = await conn.fetch(query, follower_id, followee_id)
+    if records:
+        record = records[0]
+        follow = FollowRecord(
+            follower_id=record["follower_id"], followee_id=record["followee_id"], created_at=record["created_at"]
+        )
+        return follow, [_stats_entry(record) for record in records]
     return None
 
+# (column matching the listed user, column of the users in the list) per direction
+FOLLOW_LIST_COLUMNS = {
+    "followers": ("followee_id", "follower_id"),
+    "following": ("follower_id", "followee_id"),
+}
+
+async def list_follows(
+    conn: Connection, user_id: int, direction: str, limit: int = 20,
+    cursor: Optional[str] = None, expand_users: bool = False
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Lists a user's followers or followees ('followers' / 'following'), most recent follow first.
+    Pages are addressed by an opaque (created_at, user id) keyset cursor, so deep pages of large
+    accounts cost the same as the first. With expand_users, usernames are fetched in one batch query.
+    Returns the page and the cursor of the next page (None on the last page).
+    Raises ValueError for an invalid cursor.
+    """
+    owner_column, listed_column = FOLLOW_LIST_COLUMNS[direction]
+    if cursor:
+        position = decode_cursor(cursor)
+        try:
+            last_created_at = datetime.fromisoformat(position["t"])
+            last_id = int(position["id"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Invalid cursor.")
+        # Row comparison walks idx_follows_followee_created / idx_follows_follower_created from the cursor
+        query = f"""
+        SELECT {listed_column} AS user_id, created_at AS followed_at
+        FROM follows
+        WHERE {owner_column} = $1 AND (created_at, {listed_column}) < ($2, $3)
+        ORDER BY created_at DESC, {listed_column} DESC
+        LIMIT $4;
+        """
+        records = await conn.fetch(query, user_id, last_created_at, last_id, limit + 1)
+    else:
+        query = f"""
+        SELECT {listed_column} AS user_id, created_at AS followed_at
+        FROM follows
+        WHERE {owner_column} = $1
+        ORDER BY created_at DESC, {listed_column} DESC
+        LIMIT $2;
+        """
+        records = await conn.fetch(query, user_id, limit + 1)
+
+    entries = [dict(record) for record in records]
+
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        last = entries[-1]
+        next_cursor = encode_cursor({"t": last["followed_at"].isoformat(), "id": last["user_id"]})
+
+    if expand_users and entries:
+        usernames = {
+            record["id"]: record["username"]
+            for record in await conn.fetch(
+                "SELECT id, username FROM users WHERE id = ANY($1::int[]);", [entry["user_id"] for entry in entries]
+            )
+        }
+        for entry in entries:
+            entry["username"] = usernames.get(entry["user_id"])
+
+    return entries, next_cursor
+
 # --- Combined Service Function ---
 async def follow_user(pg_conn: Connection, follower_id: int, followee_id: int):
-    """Handles the polyglot operation to follow a user."""
+    """
+    Handles the polyglot operation to follow a user.
+    The Postgres row and the Neo4j :FOLLOWS outbox event commit together;
+    the graph sync worker applies the edge to Neo4j in the background.
+    """
     
     if follower_id == followee_id:
         raise ValueError("Cannot follow yourself.")
 
-    # 1. Write to Postgres
-    pg_record = await create_follow_record_postgres(pg_conn, follower_id, followee_id)
-    
-    # --- Ensure IDs are integers for robust function passing ---
-    follower_id_int = int(follower_id)
-    followee_id_int = int(followee_id)
-    
-    # 2. Write to Neo4j (Revert to Classic Async Session Execution)
-    neo4j_driver = get_neo4j_driver_direct()
-    
-    query = """
-    MATCH (follower:User) WHERE toString(follower.id) = toString($follower_id)
-    MATCH (followee:User) WHERE toString(followee.id) = toString($followee_id)
-    MERGE (follower)-[:FOLLOWS]->(followee)
-    """
-    
-    session = None
-    try:
-        follower_id_int = int(follower_id)
-        followee_id_int = int(followee_id)
-        
-        # 1. Start the session context (this part uses 'async with')
-        async with neo4j_driver.session() as session:
-            # 2. Run the query directly within the session for simple writes (no explicit tx needed)
-            await session.run(
-                query,
-                follower_id=follower_id_int, 
-                followee_id=followee_id_int
-            )
-            # No explicit commit/rollback needed if using session.run(), it commits automatically
-            # for a single write, which is simpler and often more robust for old drivers.
+    async with pg_conn.transaction():
+        created = await create_follow_record_postgres(pg_conn, follower_id, followee_id)
+        pg_record, stats_entries = created if created else (None, None)
+        if pg_record:
+            await graph_sync_service.enqueue(pg_conn, graph_sync_service.FOLLOWED, {
+                "follower_id": int(follower_id), "followee_id": int(followee_id)
+            })
 
-    except Exception as e:
-        print(f"Neo4j Error during follow operation: {e}")
-        # Note: If an explicit transaction (tx) was started, we would need to rollback here.
-    # Return the Postgres record if successful
+    if pg_record:
+        # The follow is committed: cache errors must not fail the request or skip the hooks below
+        try:
+            await followee_cache.add_followee(follower_id, followee_id)
+        except Exception as e:
+            print(f"Followee cache update error for {follower_id} -> {followee_id}: {e}")
+            # A set left without the new followee would keep answering "not following"
+            await followee_cache.invalidate_followees(follower_id)
+        try:
+            await user_stats_cache.cache_user_stats(*stats_entries)
+        except Exception as e:
+            print(f"User stats cache update error for {follower_id} -> {followee_id}: {e}")
+            try:
+                await user_stats_cache.invalidate_user_stats(follower_id, followee_id)
+            except Exception as e:
+                print(f"User stats cache invalidation error: {e}")
+        await feed_service.register_follow(follower_id, followee_id)
+        await follow_graph.publish_follow_added(follower_id, followee_id)
+
+    # Return the Postgres record if it was created (the follow may already have existed)
     return pg_record if pg_record else FollowRecord(follower_id=follower_id, followee_id=followee_id)
 
-async def get_follow_recommendations(follower_id: int, limit: int = 5) -> List[int]:
+# Candidates two hops away from user 'uid', ranked by mutual follows, plus a bonus per highly-rated
+# book in common. Only the first $max_friends followees are expanded, bounding the work for users
+# with large networks. Shared by the single-user and the batch (UNWIND) queries.
+FOLLOW_RECOMMENDATIONS_BODY = """
+MATCH (user:User {id: uid})-[:FOLLOWS]->(friend:User)
+WITH user, friend LIMIT $max_friends
+MATCH (friend)-[:FOLLOWS]->(candidate:User)
+WHERE candidate <> user AND NOT (user)-[:FOLLOWS]->(candidate)
+WITH user, candidate, count(DISTINCT friend) AS mutuals
+ORDER BY mutuals DESC
+LIMIT $candidate_pool
+OPTIONAL MATCH (user)-[mine:RATED]->(book:Book)<-[theirs:RATED]-(candidate)
+WHERE mine.rating >= 4 AND theirs.rating >= 4
+WITH candidate, mutuals, count(DISTINCT book) AS shared_books
+WITH candidate.id AS recommended_id, mutuals + $book_weight * shared_books AS score
+ORDER BY score DESC, recommended_id ASC
+LIMIT $limit
+"""
+
+SCORED_FOLLOW_RECOMMENDATIONS_QUERY = "WITH $follower_id AS uid" + FOLLOW_RECOMMENDATIONS_BODY + "RETURN recommended_id"
+
+BATCH_FOLLOW_RECOMMENDATIONS_QUERY = (
+    "UNWIND $user_ids AS uid CALL { WITH uid" + FOLLOW_RECOMMENDATIONS_BODY
+    + "RETURN collect(recommended_id) AS recommended_ids } RETURN uid, recommended_ids"
+)
+
+async def get_follow_recommendations(
+    follower_id: int, limit: int = 5, max_friends: int = 1000, book_weight: float = 0.5
+) -> List[int]:
     """
-    Retrieves follow recommendations based on second-degree connections 
-    (Friends-of-Friends, FOF) from Neo4j using the classic session method.
+    Retrieves follow recommendations based on second-degree connections
+    (Friends-of-Friends, FOF) from Neo4j, best first.
+    Candidates are scored by mutual follows plus book_weight per shared highly-rated (>= 4) book.
+    With GRAPH_ENGINE=csr and a loaded snapshot, they are ranked by mutual follows alone from
+    the in-memory follow graph; Neo4j is the fallback.
+    Uncached; routes go through recommendation_service.
     """
+    snapshot = follow_graph.get_follow_graph()
+    if snapshot is not None:
+        try:
+            return snapshot.friends_of_friends(int(follower_id), limit, max_friends)
+        except Exception as e:
+            print(f"Follow graph read error, falling back to Neo4j: {e}")
+
     neo4j_driver = get_neo4j_driver_direct()
     follower_id_int = int(follower_id)
-    
-    query = """
-    MATCH (user:User {id: $follower_id})-[:FOLLOWS]->()-[:FOLLOWS]->(recommendation:User)
-    WHERE NOT (user)-[:FOLLOWS]->(recommendation) 
-      AND user <> recommendation
-    RETURN recommendation.id AS recommended_id
-    LIMIT $limit
-    """
 
     results = []
     
-    # 🌟 CRITICAL FIX: Use the classic session structure for reads
     try:
         async with neo4j_driver.session() as session:
-            # Run the read query directly within the session
-            result = await session.run(query, follower_id=follower_id_int, limit=limit)
-            
-            # Fetch all data records
+            result = await session.run(
+                SCORED_FOLLOW_RECOMMENDATIONS_QUERY,
+                follower_id=follower_id_int, limit=limit, max_friends=max_friends,
+                # Only the best candidates by mutuals get the (costlier) shared-book pass
+                candidate_pool=limit * 4, book_weight=book_weight
+            )
             records = await result.data()
             
             for record in records:
@@ -126,31 +234,23 @@ async def get_follow_recommendations(follower_id: int, limit: int = 5) -> List[i
         
     return results
 
-async def create_rated_relationship_neo4j(session: AsyncSession, user_id: int, book_id: str, rating: int):
-    """
-    Creates or updates a :RATED relationship between a User and a Book in Neo4j.
-    Uses the reliable session.run() method.
-    """
-    query = """
-    // Match User: Use toString() for robustness
-    MATCH (user:User) WHERE toString(user.id) = toString($user_id)
-    
-    // Merge Book: Create if it doesn't exist
-    MERGE (book:Book {id: $book_id})
-    
-    // Merge the RATED relationship
-    MERGE (user)-[r:RATED]->(book)
-    ON CREATE SET r.rating = toInteger($rating), r.created_at = datetime()
-    ON MATCH SET r.rating = toInteger($rating), r.updated_at = datetime()
-    """
-    
-    # We use session.run() as it worked reliably for your environment
-    await session.run(
-        query, 
-        user_id=int(user_id), # Ensure integer type is passed
-        book_id=book_id, 
-        rating=int(rating)    # Ensure integer type is passed
-    )
+# Books rated highly (>= 4) by the users 'uid' follows and not rated by 'uid' yet,
+# scored by how many followees rated them highly.
+BOOK_RECOMMENDATIONS_BODY = """
+MATCH (u:User {id: uid})-[:FOLLOWS]->(friend:User)-[r:RATED]->(book:Book)
+WHERE r.rating >= 4
+AND NOT (u)-[:RATED]->(book)
+WITH book.id AS recommended_book_id, COUNT(book) AS friends_who_rated
+ORDER BY friends_who_rated DESC, recommended_book_id DESC // Prioritize books rated by more friends
+LIMIT $limit
+"""
+
+BOOK_RECOMMENDATIONS_QUERY = "WITH $user_id AS uid" + BOOK_RECOMMENDATIONS_BODY + "RETURN recommended_book_id"
+
+BATCH_BOOK_RECOMMENDATIONS_QUERY = (
+    "UNWIND $user_ids AS uid CALL { WITH uid" + BOOK_RECOMMENDATIONS_BODY
+    + "RETURN collect(recommended_book_id) AS recommended_ids } RETURN uid, recommended_ids"
+)
 
 async def get_book_recommendations(user_id: int, limit: int = 5) -> List[str]:
     """
@@ -159,29 +259,12 @@ async def get_book_recommendations(user_id: int, limit: int = 5) -> List[str]:
     """
     neo4j_driver = get_neo4j_driver_direct()
     user_id_int = int(user_id)
-    
-    query = """
-    // 1. Find books rated highly (e.g., >= 4 stars) by users the target user follows
-    MATCH (u:User) WHERE toString(u.id) = toString($user_id)
-    MATCH (u)-[:FOLLOWS]->(friend:User)-[r:RATED]->(book:Book)
-    
-    // 2. Filter: Only consider high ratings
-    WHERE r.rating >= 4
-    
-    // 3. Exclude books the current user has already rated
-    AND NOT (u)-[:RATED]->(book)
-    
-    // 4. Group results: Score by counting how many friends rated the book highly
-    RETURN book.id AS recommended_book_id, COUNT(book) AS friends_who_rated
-    ORDER BY friends_who_rated DESC, book.id DESC // Prioritize books rated by more friends
-    LIMIT $limit
-    """
 
     results = []
     
     try:
         async with neo4j_driver.session() as session:
-            result = await session.run(query, user_id=user_id_int, limit=limit)
+            result = await session.run(BOOK_RECOMMENDATIONS_QUERY, user_id=user_id_int, limit=limit)
             records = await result.data()
             
             for record in records:
@@ -194,22 +277,39 @@ async def get_book_recommendations(user_id: int, limit: int = 5) -> List[str]:
         
     return results
 
-async def handle_rated_polyglot_write(user_id: int, book_id: str, rating: int):
-    """Handles the polyglot write for the RATED relationship outside of the route context."""
-    
+async def _run_batch_query(query: str, user_ids: List[int], **params) -> Dict[int, list]:
+    """Runs an UNWIND $user_ids batch query in one session; users without results map to []."""
     neo4j_driver = get_neo4j_driver_direct()
-    
-    try:
-        # Use a separate session context to ensure it commits.
-        async with neo4j_driver.session() as session:
-            await create_rated_relationship_neo4j(
-                session,
-                user_id=user_id,
-                book_id=book_id,
-                rating=rating
-            )
-    except Exception as e:
-        print(f"Neo4j RATED relationship creation failed in wrapper: {e}")
+    results = {int(user_id): [] for user_id in user_ids}
+    async with neo4j_driver.session() as session:
+        result = await session.run(query, user_ids=list(results), **params)
+        async for record in result:
+            results[int(record["uid"])] = record["recommended_ids"]
+    return results
+
+async def get_follow_recommendations_batch(
+    user_ids: List[int], limit: int = 5, max_friends: int = 1000, book_weight: float = 0.5
+) -> Dict[int, List[int]]:
+    """
+    get_follow_recommendations for many users with a single UNWIND query (one Bolt round trip),
+    or from the in-memory follow graph when GRAPH_ENGINE=csr has a snapshot loaded.
+    """
+    snapshot = follow_graph.get_follow_graph()
+    if snapshot is not None:
+        try:
+            return {int(user_id): snapshot.friends_of_friends(int(user_id), limit, max_friends) for user_id in user_ids}
+        except Exception as e:
+            print(f"Follow graph read error, falling back to Neo4j: {e}")
+
+    results = await _run_batch_query(
+        BATCH_FOLLOW_RECOMMENDATIONS_QUERY, user_ids,
+        limit=limit, max_friends=max_friends, candidate_pool=limit * 4, book_weight=book_weight
+    )
+    return {user_id: [int(recommended_id) for recommended_id in ids] for user_id, ids in results.items()}
+
+async def get_book_recommendations_batch(user_ids: List[int], limit: int = 5) -> Dict[int, List[str]]:
+    """get_book_recommendations for many users with a single UNWIND query."""
+    return await _run_batch_query(BATCH_BOOK_RECOMMENDATIONS_QUERY, user_ids, limit=limit)
 
 async def check_if_following(conn: Connection, follower_id: int, followee_id: int) -> bool:
     """Checks if a follower is following a followee in the Postgres 'follows' table."""
@@ -221,4 +321,81 @@ async def check_if_following(conn: Connection, follower_id: int, followee_id: in
     """
     # fetchval returns the value of the first column of the first row (a boolean)
     # 
-    return await conn.fetchval(query, follower_id, followee_id)
\ No newline at end of file
+    return await conn.fetchval(query, follower_id, followee_id)
+
+async def get_following_statuses(conn: Connection, follower_id: int, followee_ids: List[int]) -> Dict[int, bool]:
+    """
+    Follow status of the follower towards many users at once, from the cached followee set
+    (one Redis read). The set is loaded from Postgres on a miss.
+    """
+    statuses = await followee_cache.get_following_statuses(follower_id, followee_ids)
+    if statuses is None:
+        records = await conn.fetch("SELECT followee_id FROM follows WHERE follower_id = $1;", follower_id)
+        followees = {record["followee_id"] for record in records}
+        await followee_cache.cache_followees(follower_id, followees)
+        statuses = [followee_id in followees for followee_id in followee_ids]
+    return dict(zip(followee_ids, statuses))
+
+# --- User Stats (follower / following counters) ---
+
+def _stats_entry(record) -> Tuple[int, dict, int]:
+    """(user_id, stats, version) cache entry of a user_stats row."""
+    stats = {"followers_count": record["followers_count"], "following_count": record["following_count"]}
+    return record["user_id"], stats, record["version"]
+
+async def get_user_stats(conn: Connection, user_id: int) -> dict:
+    """
+    Reads a user's follow counters from the Redis hash, falling back to one user_stats
+    primary-key lookup. O(1) however many followers the user has.
+    """
+    stats = await user_stats_cache.get_cached_user_stats(user_id)
+    if stats is None:
+        record = await conn.fetchrow(
+            "SELECT user_id, followers_count, following_count, version FROM user_stats WHERE user_id = $1;",
+            user_id,
+        )
+        if record:
+            _, stats, version = _stats_entry(record)
+        else:
+            # No row yet: version 0 is older than the first committed follow
+            stats, version = {"followers_count": 0, "following_count": 0}, 0
+        await user_stats_cache.cache_user_stats((user_id, stats, version))
+    return {"user_id": user_id, **stats}
+
+async def rebuild_user_stats(conn: Connection) -> int:
+    """
+    Recomputes every user's counters from 'follows' in two GROUP BY passes and rewrites the
+    rows that were off. The table is locked for the duration so concurrent follows wait and
+    are applied on top. Returns the number of corrected users (their cached counters are rewritten).
+    """
+    async with conn.transaction():
+        await conn.execute("LOCK TABLE user_stats IN EXCLUSIVE MODE;")
+        records = await conn.fetch("""
+        WITH counts AS (
+            SELECT u.id AS user_id,
+                   COALESCE(followers.count, 0) AS followers_count,
+                   COALESCE(following.count, 0) AS following_count
+            FROM users u
+            LEFT JOIN (SELECT followee_id, COUNT(*) AS count FROM follows GROUP BY followee_id) followers
+                   ON followers.followee_id = u.id
+            LEFT JOIN (SELECT follower_id, COUNT(*) AS count FROM follows GROUP BY follower_id) following
+                   ON following.follower_id = u.id
+        )
+        INSERT INTO user_stats (user_id, followers_count, following_count)
+        SELECT counts.user_id, counts.followers_count, counts.following_count
+        FROM counts
+        LEFT JOIN user_stats current ON current.user_id = counts.user_id
+        WHERE current.user_id IS NULL AND (counts.followers_count > 0 OR counts.following_count > 0)
+           OR current.followers_count <> counts.followers_count
+           OR current.following_count <> counts.following_count
+        ON CONFLICT (user_id) DO UPDATE SET
+            followers_count = EXCLUDED.followers_count,
+            following_count = EXCLUDED.following_count,
+            version = user_stats.version + 1,
+            updated_at = now()
+        RETURNING user_id, followers_count, following_count, version;
+        """)
+    corrected = [_stats_entry(record) for record in records]
+    for start in range(0, len(corrected), 1000):
+        await user_stats_cache.cache_user_stats(*corrected[start:start + 1000])
+    return len(corrected)
@@ -0,0 +1,219 @@
+# services/graph_reconcile_service.py
+"""
+Rebuilds the Neo4j social graph from Postgres, the source of truth, or repairs only the parts
+that drifted. Used by scripts.reconcile_graph.
+
+The graph holds (:User {id}) nodes, (:User)-[:FOLLOWS]->(:User) edges and
+(:User)-[:RATED {rating}]->(:Book) edges carrying the latest rating of each (user, book).
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from asyncpg import Connection
+from graph.neo4j import get_neo4j_driver_direct
+from services.graph_sync_service import MERGE_USERS_QUERY, MERGE_FOLLOWS_QUERY, MERGE_RATINGS_QUERY
+
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_RANGE_SIZE = 1000
+FINGERPRINT_MODULUS = 2147483647
+# The book id's content in the rating fingerprints: the last 8 hex digits of the ObjectId
+# (its random and counter bytes), as an integer, computed identically on both sides
+PG_BOOK_HASH = "('x' || right(book_id, 8))::bit(32)::bigint"
+NEO4J_BOOK_HASH = "toInteger('0x' + right(b.id, 8))"
+
+# --- Postgres sources (streamed with server-side cursors) ---
+USERS_SQL = "SELECT id AS user_id FROM users"
+FOLLOWS_SQL = "SELECT follower_id, followee_id FROM follows"
+# The graph keeps one :RATED edge per (user, book), with the latest rating
+RATINGS_SQL = """
+SELECT DISTINCT ON (user_id, book_id) user_id, book_id, rating
+FROM reviews
+"""
+LATEST_RATINGS_ORDER = " ORDER BY user_id, book_id, id DESC"
+
+# --- Per-range checksums: (row count, sum of per-row fingerprints), grouped by user id range ---
+PG_CHECKSUM_SQL = {
+    "users": """
+    SELECT id / $1 AS bucket, count(*) AS rows, sum(id) AS fingerprint
+    FROM users GROUP BY bucket
+    """,
+    "follows": f"""
+    SELECT follower_id / $1 AS bucket, count(*) AS rows,
+           sum((follower_id::bigint * 1000003 + followee_id) % {FINGERPRINT_MODULUS}) AS fingerprint
+    FROM follows GROUP BY bucket
+    """,
+    "ratings": f"""
+    SELECT user_id / $1 AS bucket, count(*) AS rows,
+           sum((user_id::bigint * 1000003 + rating * 7919 + {PG_BOOK_HASH}) % {FINGERPRINT_MODULUS}) AS fingerprint
+    FROM ({RATINGS_SQL}{LATEST_RATINGS_ORDER}) latest
+    GROUP BY bucket
+    """,
+}
+
+# Non-integer ids (never normalized) fall outside every range and show up as drift
+NEO4J_CHECKSUM_CYPHER = {
+    "users": """
+    MATCH (u:User) WHERE u.id >= 0
+    RETURN u.id / $range_size AS bucket, count(*) AS rows, sum(u.id) AS fingerprint
+    """,
+    "follows": f"""
+    MATCH (a:User)-[:FOLLOWS]->(b:User) WHERE a.id >= 0 AND b.id >= 0
+    RETURN a.id / $range_size AS bucket, count(*) AS rows,
+           sum((a.id * 1000003 + b.id) % {FINGERPRINT_MODULUS}) AS fingerprint
+    """,
+    "ratings": f"""
+    MATCH (u:User)-[r:RATED]->(b:Book) WHERE u.id >= 0
+    RETURN u.id / $range_size AS bucket, count(*) AS rows,
+           sum((u.id * 1000003 + r.rating * 7919 + {NEO4J_BOOK_HASH}) % {FINGERPRINT_MODULUS}) AS fingerprint
+    """,
+}
+
+# --- Range rewrites: delete what the graph holds for the range, then load it from Postgres ---
+DELETE_RANGE_CYPHER = {
+    "users": "MATCH (u:User) WHERE u.id >= $lo AND u.id < $hi AND NOT u.id IN $keep DETACH DELETE u",
+    "follows": "MATCH (u:User)-[r:FOLLOWS]->() WHERE u.id >= $lo AND u.id < $hi DELETE r",
+    "ratings": "MATCH (u:User)-[r:RATED]->() WHERE u.id >= $lo AND u.id < $hi DELETE r",
+}
+RANGE_SQL = {
+    "users": USERS_SQL + " WHERE id >= $1 AND id < $2",
+    "follows": FOLLOWS_SQL + " WHERE follower_id >= $1 AND follower_id < $2",
+    "ratings": RATINGS_SQL + " WHERE user_id >= $1 AND user_id < $2" + LATEST_RATINGS_ORDER,
+}
+MERGE_CYPHER = {
+    "users": MERGE_USERS_QUERY,
+    "follows": MERGE_FOLLOWS_QUERY,
+    "ratings": MERGE_RATINGS_QUERY,
+}
+ENTITIES = ("users", "follows", "ratings")
+
+WIPE_CYPHER = [
+    "MATCH (:User)-[r:FOLLOWS|RATED]->() CALL { WITH r DELETE r } IN TRANSACTIONS OF 50000 ROWS",
+    "MATCH (u:User) CALL { WITH u DETACH DELETE u } IN TRANSACTIONS OF 50000 ROWS",
+]
+
+
+def _row_dict(entity: str, record) -> dict:
+    if entity == "users":
+        return {"user_id": record["user_id"]}
+    if entity == "follows":
+        return {"follower_id": record["follower_id"], "followee_id": record["followee_id"]}
+    return {"user_id": record["user_id"], "book_id": record["book_id"], "rating": record["rating"]}
+
+
+async def _write_rows(session, query: str, rows: list):
+    async def work(tx):
+        await (await tx.run(query, rows=rows)).consume()
+    await session.execute_write(work)
+
+
+async def stream_into_graph(
+    conn: Connection, entity: str, batch_size: int = DEFAULT_BATCH_SIZE,
+    on_progress: Optional[Callable[[str, int], None]] = None,
+) -> int:
+    """
+    Streams one entity out of Postgres through a server-side cursor and MERGEs it into Neo4j
+    in UNWIND batches. The next batch is fetched while the previous one is written, and at most
+    two batches are held in memory. Returns the rows loaded.
+    """
+    sql = {"users": USERS_SQL, "follows": FOLLOWS_SQL, "ratings": RATINGS_SQL + LATEST_RATINGS_ORDER}[entity]
+    loaded = 0
+    async with get_neo4j_driver_direct().session() as session:
+        async with conn.transaction():  # Cursors need a transaction
+            cursor = await conn.cursor(sql)
+            pending_write: Optional[asyncio.Task] = None
+            try:
+                while True:
+                    records = await cursor.fetch(batch_size)
+                    if pending_write is not None:
+                        await pending_write
+                        pending_write = None
+                    if not records:
+                        break
+                    rows = [_row_dict(entity, record) for record in records]
+                    pending_write = asyncio.create_task(_write_rows(session, MERGE_CYPHER[entity], rows))
+                    loaded += len(rows)
+                    if on_progress:
+                        on_progress(entity, loaded)
+            finally:
+                if pending_write is not None:
+                    pending_write.cancel()
+    return loaded
+
+
+async def wipe_graph():
+    """Deletes every :User node with its FOLLOWS and RATED edges (:Book nodes are kept)."""
+    async with get_neo4j_driver_direct().session() as session:
+        for query in WIPE_CYPHER:
+            await (await session.run(query)).consume()
+
+
+async def rebuild_graph(
+    conn: Connection, batch_size: int = DEFAULT_BATCH_SIZE, wipe: bool = False,
+    on_progress: Optional[Callable[[str, int], None]] = None,
+) -> Dict[str, Tuple[int, float]]:
+    """
+    Full rebuild: loads every user, follow and latest rating into Neo4j.
+    With wipe=True the graph's users and their edges are deleted first, which also drops
+    anything Postgres no longer has. Returns {entity: (rows, seconds)}.
+    """
+    if wipe:
+        await wipe_graph()
+    report = {}
+    for entity in ENTITIES:
+        started = time.perf_counter()
+        rows = await stream_into_graph(conn, entity, batch_size, on_progress)
+        report[entity] = (rows, time.perf_counter() - started)
+    return report
+
+
+async def _checksums(conn: Connection, entity: str, range_size: int) -> Tuple[dict, dict]:
+    pg = {
+        record["bucket"]: (record["rows"], int(record["fingerprint"] or 0))
+        for record in await conn.fetch(PG_CHECKSUM_SQL[entity], range_size)
+    }
+    async with get_neo4j_driver_direct().session() as session:
+        result = await session.run(NEO4J_CHECKSUM_CYPHER[entity], range_size=range_size)
+        graph = {record["bucket"]: (record["rows"], int(record["fingerprint"] or 0)) async for record in result}
+    return pg, graph
+
+
+async def rewrite_range(conn: Connection, entity: str, lo: int, hi: int) -> int:
+    """Replaces one entity of the user id range [lo, hi) in Neo4j with the Postgres rows, in one transaction."""
+    records = await conn.fetch(RANGE_SQL[entity], lo, hi)
+    rows = [_row_dict(entity, record) for record in records]
+
+    async def work(tx):
+        params = {"lo": lo, "hi": hi}
+        if entity == "users":
+            params["keep"] = [row["user_id"] for row in rows]
+        await (await tx.run(DELETE_RANGE_CYPHER[entity], **params)).consume()
+        if rows:
+            await (await tx.run(MERGE_CYPHER[entity], rows=rows)).consume()
+
+    async with get_neo4j_driver_direct().session() as session:
+        await session.execute_write(work)
+    return len(rows)
+
+
+async def diff_and_repair(
+    conn: Connection, range_size: int = DEFAULT_RANGE_SIZE, dry_run: bool = False,
+    on_range: Optional[Callable[[str, int, int, int], None]] = None,
+) -> Dict[str, dict]:
+    """
+    Compares per-range checksums (row count and fingerprint sum) of Postgres and Neo4j, computed
+    server-side in one grouped pass per entity and side, and rewrites only the ranges that differ.
+    Returns {entity: {"ranges": checked, "drifted": n, "rows_rewritten": n}}.
+    """
+    report = {}
+    for entity in ENTITIES:
+        pg, graph = await _checksums(conn, entity, range_size)
+        drifted = sorted(bucket for bucket in pg.keys() | graph.keys() if pg.get(bucket) != graph.get(bucket))
+        rewritten = 0
+        for bucket in drifted:
+            lo, hi = bucket * range_size, (bucket + 1) * range_size
+            rows = 0 if dry_run else await rewrite_range(conn, entity, lo, hi)
+            rewritten += rows
+            if on_range:
+                on_range(entity, lo, hi, rows)
+        report[entity] = {"ranges": len(pg.keys() | graph.keys()), "drifted": len(drifted), "rows_rewritten": rewritten}
+    return report
@@ -0,0 +1,267 @@
+# services/graph_sync_service.py
+import asyncio
+import json
+import os
+import time
+from typing import Optional
+from asyncpg import Connection
+from dotenv import load_dotenv
+from neo4j import AsyncManagedTransaction
+from neo4j.exceptions import ServiceUnavailable, SessionExpired
+import db.postgres as postgres
+from graph.neo4j import get_neo4j_driver_direct
+from services import recommendation_service
+
+load_dotenv()
+
+# Configuration
+GRAPH_SYNC_ENABLED = os.getenv("GRAPH_SYNC_ENABLED", "true").lower() == "true"
+GRAPH_SYNC_BATCH_SIZE = int(os.getenv("GRAPH_SYNC_BATCH_SIZE", "500"))
+GRAPH_SYNC_POLL_INTERVAL = float(os.getenv("GRAPH_SYNC_POLL_INTERVAL", "0.5"))  # Seconds, when the queue is empty
+GRAPH_SYNC_LEASE_SECONDS = int(os.getenv("GRAPH_SYNC_LEASE_SECONDS", "60"))  # Claimed rows reappear after this if a worker dies
+GRAPH_SYNC_MAX_BACKOFF = int(os.getenv("GRAPH_SYNC_MAX_BACKOFF", "300"))  # Seconds
+GRAPH_SYNC_MAX_ATTEMPTS = int(os.getenv("GRAPH_SYNC_MAX_ATTEMPTS", "10"))  # Then the event is dead-lettered
+
+# Event types
+USER_CREATED = "user_created"
+FOLLOWED = "followed"
+RATED = "rated"
+
+# Every query is an idempotent MERGE, so replaying a batch (at-least-once delivery) is harmless
+MERGE_USERS_QUERY = """
+UNWIND $rows AS row
+MERGE (:User {id: row.user_id})
+"""
+
+MERGE_FOLLOWS_QUERY = """
+UNWIND $rows AS row
+MERGE (follower:User {id: row.follower_id})
+MERGE (followee:User {id: row.followee_id})
+MERGE (follower)-[:FOLLOWS]->(followee)
+"""
+
+MERGE_RATINGS_QUERY = """
+UNWIND $rows AS row
+MERGE (user:User {id: row.user_id})
+MERGE (book:Book {id: row.book_id})
+MERGE (user)-[r:RATED]->(book)
+ON CREATE SET r.rating = row.rating, r.created_at = datetime()
+ON MATCH SET r.rating = row.rating, r.updated_at = datetime()
+"""
+
+# Claims a batch by pushing its visibility out by the lease; SKIP LOCKED lets workers run side by side
+CLAIM_BATCH_QUERY = """
+UPDATE graph_outbox
+SET available_at = now() + make_interval(secs => $2), attempts = attempts + 1
+WHERE id IN (
+    SELECT id FROM graph_outbox
+    WHERE available_at <= now()
+    ORDER BY id
+    LIMIT $1
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING id, event_type, payload, attempts;
+"""
+
+RETRY_EVENT_QUERY = """
+UPDATE graph_outbox
+SET available_at = now() + make_interval(secs => LEAST($2::float8, power(2, attempts)::float8)),
+    last_error = $3
+WHERE id = $1;
+"""
+
+DEAD_LETTER_EVENT_QUERY = """
+WITH dead AS (
+    DELETE FROM graph_outbox WHERE id = $1
+    RETURNING id, event_type, payload, attempts, created_at
+)
+INSERT INTO graph_outbox_dead (id, event_type, payload, attempts, last_error, created_at)
+SELECT id, event_type, payload, attempts, $2, created_at FROM dead
+ON CONFLICT (id) DO NOTHING;
+"""
+
+# Neo4j itself is unreachable: every event would fail, so there is nothing to isolate
+UNAVAILABLE_ERRORS = (ServiceUnavailable, SessionExpired)
+
+worker_metrics = {
+    "events_synced": 0,
+    "batches_synced": 0,
+    "batches_failed": 0,
+    "events_failed": 0,
+    "events_dead_lettered": 0,
+    "last_batch_size": 0,
+    "last_batch_ms": 0.0,
+    "last_error": None,
+}
+
+_worker_task: Optional[asyncio.Task] = None
+
+
+async def enqueue(conn: Connection, event_type: str, payload: dict):
+    """
+    Records a graph change in the outbox. Call it inside the transaction that makes
+    the relational change, so both commit (or roll back) together.
+    """
+    await conn.execute(
+        "INSERT INTO graph_outbox (event_type, payload) VALUES ($1, $2::jsonb);",
+        event_type, json.dumps(payload)
+    )
+
+
+async def _write_batch(tx: AsyncManagedTransaction, users: list, follows: list, ratings: list):
+    # Users first so follows and ratings find their nodes (they MERGE them anyway)
+    if users:
+        await (await tx.run(MERGE_USERS_QUERY, rows=users)).consume()
+    if follows:
+        await (await tx.run(MERGE_FOLLOWS_QUERY, rows=follows)).consume()
+    if ratings:
+        await (await tx.run(MERGE_RATINGS_QUERY, rows=ratings)).consume()
+
+
+async def _apply_to_graph(events: list) -> list:
+    """Writes a batch of outbox events to Neo4j in a single transaction. Returns the follows written."""
+    users, follows = [], []
+    # Last rating per (user, book) wins; events are ordered by id
+    ratings = {}
+    for event in events:
+        payload = json.loads(event["payload"])
+        if event["event_type"] == USER_CREATED:
+            users.append({"user_id": int(payload["user_id"])})
+        elif event["event_type"] == FOLLOWED:
+            follows.append({"follower_id": int(payload["follower_id"]), "followee_id": int(payload["followee_id"])})
+        elif event["event_type"] == RATED:
+            ratings[(payload["user_id"], payload["book_id"])] = {
+                "user_id": int(payload["user_id"]), "book_id": payload["book_id"], "rating": int(payload["rating"])
+            }
+        else:
+            print(f"Graph sync: skipping unknown outbox event type '{event['event_type']}' (id {event['id']})")
+
+    neo4j_driver = get_neo4j_driver_direct()
+    async with neo4j_driver.session() as session:
+        await session.execute_write(_write_batch, users, follows, list(ratings.values()))
+    return follows
+
+
+async def _apply_isolating_failures(events: list, synced: list, follows: list, failed: list):
+    """
+    Writes events to Neo4j; when a group fails it is split in halves and retried, so one bad
+    event only holds back itself. Halves keep the outbox order. Appends to synced / follows,
+    and (event, error) pairs to failed.
+    """
+    try:
+        follows.extend(await _apply_to_graph(events))
+        synced.extend(events)
+    except Exception as e:
+        if len(events) == 1 or isinstance(e, UNAVAILABLE_ERRORS):
+            failed.extend((event, e) for event in events)
+            return
+        middle = len(events) // 2
+        await _apply_isolating_failures(events[:middle], synced, follows, failed)
+        await _apply_isolating_failures(events[middle:], synced, follows, failed)
+
+
+async def sync_batch(batch_size: int = GRAPH_SYNC_BATCH_SIZE) -> int:
+    """
+    Claims up to batch_size due events, writes them to Neo4j and deletes them.
+    A failing batch is bisected down to the events that fail on their own; those are released
+    with exponential backoff, or dead-lettered after GRAPH_SYNC_MAX_ATTEMPTS.
+    Returns the number synced.
+    """
+    async with postgres.acquire_connection() as conn:
+        events = await conn.fetch(CLAIM_BATCH_QUERY, batch_size, GRAPH_SYNC_LEASE_SECONDS)
+    if not events:
+        return 0
+
+    started = time.perf_counter()
+    synced, follows, failed = [], [], []
+    await _apply_isolating_failures(list(events), synced, follows, failed)
+
+    async with postgres.acquire_connection() as conn:
+        if synced:
+            await conn.execute(
+                "DELETE FROM graph_outbox WHERE id = ANY($1::bigint[]);", [event["id"] for event in synced]
+            )
+        for event, error in failed:
+            message = str(error)[:1000]
+            if event["attempts"] >= GRAPH_SYNC_MAX_ATTEMPTS:
+                await conn.execute(DEAD_LETTER_EVENT_QUERY, event["id"], message)
+                worker_metrics["events_dead_lettered"] += 1
+                print(f"Graph sync: event {event['id']} dead-lettered after {event['attempts']} attempts: {message}")
+            else:
+                await conn.execute(RETRY_EVENT_QUERY, event["id"], GRAPH_SYNC_MAX_BACKOFF, message)
+
+    if failed:
+        worker_metrics["batches_failed"] += 1
+        worker_metrics["events_failed"] += len(failed)
+        worker_metrics["last_error"] = str(failed[-1][1])
+        print(f"Graph sync: {len(failed)} of {len(events)} events failed: {failed[-1][1]}")
+
+    # New edges change friend-of-friend candidates; drop the affected cached lists now that Neo4j has them
+    if follows:
+        try:
+            await recommendation_service.invalidate_after_follows(
+                (follow["follower_id"], follow["followee_id"]) for follow in follows
+            )
+        except Exception as e:
+            print(f"Recommendation invalidation error: {e}")
+
+    if synced:
+        worker_metrics["events_synced"] += len(synced)
+        worker_metrics["batches_synced"] += 1
+        worker_metrics["last_batch_size"] = len(synced)
+        worker_metrics["last_batch_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return len(synced)
+
+
+async def _run_worker():
+    """Drains the outbox continuously; sleeps only when there was nothing (or too little) to do."""
+    while True:
+        try:
+            synced = await sync_batch()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Graph sync worker error: {e}")
+            synced = 0
+        if synced < GRAPH_SYNC_BATCH_SIZE:
+            await asyncio.sleep(GRAPH_SYNC_POLL_INTERVAL)
+
+
+async def start_graph_sync_worker():
+    """Starts the background outbox drain (one per API worker; they coordinate via SKIP LOCKED)."""
+    global _worker_task
+    if GRAPH_SYNC_ENABLED and _worker_task is None:
+        _worker_task = asyncio.create_task(_run_worker())
+        print("Graph sync worker started.")
+
+
+async def stop_graph_sync_worker():
+    """Stops the background outbox drain."""
+    global _worker_task
+    if _worker_task is not None:
+        _worker_task.cancel()
+        try:
+            await _worker_task
+        except asyncio.CancelledError:
+            pass
+        _worker_task = None
+        print("Graph sync worker stopped.")
+
+
+async def get_graph_sync_metrics() -> dict:
+    """Outbox queue depth, lag and dead-lettered events, plus this worker's sync counters."""
+    async with postgres.acquire_connection() as conn:
+        record = await conn.fetchrow("""
+        SELECT COUNT(*) AS pending,
+               COUNT(*) FILTER (WHERE last_error IS NOT NULL) AS retrying,
+               EXTRACT(EPOCH FROM now() - MIN(created_at)) AS lag_seconds,
+               (SELECT COUNT(*) FROM graph_outbox_dead) AS dead_lettered
+        FROM graph_outbox;
+        """)
+    return {
+        "pending": record["pending"],
+        "retrying": record["retrying"],
+        "dead_lettered": record["dead_lettered"],
+        "lag_seconds": round(float(record["lag_seconds"]), 3) if record["lag_seconds"] is not None else 0.0,
+        **worker_metrics,
+    }
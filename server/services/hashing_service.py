@@ -0,0 +1,89 @@
+# services/hashing_service.py
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from dotenv import load_dotenv
+from passlib.context import CryptContext
+
+load_dotenv()
+
+# Configuration
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "64"))  # In-flight + queued hash jobs per API worker
+HASH_TIMEOUT = float(os.getenv("HASH_TIMEOUT", "5"))  # Seconds
+HASH_ROUNDS = int(os.getenv("HASH_ROUNDS", "535000"))  # passlib's sha256_crypt default
+
+# Configuration for password hashing (one copy per pool process)
+pwd_context = CryptContext(
+    schemes=["sha256_crypt"],
+    deprecated="auto",
+    sha256_crypt__default_rounds=HASH_ROUNDS,
+)
+
+executor: Optional[ProcessPoolExecutor] = None
+_pending = 0
+
+
+class HashingUnavailableError(Exception):
+    """Raised when the hashing pool is saturated or a job times out."""
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def start_hashing_pool():
+    """Starts the process pool used for password hashing."""
+    global executor
+    if executor is None:
+        executor = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+        print(f"Password hashing pool started with {HASH_WORKERS} workers.")
+
+
+def stop_hashing_pool():
+    """Shuts down the password hashing pool."""
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = None
+        print("Password hashing pool stopped.")
+
+
+async def _run(fn, *args):
+    """Runs a hashing job in the pool, rejecting it if the queue is full or it takes too long."""
+    global _pending
+    if executor is None:
+        raise RuntimeError("Password hashing pool is not initialized.")
+    if _pending >= HASH_MAX_PENDING:
+        raise HashingUnavailableError("Password hashing queue is full.")
+
+    loop = asyncio.get_running_loop()
+    job = executor.submit(fn, *args)
+    _pending += 1
+    # The slot is freed when the job really finishes (or is cancelled before starting), not when
+    # the caller gives up: a timed-out job still occupies a pool process until it completes
+    job.add_done_callback(lambda _: loop.call_soon_threadsafe(_release_slot))
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(job), timeout=HASH_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HashingUnavailableError("Password hashing timed out.")
+
+
+def _release_slot():
+    global _pending
+    _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    """Hashes a password using SHA256 without blocking the event loop."""
+    return await _run(_hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verifies a plain password against a hashed password without blocking the event loop."""
+    return await _run(_verify, plain_password, hashed_password)
@@ -0,0 +1,178 @@
+# services/ingest_service.py
+import asyncio
+import csv
+import itertools
+import json
+import time
+from typing import Callable, Iterator, List, Optional, TextIO, Tuple
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from models.book import BookCreate
+from models.ingest import IngestReport, IngestRowError
+from services.book_service import get_books_collection
+from graph.neo4j import get_neo4j_driver_direct
+from cache import book_cache
+from services import autocomplete_service
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+MERGE_BOOK_NODES_QUERY = """
+UNWIND $rows AS row
+MERGE (:Book {id: row.id})
+"""
+
+def detect_format(filename: str) -> str:
+    """Returns 'csv' or 'ndjson' based on the file extension."""
+    lowered = filename.lower()
+    if lowered.endswith(".csv"):
+        return "csv"
+    if lowered.endswith((".ndjson", ".jsonl", ".json")):
+        return "ndjson"
+    raise ValueError(f"Cannot detect the format of '{filename}', expected .csv or .ndjson")
+
+def iter_rows(stream: TextIO, fmt: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Lazily yields (row_number, row, parse_error) from a CSV (with header) or NDJSON stream.
+    Only one line is held in memory at a time.
+    """
+    if fmt == "csv":
+        for row_number, row in enumerate(csv.DictReader(stream), start=1):
+            # Empty CSV cells mean "not provided"
+            yield row_number, {k: v for k, v in row.items() if k and v not in (None, "")}, None
+    elif fmt == "ndjson":
+        row_number = 0
+        for line in stream:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield row_number, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield row_number, None, "Expected a JSON object"
+                continue
+            yield row_number, row, None
+    else:
+        raise ValueError(f"Unsupported format '{fmt}'")
+
+def _record_error(report: IngestReport, row_number: int, isbn: Optional[str], error: str):
+    report.failed += 1
+    if len(report.errors) < MAX_REPORTED_ERRORS:
+        report.errors.append(IngestRowError(row=row_number, isbn=isbn, error=error))
+
+def _read_chunk(
+    rows: Iterator[Tuple[int, Optional[dict], Optional[str]]], chunk_size: int, report: IngestReport
+) -> Optional[List[Tuple[int, BookCreate]]]:
+    """
+    Reads, parses and validates the next chunk of rows, recording row errors in the report.
+    Blocking (file reads, parsing, model validation): run it off the event loop.
+    Returns the valid books, or None at the end of the stream.
+    """
+    chunk = list(itertools.islice(rows, chunk_size))
+    if not chunk:
+        return None
+
+    valid: List[Tuple[int, BookCreate]] = []
+    seen_isbns = set()
+    for row_number, row, parse_error in chunk:
+        report.rows_read += 1
+        if parse_error:
+            _record_error(report, row_number, None, parse_error)
+            continue
+        try:
+            book = BookCreate(**row)
+        except ValidationError as e:
+            message = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+            )
+            _record_error(report, row_number, row.get("isbn"), message)
+            continue
+        if book.isbn in seen_isbns:
+            _record_error(report, row_number, book.isbn, "Duplicate ISBN in the same batch")
+            continue
+        seen_isbns.add(book.isbn)
+        valid.append((row_number, book))
+    return valid
+
+async def _write_chunk(report: IngestReport, valid: List[Tuple[int, BookCreate]]):
+    """Upserts one validated chunk into MongoDB by ISBN, then merges the :Book nodes in Neo4j."""
+    BOOKS_COLLECTION = get_books_collection()
+
+    operations = [
+        UpdateOne({"isbn": book.isbn}, {"$set": book.model_dump(by_alias=True)}, upsert=True)
+        for _, book in valid
+    ]
+
+    try:
+        result = await BOOKS_COLLECTION.bulk_write(operations, ordered=False)
+        details = result.bulk_api_result
+    except BulkWriteError as e:
+        # Unordered: every other operation was still applied
+        details = e.details
+        for write_error in details.get("writeErrors", []):
+            row_number, book = valid[write_error["index"]]
+            _record_error(report, row_number, book.isbn, write_error.get("errmsg", "Write failed"))
+
+    report.inserted += details.get("nUpserted", 0)
+    report.updated += details.get("nMatched", 0)
+
+    # Resolve the Mongo ids of every book in the chunk with one indexed $in query
+    isbns = [book.isbn for _, book in valid]
+    upserted = {str(entry["_id"]) for entry in details.get("upserted", [])}
+    documents = [
+        document
+        async for document in BOOKS_COLLECTION.find({"isbn": {"$in": isbns}}, projection={"title": 1, "author": 1})
+    ]
+    book_ids = [str(document["_id"]) for document in documents]
+
+    # Existing books were overwritten, so cached copies are stale; the prefix index replaces
+    # their entries (a no-op when title and author did not change)
+    await book_cache.invalidate_books(*[book_id for book_id in book_ids if book_id not in upserted])
+    await autocomplete_service.publish_books_added(
+        (str(document["_id"]), document["title"], document["author"]) for document in documents
+    )
+
+    if book_ids:
+        neo4j_driver = get_neo4j_driver_direct()
+        try:
+            async with neo4j_driver.session() as session:
+                result = await session.run(MERGE_BOOK_NODES_QUERY, rows=[{"id": book_id} for book_id in book_ids])
+                await result.consume()
+            report.graph_nodes_merged += len(book_ids)
+        except Exception as e:
+            # The catalog write already succeeded; :Book nodes are also merged lazily on first rating
+            print(f"Neo4j Error during bulk :Book merge: {e}")
+
+async def ingest_books(
+    stream: TextIO,
+    fmt: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_progress: Optional[Callable[[IngestReport], None]] = None,
+) -> IngestReport:
+    """
+    Streams books from a CSV/NDJSON stream into MongoDB and Neo4j in chunks.
+    Memory stays bounded by chunk_size regardless of the file size.
+    """
+    report = IngestReport()
+    started = time.perf_counter()
+
+    rows = iter_rows(stream, fmt)
+    while True:
+        # Parsing and validation run in a thread so other requests on this worker keep being served
+        valid = await asyncio.to_thread(_read_chunk, rows, chunk_size, report)
+        if valid is None:
+            break
+
+        if valid:
+            await _write_chunk(report, valid)
+
+        report.elapsed_seconds = round(time.perf_counter() - started, 3)
+        report.rows_per_second = round(report.rows_read / report.elapsed_seconds, 1) if report.elapsed_seconds else 0.0
+        if on_progress:
+            on_progress(report)
+
+    return report
@@ -0,0 +1,127 @@
+# services/item_recommendation_service.py
+import json
+import os
+import time
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from asyncpg import Connection
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configuration
+ITEM_SIMILARITY_PATH = os.getenv("ITEM_SIMILARITY_PATH", "data/item_similarity")  # Written by scripts.build_item_similarities
+ITEM_SIMILARITY_RELOAD_CHECK = 60  # Seconds between checks for a newer build
+BLEND_SOCIAL_WEIGHT = float(os.getenv("BLEND_SOCIAL_WEIGHT", "0.5"))  # Social share of blended rankings (0..1)
+RANK_FUSION_K = 60  # Reciprocal rank fusion constant
+
+MANIFEST_FILE = "manifest.json"
+ID_LENGTH = 24  # MongoDB ObjectId hex strings, stored as S24
+
+
+class ItemSimilarityIndex:
+    """
+    Top-K item-item neighbor lists, memory-mapped from a build of scripts.build_item_similarities:
+        book_ids[i]     MongoDB id of item i (sorted, so ids are looked up by binary search)
+        neighbors[i]    indices of the K most similar items (-1 pads items with fewer neighbors)
+        similarities[i] their cosine similarities, float32
+    """
+    def __init__(self, book_ids: np.ndarray, neighbors: np.ndarray, similarities: np.ndarray, version: str):
+        self.book_ids = book_ids
+        self.neighbors = neighbors
+        self.similarities = similarities
+        self.version = version
+
+    def positions_of(self, book_ids: Sequence[str]) -> np.ndarray:
+        """Item positions of the given ids (-1 for ids not in the index), without any per-build lookup table."""
+        keys = np.asarray([book_id.encode() for book_id in book_ids], dtype=f"S{ID_LENGTH + 1}")
+        if not len(self.book_ids) or not len(keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.book_ids, keys), len(self.book_ids) - 1)
+        # The extra byte keeps longer (non-ObjectId) ids from matching on a truncated prefix
+        found = self.book_ids[positions] == keys
+        return np.where(found, positions, -1)
+
+    @classmethod
+    def load(cls, path: str) -> "ItemSimilarityIndex":
+        with open(os.path.join(path, MANIFEST_FILE)) as manifest_file:
+            manifest = json.load(manifest_file)
+        files = manifest["files"]
+        return cls(
+            np.load(os.path.join(path, files["book_ids"]), mmap_mode="r"),
+            np.load(os.path.join(path, files["neighbors"]), mmap_mode="r"),
+            np.load(os.path.join(path, files["similarities"]), mmap_mode="r"),
+            manifest["version"],
+        )
+
+    def recommend(self, ratings: Sequence[Tuple[str, int]], limit: int = 5) -> List[str]:
+        """
+        Scores unseen books from the user's own (book_id, rating) pairs: each rated book adds its
+        neighbors' similarities weighted by (rating - 3), so 4-5 stars pull similar books up and
+        1-2 stars push them down. Returns the best book ids, highest score first.
+        """
+        positions = self.positions_of([book_id for book_id, _ in ratings])
+        known = positions >= 0
+        if not known.any():
+            return []
+        items = positions[known]
+        weights = np.fromiter((rating - 3 for _, rating in ratings), dtype=np.float32, count=len(ratings))[known]
+
+        neighbors = self.neighbors[items].ravel()
+        contributions = (self.similarities[items] * weights[:, None]).ravel()
+        valid = neighbors >= 0
+        neighbors, contributions = neighbors[valid], contributions[valid]
+
+        # Sum per candidate over the (few) touched items only
+        candidates, inverse = np.unique(neighbors, return_inverse=True)
+        scores = np.bincount(inverse, weights=contributions)
+        keep = ~np.isin(candidates, items) & (scores > 0)
+        candidates, scores = candidates[keep], scores[keep]
+        if not len(candidates):
+            return []
+
+        top = np.argsort(-scores, kind="stable")[:limit]
+        return [book_id.decode() for book_id in self.book_ids[candidates[top]].tolist()]
+
+
+_index: Optional[ItemSimilarityIndex] = None
+_manifest_mtime = 0.0
+_last_check = 0.0
+
+
+def get_item_index() -> Optional[ItemSimilarityIndex]:
+    """The current similarity index, reloaded when a newer build is published. None until one exists."""
+    global _index, _manifest_mtime, _last_check
+    now = time.monotonic()
+    if _index is not None and now - _last_check < ITEM_SIMILARITY_RELOAD_CHECK:
+        return _index
+    _last_check = now
+    try:
+        mtime = os.path.getmtime(os.path.join(ITEM_SIMILARITY_PATH, MANIFEST_FILE))
+        if mtime != _manifest_mtime:
+            _index = ItemSimilarityIndex.load(ITEM_SIMILARITY_PATH)
+            _manifest_mtime = mtime
+            print(f"Item similarity index {_index.version} loaded: {len(_index.book_ids)} books.")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Item similarity index load error: {e}")
+    return _index
+
+
+async def get_personal_recommendations(conn: Connection, user_id: int, limit: int = 5) -> List[str]:
+    """Item-item recommendations from the user's own ratings: one indexed query, no Neo4j."""
+    index = get_item_index()
+    if index is None:
+        return []
+    records = await conn.fetch("SELECT book_id, rating FROM reviews WHERE user_id = $1;", user_id)
+    return index.recommend([(record["book_id"], record["rating"]) for record in records], limit)
+
+
+def blend_rankings(personal: List[str], social: List[str], limit: int = 5, social_weight: float = BLEND_SOCIAL_WEIGHT) -> List[str]:
+    """Merges two rankings with weighted reciprocal rank fusion."""
+    scores = {}
+    for weight, ranking in ((1 - social_weight, personal), (social_weight, social)):
+        for rank, book_id in enumerate(ranking):
+            scores[book_id] = scores.get(book_id, 0.0) + weight / (RANK_FUSION_K + rank)
+    return sorted(scores, key=scores.get, reverse=True)[:limit]
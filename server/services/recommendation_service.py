@@ -0,0 +1,229 @@
+# services/recommendation_service.py
+import asyncio
+import json
+import os
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+import db.postgres as postgres
+from cache.redis import get_redis_client_direct
+from services import follow_service
+
+load_dotenv()
+
+# Configuration
+RECS_TOP_N = int(os.getenv("RECS_TOP_N", "50"))  # Recommendations computed and cached per user
+RECS_CACHE_TTL = int(os.getenv("RECS_CACHE_TTL", "3600"))  # Seconds
+RECS_MAX_FRIENDS = int(os.getenv("RECS_MAX_FRIENDS", "1000"))  # Followees expanded per computation
+RECS_BOOK_WEIGHT = float(os.getenv("RECS_BOOK_WEIGHT", "0.5"))  # Score per shared highly-rated book
+RECS_REFRESH_ENABLED = os.getenv("RECS_REFRESH_ENABLED", "true").lower() == "true"
+RECS_REFRESH_INTERVAL = int(os.getenv("RECS_REFRESH_INTERVAL", "300"))  # Seconds between refresher runs
+RECS_REFRESH_AHEAD = int(os.getenv("RECS_REFRESH_AHEAD", "600"))  # Refresh lists expiring within this many seconds
+RECS_ACTIVE_WINDOW = int(os.getenv("RECS_ACTIVE_WINDOW", "86400"))  # Seconds since the last request to count as active
+RECS_REFRESH_BATCH = int(os.getenv("RECS_REFRESH_BATCH", "500"))  # Users refreshed per run
+RECS_BATCH_CHUNK_SIZE = int(os.getenv("RECS_BATCH_CHUNK_SIZE", "500"))  # Users per UNWIND query
+RECS_BATCH_CONCURRENCY = int(os.getenv("RECS_BATCH_CONCURRENCY", "4"))  # Chunk queries in flight per request
+
+# Users who requested recommendations, scored by the time of their last request
+ACTIVE_USERS_KEY = "recs:users:active"
+REFRESHER_LOCK_KEY = "recs:users:refresher_lock"
+INVALIDATION_BATCH_SIZE = 1000
+
+_refresher_task: Optional[asyncio.Task] = None
+
+
+def follow_recommendations_key(user_id: int) -> str:
+    return f"recs:users:{user_id}"
+
+
+async def refresh_follow_recommendations(user_id: int) -> List[int]:
+    """Computes the user's top RECS_TOP_N recommendations in Neo4j and caches them."""
+    recommendations = await follow_service.get_follow_recommendations(
+        user_id, RECS_TOP_N, max_friends=RECS_MAX_FRIENDS, book_weight=RECS_BOOK_WEIGHT
+    )
+    await get_redis_client_direct().set(
+        follow_recommendations_key(user_id), json.dumps(recommendations), ex=RECS_CACHE_TTL
+    )
+    return recommendations
+
+
+async def get_follow_recommendations(user_id: int, limit: int = 5) -> List[int]:
+    """
+    Returns the user's follow recommendations, best first, from the Redis cache when present
+    (one round trip, which also marks the user active for the refresher).
+    Limits above RECS_TOP_N are computed directly and not cached.
+    """
+    if limit > RECS_TOP_N:
+        return await follow_service.get_follow_recommendations(
+            user_id, limit, max_friends=RECS_MAX_FRIENDS, book_weight=RECS_BOOK_WEIGHT
+        )
+
+    redis_client = get_redis_client_direct()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.get(follow_recommendations_key(user_id))
+        pipe.zadd(ACTIVE_USERS_KEY, {str(user_id): time.time()})
+        cached, _ = await pipe.execute()
+
+    if cached is not None:
+        return json.loads(cached)[:limit]
+    return (await refresh_follow_recommendations(user_id))[:limit]
+
+
+async def _follow_recommendations_chunk(user_ids: List[int], limit: int) -> Dict[int, List[int]]:
+    """Cached lists first (one MGET), then one batch query for the users without one."""
+    results = {}
+    if limit <= RECS_TOP_N:
+        cached = await get_redis_client_direct().mget([follow_recommendations_key(user_id) for user_id in user_ids])
+        for user_id, value in zip(user_ids, cached):
+            if value is not None:
+                results[user_id] = json.loads(value)[:limit]
+    missing = [user_id for user_id in user_ids if user_id not in results]
+    if missing:
+        results.update(await follow_service.get_follow_recommendations_batch(
+            missing, limit, max_friends=RECS_MAX_FRIENDS, book_weight=RECS_BOOK_WEIGHT
+        ))
+    return results
+
+
+async def _stream_chunks(
+    user_ids: List[int],
+    fetch_chunk: Callable[[List[int]], Awaitable[Dict[int, list]]],
+    chunk_size: int,
+    concurrency: int,
+) -> AsyncIterator[dict]:
+    """
+    Runs fetch_chunk over chunks of user ids, at most 'concurrency' at a time, and yields one
+    {"user_id", "recommendations"} item per user as chunks complete. A failed chunk yields
+    {"user_id", "error"} items for its users instead of ending the stream.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(chunk: List[int]):
+        async with semaphore:
+            try:
+                return chunk, await fetch_chunk(chunk), None
+            except Exception as e:
+                print(f"Batch recommendation chunk error: {e}")
+                return chunk, None, "Failed to compute recommendations."
+
+    tasks = [
+        asyncio.create_task(run(user_ids[start:start + chunk_size]))
+        for start in range(0, len(user_ids), chunk_size)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            chunk, results, error = await next_done
+            for user_id in chunk:
+                if error:
+                    yield {"user_id": user_id, "error": error}
+                else:
+                    yield {"user_id": user_id, "recommendations": results.get(user_id, [])}
+    finally:
+        # The client may disconnect mid-stream
+        for task in tasks:
+            task.cancel()
+
+
+def stream_follow_recommendations_batch(
+    user_ids: List[int], limit: int = 5, chunk_size: int = RECS_BATCH_CHUNK_SIZE, concurrency: int = RECS_BATCH_CONCURRENCY
+) -> AsyncIterator[dict]:
+    """Follow recommendations for many users, one UNWIND query per chunk of uncached users."""
+    unique_ids = list(dict.fromkeys(int(user_id) for user_id in user_ids))
+    return _stream_chunks(unique_ids, lambda chunk: _follow_recommendations_chunk(chunk, limit), chunk_size, concurrency)
+
+
+def stream_book_recommendations_batch(
+    user_ids: List[int], limit: int = 5, chunk_size: int = RECS_BATCH_CHUNK_SIZE, concurrency: int = RECS_BATCH_CONCURRENCY
+) -> AsyncIterator[dict]:
+    """Social book recommendations for many users, one UNWIND query per chunk."""
+    unique_ids = list(dict.fromkeys(int(user_id) for user_id in user_ids))
+    return _stream_chunks(
+        unique_ids, lambda chunk: follow_service.get_book_recommendations_batch(chunk, limit), chunk_size, concurrency
+    )
+
+
+async def invalidate_after_follows(follows: Iterable[Tuple[int, int]]):
+    """
+    Drops cached recommendations affected by new (follower, followee) edges: the follower's own
+    list, and the lists of everyone following the follower (the followee is now two hops from them).
+    Called once the edges are in Neo4j, so a recomputation sees them.
+    """
+    follower_ids = list({int(follower_id) for follower_id, _ in follows})
+    if not follower_ids:
+        return
+
+    async with postgres.acquire_connection() as conn:
+        records = await conn.fetch(
+            "SELECT DISTINCT follower_id FROM follows WHERE followee_id = ANY($1::int[]);", follower_ids
+        )
+    affected = set(follower_ids) | {record["follower_id"] for record in records}
+
+    redis_client = get_redis_client_direct()
+    keys = [follow_recommendations_key(user_id) for user_id in affected]
+    for start in range(0, len(keys), INVALIDATION_BATCH_SIZE):
+        await redis_client.unlink(*keys[start:start + INVALIDATION_BATCH_SIZE])
+
+
+async def refresh_active_users() -> int:
+    """
+    Recomputes recommendations of recently active users whose cached list is missing or
+    about to expire, so their next request is a cache hit. Returns the number refreshed.
+    """
+    redis_client = get_redis_client_direct()
+    now = time.time()
+    await redis_client.zremrangebyscore(ACTIVE_USERS_KEY, "-inf", now - RECS_ACTIVE_WINDOW)
+    # Most recently active first
+    user_ids = await redis_client.zrevrange(ACTIVE_USERS_KEY, 0, -1)
+
+    refreshed = 0
+    for start in range(0, len(user_ids), RECS_REFRESH_BATCH):
+        batch = user_ids[start:start + RECS_REFRESH_BATCH]
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for user_id in batch:
+                pipe.ttl(follow_recommendations_key(user_id))
+            ttls = await pipe.execute()
+        for user_id, ttl in zip(batch, ttls):
+            # -2: no cached list, -1: no expiry (not set by this module)
+            if ttl == -2 or 0 <= ttl < RECS_REFRESH_AHEAD:
+                await refresh_follow_recommendations(int(user_id))
+                refreshed += 1
+                if refreshed >= RECS_REFRESH_BATCH:
+                    return refreshed
+    return refreshed
+
+
+async def _run_refresher():
+    while True:
+        try:
+            # Only one API worker refreshes per interval
+            if await get_redis_client_direct().set(REFRESHER_LOCK_KEY, "1", nx=True, ex=RECS_REFRESH_INTERVAL):
+                started = time.perf_counter()
+                refreshed = await refresh_active_users()
+                if refreshed:
+                    print(f"Refreshed follow recommendations of {refreshed} active users in {time.perf_counter() - started:.2f}s.")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Recommendation refresher error: {e}")
+        await asyncio.sleep(RECS_REFRESH_INTERVAL)
+
+
+async def start_recommendation_refresher():
+    """Starts the background refresher of active users' follow recommendations."""
+    global _refresher_task
+    if RECS_REFRESH_ENABLED and _refresher_task is None:
+        _refresher_task = asyncio.create_task(_run_refresher())
+        print("Recommendation refresher started.")
+
+
+async def stop_recommendation_refresher():
+    """Stops the background refresher."""
+    global _refresher_task
+    if _refresher_task is not None:
+        _refresher_task.cancel()
+        try:
+            await _refresher_task
+        except asyncio.CancelledError:
+            pass
+        _refresher_task = None
+        print("Recommendation refresher stopped.")
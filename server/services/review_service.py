@@ -1,9 +1,31 @@
 from asyncpg import Connection
+from db.postgres import PoolAcquireTimeoutError
 from models.review import ReviewCreate, ReviewInDB
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple
+from datetime import datetime
+from utils.pagination import encode_cursor, decode_cursor
+from services import graph_sync_service
+
+# Adds one rating to the book's aggregate row ($2 is the rating)
+UPSERT_RATING_STATS_QUERY = """
+INSERT INTO book_rating_stats (book_id, rating_count, rating_sum, rating_1, rating_2, rating_3, rating_4, rating_5)
+VALUES ($1, 1, $2, ($2 = 1)::int, ($2 = 2)::int, ($2 = 3)::int, ($2 = 4)::int, ($2 = 5)::int)
+ON CONFLICT (book_id) DO UPDATE SET
+    rating_count = book_rating_stats.rating_count + 1,
+    rating_sum = book_rating_stats.rating_sum + EXCLUDED.rating_sum,
+    rating_1 = book_rating_stats.rating_1 + EXCLUDED.rating_1,
+    rating_2 = book_rating_stats.rating_2 + EXCLUDED.rating_2,
+    rating_3 = book_rating_stats.rating_3 + EXCLUDED.rating_3,
+    rating_4 = book_rating_stats.rating_4 + EXCLUDED.rating_4,
+    rating_5 = book_rating_stats.rating_5 + EXCLUDED.rating_5,
+    updated_at = now();
+"""
 
 async def create_review(conn: Connection, user_id: int, book_id: str, review_data: ReviewCreate) -> Optional[ReviewInDB]:
-    """Inserts a new review into the Postgres database."""
+    """
+    Inserts a new review, updates the book's rating aggregates and queues the Neo4j
+    :RATED relationship, all in the same transaction.
+    """
     
     query = """
     INSERT INTO reviews (user_id, book_id, rating, review_text)
@@ -13,24 +35,123 @@ async def create_review(conn: Connection, user_id: int, book_id: str, review_dat
     
     # Execute the insert query
     try:
-        record = await conn.fetchrow(
-            query, user_id, book_id, review_data.rating, review_data.review_text
-        )
+        async with conn.transaction():
+            record = await conn.fetchrow(
+                query, user_id, book_id, review_data.rating, review_data.review_text
+            )
+            await conn.execute(UPSERT_RATING_STATS_QUERY, book_id, review_data.rating)
+            await graph_sync_service.enqueue(conn, graph_sync_service.RATED, {
+                "user_id": user_id, "book_id": book_id, "rating": review_data.rating
+            })
         if record:
             return ReviewInDB(**dict(record))
+    except PoolAcquireTimeoutError:
+        raise  # Answered with a 503 by the app's handler
     except Exception as e:
         print(f"Postgres error during review creation: {e}")
         return None
     return None
 
-async def get_reviews_for_book(conn: Connection, book_id: str, limit: int = 10, skip: int = 0) -> List[ReviewInDB]:
-    """Retrieves all reviews for a specific book."""
+async def get_reviews_for_book(
+    conn: Connection, book_id: str, limit: int = 10, skip: int = 0, cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Retrieves a page of reviews for a specific book, newest first.
+    Pages are addressed by an opaque (created_at, id) keyset cursor; 'skip' is a deprecated fallback.
+    Rows are returned as ReviewInDB-shaped dicts; the columns already match the model.
+    Returns the page and the cursor of the next page (None on the last page).
+    Raises ValueError for an invalid cursor.
+    """
+    if cursor:
+        position = decode_cursor(cursor)
+        try:
+            last_created_at = datetime.fromisoformat(position["t"])
+            last_id = int(position["id"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Invalid cursor.")
+        # Row comparison walks idx_reviews_book_created_id from the cursor, no sort or OFFSET
+        query = """
+        SELECT id, user_id, book_id, rating, review_text, created_at
+        FROM reviews 
+        WHERE book_id = $1 AND (created_at, id) < ($2, $3)
+        ORDER BY created_at DESC, id DESC
+        LIMIT $4;
+        """
+        records = await conn.fetch(query, book_id, last_created_at, last_id, limit + 1)
+    else:
+        query = """
+        SELECT id, user_id, book_id, rating, review_text, created_at
+        FROM reviews 
+        WHERE book_id = $1
+        ORDER BY created_at DESC, id DESC
+        LIMIT $2 OFFSET $3;
+        """
+        records = await conn.fetch(query, book_id, limit + 1, skip)
+
+    reviews = [dict(record) for record in records]
+
+    next_cursor = None
+    if len(reviews) > limit:
+        reviews = reviews[:limit]
+        last = reviews[-1]
+        next_cursor = encode_cursor({"t": last["created_at"].isoformat(), "id": last["id"]})
+
+    return reviews, next_cursor
+
+def rating_stats_to_dict(book_id: str, record) -> dict:
+    """Converts a book_rating_stats row (or None) into the BookRatingStats wire shape."""
+    if record is None:
+        return {
+            "book_id": book_id,
+            "rating_count": 0,
+            "average_rating": None,
+            "histogram": {str(stars): 0 for stars in range(1, 6)},
+        }
+    count = record["rating_count"]
+    return {
+        "book_id": book_id,
+        "rating_count": count,
+        "average_rating": round(record["rating_sum"] / count, 2) if count else None,
+        "histogram": {str(stars): record[f"rating_{stars}"] for stars in range(1, 6)},
+    }
+
+async def get_book_rating_stats(conn: Connection, book_id: str) -> dict:
+    """Reads a book's rating aggregates (one primary-key lookup)."""
+    query = """
+    SELECT rating_count, rating_sum, rating_1, rating_2, rating_3, rating_4, rating_5
+    FROM book_rating_stats WHERE book_id = $1;
+    """
+    record = await conn.fetchrow(query, book_id)
+    return rating_stats_to_dict(book_id, record)
+
+async def get_rating_stats_for_books(conn: Connection, book_ids: List[str]) -> Dict[str, dict]:
+    """Reads the rating aggregates of many books in one query, keyed by book id."""
+    if not book_ids:
+        return {}
     query = """
-    SELECT id, user_id, book_id, rating, review_text, created_at
-    FROM reviews 
-    WHERE book_id = $1
-    ORDER BY created_at DESC
-    LIMIT $2 OFFSET $3;
-    """
-    records = await conn.fetch(query, book_id, limit, skip)
-    return [ReviewInDB(**dict(record)) for record in records]
\ No newline at end of file
+    SELECT book_id, rating_count, rating_sum, rating_1, rating_2, rating_3, rating_4, rating_5
+    FROM book_rating_stats WHERE book_id = ANY($1::text[]);
+    """
+    records = {record["book_id"]: record for record in await conn.fetch(query, book_ids)}
+    return {book_id: rating_stats_to_dict(book_id, records.get(book_id)) for book_id in book_ids}
+
+async def rebuild_book_rating_stats(conn: Connection) -> int:
+    """
+    Recomputes every book's aggregates from 'reviews' in one GROUP BY pass.
+    The table is locked for the duration so concurrent reviews wait and are applied on top.
+    Returns the number of books with ratings.
+    """
+    async with conn.transaction():
+        await conn.execute("LOCK TABLE book_rating_stats IN EXCLUSIVE MODE;")
+        await conn.execute("DELETE FROM book_rating_stats;")
+        result = await conn.execute("""
+        INSERT INTO book_rating_stats (book_id, rating_count, rating_sum, rating_1, rating_2, rating_3, rating_4, rating_5)
+        SELECT book_id, COUNT(*), SUM(rating),
+               COUNT(*) FILTER (WHERE rating = 1), COUNT(*) FILTER (WHERE rating = 2),
+               COUNT(*) FILTER (WHERE rating = 3), COUNT(*) FILTER (WHERE rating = 4),
+               COUNT(*) FILTER (WHERE rating = 5)
+        FROM reviews
+        GROUP BY book_id;
+        """)
+    # asyncpg returns the command tag, e.g. "INSERT 0 1234"
+    return int(result.split()[-1])
@@ -0,0 +1,120 @@
+# services/user_search_service.py
+from typing import List, Optional, Tuple
+from asyncpg import Connection
+from cache import user_search_cache
+from utils.pagination import encode_cursor, decode_cursor
+
+MAX_QUERY_LENGTH = 100
+# Rows cached per query: a first page of any allowed limit, plus one to know whether more follow
+CACHED_MATCHES = 50
+# Shorter queries have too few trigrams for a meaningful similarity; they get prefix matches only
+FUZZY_MIN_LENGTH = 3
+# Fuzzy matches served per query across all pages; each page re-ranks the trigram candidates
+MAX_FUZZY_MATCHES = 200
+
+PREFIX = "p"
+FUZZY = "f"
+
+# Usernames starting with the query, alphabetically: a LIMITed range scan of
+# idx_users_username_lower_c in index order, however many users share the prefix
+PREFIX_MATCHES_QUERY = """
+SELECT id, username, lower(username) COLLATE "C" AS sort_key
+FROM users
+WHERE lower(username) COLLATE "C" >= $1 AND lower(username) COLLATE "C" < $2
+  AND (lower(username) COLLATE "C", id) > ($3, $4)
+ORDER BY lower(username) COLLATE "C", id
+LIMIT $5;
+"""
+
+# Closest trigram matches (idx_users_username_trgm) that are not prefix matches, most similar first
+FUZZY_MATCHES_QUERY = """
+SELECT id, username, similarity(username, $1) AS sort_key
+FROM users
+WHERE username % $1
+  AND NOT (lower(username) COLLATE "C" >= $2 AND lower(username) COLLATE "C" < $3)
+  AND (similarity(username, $1), -id) < ($4::real, -$5::int)
+ORDER BY sort_key DESC, id
+LIMIT $6;
+"""
+
+
+def normalize_query(q: str) -> str:
+    return " ".join(q.lower().split())[:MAX_QUERY_LENGTH]
+
+
+def _prefix_range(query: str) -> Tuple[str, str]:
+    """[low, high) bounds of the strings starting with query, in byte-wise (C collation) order."""
+    last = ord(query[-1])
+    if last >= 0x10FFFF:
+        return query, query + chr(0x10FFFF)
+    return query, query[:-1] + chr(last + 1)
+
+
+async def _fetch_matches(conn: Connection, query: str, limit: int, after: Optional[list] = None) -> List[list]:
+    """
+    Up to 'limit' [id, username, phase, sort key] rows after the given row (from the start when None):
+    prefix matches first, then fuzzy ones, each read with its own LIMIT.
+    """
+    low, high = _prefix_range(query)
+    rows = []
+    if after is None or after[2] == PREFIX:
+        last_key, last_id = (after[3], after[0]) if after else ("", 0)
+        records = await conn.fetch(PREFIX_MATCHES_QUERY, low, high, last_key, last_id, limit)
+        rows = [[record["id"], record["username"], PREFIX, record["sort_key"]] for record in records]
+        after = None
+    if len(rows) < limit and len(query) >= FUZZY_MIN_LENGTH:
+        last_score, last_id = (after[3], after[0]) if after else (2.0, 0)  # Similarity is at most 1
+        records = await conn.fetch(FUZZY_MATCHES_QUERY, query, low, high, last_score, last_id, limit - len(rows))
+        rows += [[record["id"], record["username"], FUZZY, record["sort_key"]] for record in records]
+    return rows
+
+
+async def search_users(
+    conn: Connection, q: str, limit: int = 10, cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Username search: usernames starting with the query first (alphabetically), then the closest
+    trigram matches. First pages of short queries are served from a short-lived Redis cache, so
+    typeahead keystrokes mostly skip Postgres.
+    Returns the page as {'id', 'username'} dicts and the cursor of the next page (None on the last page).
+    Raises ValueError for an invalid cursor.
+    """
+    query = normalize_query(q)
+    if not query:
+        return [], None
+
+    fuzzy_served = 0
+    if cursor:
+        position = decode_cursor(cursor)
+        try:
+            if position["q"] != query or position["ph"] not in (PREFIX, FUZZY):
+                raise ValueError
+            sort_key = str(position["k"]) if position["ph"] == PREFIX else float(position["k"])
+            after = [int(position["id"]), None, position["ph"], sort_key]
+            fuzzy_served = int(position.get("n", 0))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Invalid cursor.")
+        rows = await _fetch_matches(conn, query, limit + 1, after)
+    elif limit <= CACHED_MATCHES and user_search_cache.is_cacheable(query):
+        rows = await user_search_cache.get_cached_matches(query)
+        if rows is None:
+            rows = await _fetch_matches(conn, query, CACHED_MATCHES + 1)
+            await user_search_cache.cache_matches(query, rows)
+        rows = rows[:limit + 1]
+    else:
+        rows = await _fetch_matches(conn, query, limit + 1)
+
+    # Fuzzy matches stop at MAX_FUZZY_MATCHES in total (they come after every prefix match)
+    fuzzy_left = MAX_FUZZY_MATCHES - fuzzy_served
+    if fuzzy_left < len(rows):
+        prefix_rows = [row for row in rows if row[2] == PREFIX]
+        rows = prefix_rows + rows[len(prefix_rows):len(prefix_rows) + max(fuzzy_left, 0)]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        user_id, _, phase, sort_key = rows[-1]
+        fuzzy_served += sum(1 for row in rows if row[2] == FUZZY)
+        next_cursor = encode_cursor({"q": query, "ph": phase, "k": sort_key, "id": user_id, "n": fuzzy_served})
+
+    return [{"id": user_id, "username": username} for user_id, username, _, _ in rows], next_cursor
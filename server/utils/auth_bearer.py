@@ -2,6 +2,7 @@
 from fastapi import Request, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from cache.redis import get_redis_client_direct
+from cache.session_cache import session_cache
 from typing import Optional
 from jose import jwt, JWTError
 import os
@@ -13,7 +14,8 @@ ALGORITHM = "HS256"
 class JWTBearer(HTTPBearer):
     """
     Custom JWT Bearer scheme to extract and validate the token.
-    Uses Redis to check if the session is active.
+    Uses Redis to check if the session is active. Verified tokens are kept in a
+    per-worker cache, and the payload is reused by every JWTBearer in the same request.
     """
     def __init__(self, auto_error: bool = True):
         super(JWTBearer, self).__init__(auto_error=auto_error)
@@ -25,30 +27,50 @@ class JWTBearer(HTTPBearer):
             if credentials.scheme != "Bearer":
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid authentication scheme.")
             
-            # 1. Validate and Decode the token
+            # 0. Reuse the result if another JWTBearer already ran for this request
+            cached_payload = getattr(request.state, "token_payload", None)
+            if cached_payload is not None:
+                return cached_payload
+
             token = credentials.credentials
-            try:
-                payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-                user_id = payload.get("user_id")
+            payload = session_cache.get(token)
+            if payload is None:
+                payload = await self._verify(token)
+                session_cache.set(token, payload)
 
-            except JWTError:
-                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token signature or expiration.")
-            
-            if user_id is None:
-                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token payload missing user ID.")
+            request.state.token_payload = payload
 
-            # 2. Check token against Redis cache (Session validation)
-            redis = get_redis_client_direct()
-            session_key = f"session:{token}"
-            
-            # Check if the token (session) is still active in Redis
-            is_active = await redis.exists(session_key) 
-            
-            if not is_active:
-                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired or logged out.")
-            
             # Return the payload data, which can be injected into route functions
             return payload
 
         else:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authenticated.")
\ No newline at end of file
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authenticated.")
+
+    async def _verify(self, token: str) -> dict:
+        """Decodes the token and checks that its session is still active in Redis."""
+        # 1. Validate and Decode the token
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            user_id = payload.get("user_id")
+            jti = payload.get("jti")
+
+        except JWTError:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token signature or expiration.")
+
+        if user_id is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token payload missing user ID.")
+
+        if jti is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired or logged out.")
+
+        # 2. Check the token id against Redis cache (Session validation)
+        redis = get_redis_client_direct()
+        session_key = f"session:{jti}"
+
+        # Check if the token (session) is still active in Redis
+        is_active = await redis.exists(session_key)
+
+        if not is_active:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired or logged out.")
+
+        return payload
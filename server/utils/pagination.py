@@ -0,0 +1,19 @@
+# utils/pagination.py
+import base64
+import json
+
+def encode_cursor(position: dict) -> str:
+    """Encodes a keyset position (the sort values of the last returned row) as an opaque token."""
+    raw = json.dumps(position, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    """Decodes a token produced by encode_cursor. Raises ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid cursor.")
+    if not isinstance(position, dict):
+        raise ValueError("Invalid cursor.")
+    return position
@@ -1,44 +1,177 @@
 # utils/rate_limiter.py
-from fastapi import Request, HTTPException, status
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+from fastapi import Request, Response, HTTPException, status
+from jose import jwt, JWTError
 from cache.redis import get_redis_client_direct
+from cache.session_cache import session_cache
 
 # Configuration
-LIMIT = 5  # Max requests
-WINDOW = 60 # Time window in seconds
+RATE_LIMIT_LOCAL_PRECHECK = os.getenv("RATE_LIMIT_LOCAL_PRECHECK", "true").lower() == "true"
+RATE_LIMIT_LOCAL_MAX_KEYS = int(os.getenv("RATE_LIMIT_LOCAL_MAX_KEYS", "10000"))
+API_RATE_LIMIT = int(os.getenv("API_RATE_LIMIT", "120"))  # Requests per minute, per user (or IP)
+WRITE_RATE_LIMIT = int(os.getenv("WRITE_RATE_LIMIT", "30"))  # Writes per minute, per user
 
-async def rate_limit(request: Request):
+SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-super-secret-key")
+ALGORITHM = "HS256"
+
+# Token bucket, refilled continuously. Runs atomically in one EVALSHA round trip.
+# Uses the Redis clock so every API worker agrees on time.
+# Returns {allowed, remaining, retry_after_ms, reset_ms}
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local refill_per_ms = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * refill_per_ms)
+
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = math.ceil((cost - tokens) / refill_per_ms)
+end
+
+local reset = math.ceil((capacity - tokens) / refill_per_ms)
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], reset + 1000)
+return {allowed, math.floor(tokens), retry_after, reset}
+"""
+
+_token_bucket_script = None
+
+# Per-worker memory of keys Redis has already rejected, and until when.
+_blocked_until: "OrderedDict[str, float]" = OrderedDict()
+
+
+def _get_token_bucket_script():
+    global _token_bucket_script
+    if _token_bucket_script is None:
+        # register_script uses EVALSHA and only sends the source again on NOSCRIPT
+        _token_bucket_script = get_redis_client_direct().register_script(TOKEN_BUCKET_LUA)
+    return _token_bucket_script
+
+
+def _client_ip(request: Request) -> str:
+    # Note: In production, you would need to get the IP from proxy headers (e.g., X-Forwarded-For).
+    return request.client.host if request.client else "unknown_ip"
+
+
+def _user_id(request: Request) -> Optional[int]:
+    """Returns the user id from the JWT, reusing JWTBearer's result when it already ran."""
+    payload = getattr(request.state, "token_payload", None)
+    if payload is None:
+        authorization = request.headers.get("Authorization", "")
+        scheme, _, token = authorization.partition(" ")
+        if scheme != "Bearer" or not token:
+            return None
+        payload = session_cache.get(token)
+        if payload is None:
+            try:
+                payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            except JWTError:
+                return None
+    return payload.get("user_id")
+
+
+def _local_block_remaining(key: str) -> float:
+    blocked_until = _blocked_until.get(key)
+    if blocked_until is None:
+        return 0
+    remaining = blocked_until - time.monotonic()
+    if remaining <= 0:
+        del _blocked_until[key]
+        return 0
+    return remaining
+
+
+def _local_block(key: str, seconds: float):
+    _blocked_until[key] = time.monotonic() + seconds
+    _blocked_until.move_to_end(key)
+    while len(_blocked_until) > RATE_LIMIT_LOCAL_MAX_KEYS:
+        _blocked_until.popitem(last=False)
+
+
+class RateLimit:
     """
-    Checks the rate limit for the client IP address using Redis.
+    Token-bucket rate limit policy, declared per route as a dependency:
+        Depends(RateLimit("reviews", limit=30, period=60, key="user"))
+    key="user" limits by the JWT user id (falling back to the IP), key="ip" by client IP.
     """
-    # 1. Get the client IP address (or use a unique user identifier later)
-    # Note: In production, you would need to get the IP from proxy headers (e.g., X-Forwarded-For).
-    client_ip = request.client.host if request.client else "unknown_ip"
-    
-    # 2. Define the key and get the Redis client
-    key = f"rate_limit:{client_ip}"
-    redis = get_redis_client_direct()
-    
-    # 3. Use a Redis pipeline for atomic operations
-    pipe = redis.pipeline()
-    
-    # Check the current count
-    pipe.get(key)
-    
-    # Set the key expiration if it's the first request
-    pipe.expire(key, WINDOW, nx=True)
-    
-    # Increment the request counter
-    pipe.incr(key)
-    
-    # Execute the pipeline
-    results = await pipe.execute()
-    
-    current_count = int(results[2])
-    
-    if current_count > LIMIT:
+    def __init__(self, name: str, limit: int, period: int = 60, key: str = "user"):
+        if key not in ("user", "ip"):
+            raise ValueError("key must be 'user' or 'ip'")
+        self.name = name
+        self.limit = limit
+        self.period = period
+        self.key = key
+
+    def bucket_key(self, request: Request) -> str:
+        if self.key == "user":
+            user_id = _user_id(request)
+            if user_id is not None:
+                return f"rate_limit:{self.name}:user:{user_id}"
+        return f"rate_limit:{self.name}:ip:{_client_ip(request)}"
+
+    def _reject(self, retry_after: float):
+        retry_after = max(1, math.ceil(retry_after))
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail=f"Rate limit exceeded. Try again in {WINDOW} seconds."
+            detail=f"Rate limit exceeded. Try again in {retry_after} seconds.",
+            headers={
+                "Retry-After": str(retry_after),
+                "X-RateLimit-Limit": str(self.limit),
+                "X-RateLimit-Remaining": "0",
+                "X-RateLimit-Reset": str(retry_after),
+            },
         )
-    
-    print(f"Rate Limiter: IP {client_ip} Count {current_count}/{LIMIT}")
\ No newline at end of file
+
+    async def __call__(self, request: Request, response: Response):
+        key = self.bucket_key(request)
+
+        # 1. Local pre-check: clients Redis just rejected are turned away without a round trip
+        if RATE_LIMIT_LOCAL_PRECHECK:
+            blocked_for = _local_block_remaining(key)
+            if blocked_for > 0:
+                self._reject(blocked_for)
+
+        # 2. Atomic token bucket in Redis (single EVALSHA)
+        try:
+            script = _get_token_bucket_script()
+            allowed, remaining, retry_after_ms, reset_ms = await script(
+                keys=[key], args=[self.limit, self.limit / (self.period * 1000), 1]
+            )
+        except Exception as e:
+            # Fail open: an unavailable Redis should not take the API down with it
+            print(f"Rate limiter error for {key}: {e}")
+            return
+
+        if not allowed:
+            if RATE_LIMIT_LOCAL_PRECHECK:
+                _local_block(key, retry_after_ms / 1000)
+            self._reject(retry_after_ms / 1000)
+
+        response.headers["X-RateLimit-Limit"] = str(self.limit)
+        response.headers["X-RateLimit-Remaining"] = str(remaining)
+        response.headers["X-RateLimit-Reset"] = str(math.ceil(reset_ms / 1000))
+
+
+# --- Policies ---
+# Login is limited per IP: 5 attempts, refilled over a minute.
+rate_limit = RateLimit("login", limit=5, period=60, key="ip")
+signup_rate_limit = RateLimit("signup", limit=5, period=60, key="ip")
+# Applied to every book and social route
+api_rate_limit = RateLimit("api", limit=API_RATE_LIMIT, period=60, key="user")
+# Additional budget for writes (reviews, follows)
+write_rate_limit = RateLimit("write", limit=WRITE_RATE_LIMIT, period=60, key="user")
@@ -0,0 +1,27 @@
+# utils/responses.py
+from typing import Any, Optional
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+
+def _with_headers(new_response: Response, response: Optional[Response]) -> Response:
+    if response is not None:
+        for name, value in response.headers.items():
+            if name.lower() not in ("content-length", "content-type"):
+                new_response.headers[name] = value
+    return new_response
+
+def fast_json_response(content: Any, response: Optional[Response] = None, status_code: int = 200) -> ORJSONResponse:
+    """
+    Serializes trusted database output straight to JSON with orjson.
+    Returning a Response makes FastAPI skip response_model validation, while the route's
+    response_model still documents the schema. Headers set on the injected 'response'
+    (pagination cursors, rate limit state) are carried over.
+    """
+    return _with_headers(ORJSONResponse(content=content, status_code=status_code), response)
+
+def raw_json_response(body: str, response: Optional[Response] = None, status_code: int = 200) -> Response:
+    """
+    Returns an already serialized JSON body as is (e.g. entries stored pre-serialized in Redis),
+    carrying over headers set on the injected 'response' like fast_json_response does.
+    """
+    return _with_headers(Response(content=body, status_code=status_code, media_type="application/json"), response)
@@ -1,6 +1,8 @@
 # utils/security.py
 import os
+import secrets
 from datetime import datetime, timedelta, timezone
+from typing import Optional
 from jose import jwt, JWTError
 
 # Load SECRET_KEY from .env
@@ -14,6 +16,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire, "sub": str(data["user_id"])})
+    # 'jti' is a short random token id used as the Redis session key
+    to_encode.update({"exp": expire, "sub": str(data["user_id"]), "jti": secrets.token_urlsafe(12)})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
\ No newline at end of file